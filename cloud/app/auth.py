@@ -124,8 +124,7 @@ def _extract_bearer_token(request: Request) -> str:
 async def _authenticate_api_key(api_key: str, db: AsyncSession) -> User:
     """Verify X-API-Key header → return User + update last_used_at."""
     key_hash = hashlib.sha256(api_key.encode()).hexdigest()
-    result = await db.execute(select(ApiKey).where(ApiKey.key_hash == key_hash))
-    ak = result.scalar_one_or_none()
+    ak = await db.scalar(select(ApiKey).where(ApiKey.key_hash == key_hash))
 
     if ak is None:
         raise HTTPException(status_code=401, detail="Invalid API key")
@@ -135,42 +134,53 @@ async def _authenticate_api_key(api_key: str, db: AsyncSession) -> User:
     await db.commit()
 
     # Load user
-    user_result = await db.execute(select(User).where(User.id == ak.user_id))
-    user = user_result.scalar_one_or_none()
+    user = await db.get(User, ak.user_id)
     if user is None:
         raise HTTPException(status_code=401, detail="API key owner not found")
 
     return user
 
 
-async def get_current_user(
-    request: Request,
-    db: AsyncSession = Depends(get_db),
+async def authenticate(
+    db: AsyncSession, *, api_key: str | None = None, token: str | None = None,
 ) -> User:
-    """Dependency: X-API-Key header first, then Bearer JWT."""
+    """Resolve the caller from an API key, else from a Supabase JWT.
+
+    Shared by ``get_current_user`` and the multiplexed WebSocket, whose
+    browser clients cannot set headers. Raises HTTPException 401/503.
+    """
     # 1) Try API key
-    api_key = request.headers.get("X-API-Key")
     if api_key:
         return await _authenticate_api_key(api_key, db)
 
     # 2) Fall back to Bearer JWT
-    token = _extract_bearer_token(request)
+    if not token:
+        raise HTTPException(status_code=401, detail="Missing credentials")
     payload = verify_supabase_token(token)
 
     uid: str = payload["sub"]
     email: str = payload.get("email", "")
 
     # Upsert user
-    result = await db.execute(select(User).where(User.id == uid))
-    user = result.scalar_one_or_none()
+    user = await db.get(User, uid)
 
     if user is None:
         user = User(id=uid, email=email, tier=UserTier.FREE)
         db.add(user)
         await db.commit()
-        await db.refresh(user)
     elif user.email != email:
         user.email = email
         await db.commit()
 
     return user
+
+
+async def get_current_user(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+) -> User:
+    """Dependency: X-API-Key header first, then Bearer JWT."""
+    api_key = request.headers.get("X-API-Key")
+    if api_key:
+        return await authenticate(db, api_key=api_key)
+    return await authenticate(db, token=_extract_bearer_token(request))
@@ -0,0 +1,108 @@
+"""Warm Playwright browser shared by short page visits.
+
+Launching Chromium costs 0.5-1 s. Visits that only need a page (the convert
+fallback) borrow a fresh browser context on one long-lived browser instead;
+contexts share no cookies, storage or cache, so visits stay isolated. The
+browser starts on first use, is relaunched if it crashed, and closes after
+``settings.warm_browser_idle_seconds`` without visits (0 closes it after
+every visit), so an idle server does not keep a Chromium process around.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from collections.abc import AsyncIterator
+from typing import TYPE_CHECKING
+
+from app.config import settings
+
+if TYPE_CHECKING:
+    from playwright.async_api import Browser, Page, Playwright
+
+logger = logging.getLogger(__name__)
+
+_lock = asyncio.Lock()
+_playwright: Playwright | None = None
+_browser: Browser | None = None
+_in_use = 0
+_idle_close: asyncio.Task[None] | None = None
+
+
+async def _launch() -> Browser:
+    """Return the warm browser, launching it if needed (caller holds _lock)."""
+    global _playwright, _browser
+    if _browser is not None and _browser.is_connected():
+        return _browser
+    # Playwright comes with the optional AAT core — import on first use
+    from playwright.async_api import async_playwright
+
+    if _playwright is None:
+        _playwright = await async_playwright().start()
+    _browser = await _playwright.chromium.launch(headless=settings.playwright_headless)
+    logger.info("Warm browser launched")
+    return _browser
+
+
+async def _shutdown() -> None:
+    """Close the browser and Playwright (caller holds _lock)."""
+    global _playwright, _browser
+    browser, pw = _browser, _playwright
+    _browser = _playwright = None
+    if browser is not None:
+        with contextlib.suppress(Exception):
+            await browser.close()
+    if pw is not None:
+        with contextlib.suppress(Exception):
+            await pw.stop()
+
+
+async def _close_when_idle(delay: float) -> None:
+    await asyncio.sleep(delay)
+    async with _lock:
+        if _in_use == 0 and _browser is not None:
+            await _shutdown()
+            logger.info("Warm browser closed after %.0fs idle", delay)
+
+
+@contextlib.asynccontextmanager
+async def page(
+    *, viewport_width: int = 1920, viewport_height: int = 1080, timeout_ms: int = 30000,
+) -> AsyncIterator[Page]:
+    """Yield a new page in its own context on the warm browser."""
+    global _in_use, _idle_close
+    async with _lock:
+        if _idle_close is not None:
+            _idle_close.cancel()
+            _idle_close = None
+        browser = await _launch()
+        _in_use += 1
+    try:
+        context = await browser.new_context(
+            viewport={"width": viewport_width, "height": viewport_height},
+            ignore_https_errors=True,
+        )
+        try:
+            context.set_default_timeout(timeout_ms)
+            yield await context.new_page()
+        finally:
+            with contextlib.suppress(Exception):
+                await context.close()
+    finally:
+        async with _lock:
+            _in_use -= 1
+            if _in_use == 0:
+                _idle_close = asyncio.create_task(
+                    _close_when_idle(settings.warm_browser_idle_seconds),
+                )
+
+
+async def close() -> None:
+    """Close the warm browser now (app shutdown)."""
+    global _idle_close
+    async with _lock:
+        if _idle_close is not None:
+            _idle_close.cancel()
+            _idle_close = None
+        await _shutdown()
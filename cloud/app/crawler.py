@@ -17,7 +17,7 @@ from typing import Any
 from urllib.parse import urljoin, urlparse, urlunparse
 
 from app.config import settings
-from app.ws import WSManager
+from app.ws import WSTopic
 
 logger = logging.getLogger(__name__)
 
@@ -627,7 +627,7 @@ async def crawl_site(
     max_depth: int = 2,
     total_timeout: float = 180.0,  # 3 minutes default
     screenshot_limit: int = 3,
-    ws: WSManager | None = None,
+    ws: WSTopic | None = None,
 ) -> dict[str, Any]:
     """BFS crawl a site and extract page data.
 
@@ -981,7 +981,7 @@ async def crawl_site(
 async def _full_page_scroll(
     page: Any,
     *,
-    ws: WSManager | None = None,
+    ws: WSTopic | None = None,
     scan_id: int = 0,
 ) -> None:
     """Scroll through the entire page to trigger lazy-loaded elements.
@@ -1041,7 +1041,7 @@ async def _detect_and_observe_accordions(
     page: Any,
     original_url: str,
     *,
-    ws: WSManager | None = None,
+    ws: WSTopic | None = None,
     scan_id: int = 0,
 ) -> list[dict[str, Any]]:
     """Detect accordion/toggle elements and click each to capture expanded content.
@@ -1728,7 +1728,7 @@ async def _observe_interactions(
     original_url: str,
     *,
     max_interactions: int = 15,
-    ws: WSManager | None = None,
+    ws: WSTopic | None = None,
     scan_id: int = 0,
     already_observed: set[str] | None = None,
 ) -> list[dict[str, Any]]:
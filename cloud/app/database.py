@@ -3,18 +3,67 @@
 from __future__ import annotations
 
 from collections.abc import AsyncGenerator
+from typing import Any
+from uuid import uuid4
 
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from app.config import settings
 
+
+def async_database_url(url: str, driver: str = "asyncpg") -> str:
+    """Return *url* with an async PostgreSQL driver.
+
+    Supabase hands out ``postgresql://`` (or ``postgres://``) URLs, which
+    SQLAlchemy maps to the sync psycopg2 driver. Those get *driver* instead;
+    URLs that already name a driver (and SQLite) are left alone.
+    """
+    scheme, sep, rest = url.partition("://")
+    if sep and scheme in ("postgres", "postgresql"):
+        return f"postgresql+{driver}://{rest}"
+    return url
+
+
+def _engine_kwargs(url: str) -> dict[str, Any]:
+    if url.startswith("sqlite"):
+        # SQLite needs check_same_thread=False
+        return {"connect_args": {"check_same_thread": False}}
+    # PostgreSQL: the async dialects default to AsyncAdaptedQueuePool; size it
+    # for the scan/test endpoints plus the background worker.
+    kwargs: dict[str, Any] = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_pre_ping": True,
+    }
+    if settings.db_transaction_pooler:
+        kwargs["connect_args"] = _pooler_connect_args(url)
+    return kwargs
+
+
+def _pooler_connect_args(url: str) -> dict[str, Any]:
+    """Driver options for a transaction-mode pooler (PgBouncer/Supavisor).
+
+    The pooler hands each transaction to whichever server connection is
+    free, so statements prepared on one backend are missing (or clash by
+    name) on the next. asyncpg's statement caches are switched off and the
+    statements SQLAlchemy still prepares get unique names instead of
+    per-connection counters; psycopg stops preparing altogether.
+    """
+    if url.startswith("postgresql+psycopg"):
+        return {"prepare_threshold": None}
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+    }
+
+
+_database_url = async_database_url(settings.database_url, settings.db_driver)
+
 engine = create_async_engine(
-    settings.database_url,
+    _database_url,
     echo=settings.debug,
-    # SQLite needs check_same_thread=False
-    connect_args={"check_same_thread": False}
-    if settings.database_url.startswith("sqlite")
-    else {},
+    **_engine_kwargs(_database_url),
 )
 
 async_session = async_sessionmaker(engine, expire_on_commit=False)
@@ -16,22 +16,22 @@ from pathlib import Path
 from typing import Any
 
 import yaml
-from sqlalchemy import select
+from sqlalchemy import select, update
 
 from app.config import settings
 from app.database import async_session
 from app.models import Test
-from app.ws import WSManager
+from app.scenario_utils import (
+    YamlLoader,
+    scenario_list_adapter,
+    scenarios_to_yaml,
+    settings_ai_config,
+    shared_adapter,
+)
+from app.ws import WSTopic
 
 logger = logging.getLogger(__name__)
 
-# Default model per AI provider
-_DEFAULT_MODELS: dict[str, str] = {
-    "claude": "claude-sonnet-4-20250514",
-    "openai": "gpt-4o",
-    "ollama": "codellama:7b",
-}
-
 # ---------------------------------------------------------------------------
 # AI scenario generation prompt
 # ---------------------------------------------------------------------------
@@ -149,7 +149,7 @@ async def _save_screenshot(
     test_id: int,
     label: str,
     *,
-    ws: WSManager | None = None,
+    ws: WSTopic | None = None,
     step: int = 0,
     timing: str = "",
 ) -> str | None:
@@ -333,20 +333,20 @@ def _build_observation_from_quick(fields: list[dict]) -> list[dict]:
 
 
 async def generate_scenarios_for_test(
-    test_id: int, ws: WSManager | None = None
+    test_id: int, ws: WSTopic | None = None
 ) -> dict[str, Any]:
     """Navigate to URL, capture page, generate scenarios via AI, save YAML.
 
     Returns dict: {scenario_yaml, steps_total, error?}
     """
     async with async_session() as db:
-        test = (await db.execute(select(Test).where(Test.id == test_id))).scalar_one()
-        target_url = test.target_url
-        doc_text = test.doc_text
+        target_url, doc_text = (await db.execute(
+            select(Test.target_url, Test.doc_text).where(Test.id == test_id)
+        )).one()
 
     try:
         from aat.adapters import ADAPTER_REGISTRY
-        from aat.core.models import AIConfig, EngineConfig
+        from aat.core.models import EngineConfig
         from aat.engine.web import WebEngine
     except ImportError as exc:
         msg = f"AAT core not installed: {exc}. Run 'pip install -e .' from project root."
@@ -376,17 +376,13 @@ async def generate_scenarios_for_test(
         )
 
         # Generate scenarios via AI
-        ai_config = AIConfig(
-            provider=settings.ai_provider,
-            api_key=settings.ai_api_key,
-            model=settings.ai_model or _DEFAULT_MODELS.get(settings.ai_provider, ""),
-        )
+        ai_config = settings_ai_config()
 
         adapter_cls = ADAPTER_REGISTRY.get(ai_config.provider)
         if adapter_cls is None:
             return {"error": f"Unknown AI provider: {ai_config.provider}"}
 
-        adapter = adapter_cls(ai_config)
+        adapter = shared_adapter(adapter_cls, ai_config)
 
         # Use document-enhanced prompt if doc_text is available
         if doc_text:
@@ -421,23 +417,16 @@ async def generate_scenarios_for_test(
         if not scenarios:
             return {"error": "AI generated no scenarios"}
 
-        # Serialize to YAML
-        scenario_dicts = []
-        for s in scenarios:
-            sd = s.model_dump(mode="json", exclude_none=True)
-            scenario_dicts.append(sd)
-        scenario_yaml = yaml.safe_dump(
-            scenario_dicts, default_flow_style=False, allow_unicode=True
-        )
-
-        total_steps = sum(len(s.steps) for s in scenarios)
+        # Serialize to YAML off the event loop (steps counted in the same pass)
+        scenario_yaml, total_steps = await asyncio.to_thread(scenarios_to_yaml, scenarios)
 
         # Update DB
-        async with async_session() as db:
-            test = (await db.execute(select(Test).where(Test.id == test_id))).scalar_one()
-            test.scenario_yaml = scenario_yaml
-            test.steps_total = total_steps
-            await db.commit()
+        async with async_session.begin() as db:
+            await db.execute(
+                update(Test).where(Test.id == test_id).values(
+                    scenario_yaml=scenario_yaml, steps_total=total_steps,
+                )
+            )
 
         # Notify frontend
         if ws:
@@ -462,7 +451,7 @@ async def generate_scenarios_for_test(
 # ---------------------------------------------------------------------------
 
 
-async def execute_test(test_id: int, ws: WSManager | None = None) -> dict[str, Any]:
+async def execute_test(test_id: int, ws: WSTopic | None = None) -> dict[str, Any]:
     """Execute a single test end-to-end.
 
     If scenario_yaml already exists in DB (review mode), parse and execute it.
@@ -472,9 +461,9 @@ async def execute_test(test_id: int, ws: WSManager | None = None) -> dict[str, A
     """
     # -- Fetch test record --
     async with async_session() as db:
-        test = (await db.execute(select(Test).where(Test.id == test_id))).scalar_one()
-        target_url = test.target_url
-        existing_yaml = test.scenario_yaml
+        target_url, existing_yaml = (await db.execute(
+            select(Test.target_url, Test.scenario_yaml).where(Test.id == test_id)
+        )).one()
 
     start = time.monotonic()
 
@@ -483,11 +472,9 @@ async def execute_test(test_id: int, ws: WSManager | None = None) -> dict[str, A
         from aat.adapters import ADAPTER_REGISTRY
         from aat.core.models import (
             ActionType,
-            AIConfig,
             EngineConfig,
             HumanizerConfig,
             MatchingConfig,
-            Scenario,
         )
         from aat.engine.comparator import Comparator
         from aat.engine.executor import StepExecutor
@@ -562,21 +549,17 @@ async def execute_test(test_id: int, ws: WSManager | None = None) -> dict[str, A
         # -- Load or generate scenarios --
         if existing_yaml:
             # Review mode: parse pre-existing YAML
-            raw = yaml.safe_load(existing_yaml)
+            raw = yaml.load(existing_yaml, Loader=YamlLoader)
             if isinstance(raw, dict):
                 raw = [raw]
-            scenarios = [Scenario.model_validate(item) for item in raw]
+            scenarios = scenario_list_adapter().validate_python(raw)
         else:
             # Auto mode: quick observation + AI generation (same pipeline as scan)
             page_text = await engine.get_page_text()
             screenshot = await engine.screenshot()
             observed = await _quick_observe_page(engine)
 
-            ai_config = AIConfig(
-                provider=settings.ai_provider,
-                api_key=settings.ai_api_key,
-                model=settings.ai_model or _DEFAULT_MODELS.get(settings.ai_provider, ""),
-            )
+            ai_config = settings_ai_config()
             adapter_cls = ADAPTER_REGISTRY.get(ai_config.provider)
             if adapter_cls is None:
                 return {
@@ -584,7 +567,7 @@ async def execute_test(test_id: int, ws: WSManager | None = None) -> dict[str, A
                     "error": f"Unknown AI provider: {ai_config.provider}",
                     "duration_ms": _elapsed(start),
                 }
-            adapter = adapter_cls(ai_config)
+            adapter = shared_adapter(adapter_cls, ai_config)
             prompt = _SCENARIO_PROMPT.format(
                 url=target_url,
                 page_text=page_text[:8000],
@@ -613,17 +596,17 @@ async def execute_test(test_id: int, ws: WSManager | None = None) -> dict[str, A
             }
 
         # -- Save scenario info to DB --
-        total_steps = sum(len(s.steps) for s in scenarios)
-        async with async_session() as db:
-            test = (await db.execute(select(Test).where(Test.id == test_id))).scalar_one()
-            if not existing_yaml:
-                # Auto mode: save generated YAML
-                scenario_dicts = [s.model_dump(mode="json", exclude_none=True) for s in scenarios]
-                test.scenario_yaml = yaml.safe_dump(
-                    scenario_dicts, default_flow_style=False, allow_unicode=True
-                )
-            test.steps_total = total_steps
-            await db.commit()
+        values: dict[str, Any] = {}
+        if existing_yaml:
+            total_steps = sum(len(s.steps) for s in scenarios)
+        else:
+            # Auto mode: save generated YAML (serialized off the event loop)
+            values["scenario_yaml"], total_steps = await asyncio.to_thread(
+                scenarios_to_yaml, scenarios,
+            )
+        values["steps_total"] = total_steps
+        async with async_session.begin() as db:
+            await db.execute(update(Test).where(Test.id == test_id).values(**values))
 
         if ws:
             await ws.broadcast(test_id, {
@@ -830,11 +813,12 @@ async def execute_test(test_id: int, ws: WSManager | None = None) -> dict[str, A
                 completed += 1
 
                 # Update progress in DB (+ heartbeat to prevent stuck-timeout)
-                async with async_session() as db:
-                    t = (await db.execute(select(Test).where(Test.id == test_id))).scalar_one()
-                    t.steps_completed = completed
-                    t.updated_at = datetime.now(UTC)
-                    await db.commit()
+                async with async_session.begin() as db:
+                    await db.execute(
+                        update(Test).where(Test.id == test_id).values(
+                            steps_completed=completed, updated_at=datetime.now(UTC),
+                        )
+                    )
 
             all_results.append({
                 "scenario_id": scenario.id,
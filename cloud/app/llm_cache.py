@@ -0,0 +1,116 @@
+"""In-process exact-match cache for AI responses.
+
+Re-planning or re-executing a scan with identical crawl data, or repeating
+a convert request on an unchanged page, produces a byte-identical prompt;
+serving the stored response skips the AI round-trip.
+Keys are BLAKE2b digests of everything that affects the completion
+(provider, model, temperature, prompt). Entries expire after
+``settings.llm_cache_ttl_seconds`` and the least recently used entry is
+evicted beyond ``settings.llm_cache_max_entries``. A TTL of 0 disables the
+cache.
+
+A second, near-duplicate tier (``get_similar`` / ``put_similar``) matches
+prompts whose word 3-shingle sets overlap by at least
+``settings.llm_similar_threshold`` (Jaccard) within the same scope, e.g. a
+re-scan of the same site whose crawl output barely changed.
+
+Callers store immutable values (strings / tuples of JSON strings) so a hit
+can never be mutated by post-processing of an earlier result.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any
+
+from app.config import settings
+
+_SIMILAR_PER_SCOPE = 8
+
+_entries: OrderedDict[bytes, tuple[float, Any]] = OrderedDict()
+# scope → [(expires_at, shingles, value), ...], newest last
+_similar: OrderedDict[str, list[tuple[float, frozenset[int], Any]]] = OrderedDict()
+
+
+def make_key(*parts: object) -> bytes:
+    """Build a cache key from the parts that determine the AI response."""
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(str(part).encode())
+        h.update(b"\x1f")  # unit separator — ("ab", "c") != ("a", "bc")
+    return h.digest()
+
+
+def get(key: bytes) -> Any | None:
+    """Return the cached value for *key*, or None if missing or expired."""
+    entry = _entries.get(key)
+    if entry is None:
+        return None
+    expires_at, value = entry
+    if time.monotonic() >= expires_at:
+        del _entries[key]
+        return None
+    _entries.move_to_end(key)
+    return value
+
+
+def put(key: bytes, value: Any) -> None:
+    """Store *value* under *key* (no-op when the cache is disabled)."""
+    ttl = settings.llm_cache_ttl_seconds
+    if ttl <= 0:
+        return
+    _entries[key] = (time.monotonic() + ttl, value)
+    _entries.move_to_end(key)
+    while len(_entries) > settings.llm_cache_max_entries:
+        _entries.popitem(last=False)
+
+
+def _shingles(text: str) -> frozenset[int]:
+    """Hashed word 3-shingles of *text* (whitespace-insensitive)."""
+    words = text.split()
+    if len(words) < 3:
+        return frozenset({hash(tuple(words))})
+    return frozenset(hash(tuple(words[i:i + 3])) for i in range(len(words) - 2))
+
+
+def get_similar(scope: str, text: str) -> Any | None:
+    """Return the value of the most similar live entry in *scope*, if any.
+
+    Similarity is the Jaccard index of the shingle sets; entries below
+    ``settings.llm_similar_threshold`` are ignored.
+    """
+    threshold = settings.llm_similar_threshold
+    candidates = _similar.get(scope)
+    if not candidates or threshold <= 0:
+        return None
+    now = time.monotonic()
+    candidates[:] = [c for c in candidates if c[0] > now]
+    shingles = _shingles(text)
+    best_score, best_value = 0.0, None
+    for _, other, value in candidates:
+        union = len(shingles | other)
+        score = len(shingles & other) / union if union else 1.0
+        if score > best_score:
+            best_score, best_value = score, value
+    return best_value if best_score >= threshold else None
+
+
+def put_similar(scope: str, text: str, value: Any) -> None:
+    """Store *value* for near-duplicate lookups of *text* within *scope*."""
+    ttl = settings.llm_cache_ttl_seconds
+    if ttl <= 0 or settings.llm_similar_threshold <= 0:
+        return
+    entries = _similar.setdefault(scope, [])
+    entries.append((time.monotonic() + ttl, _shingles(text), value))
+    del entries[:-_SIMILAR_PER_SCOPE]
+    _similar.move_to_end(scope)
+    while len(_similar) > settings.llm_cache_max_entries:
+        _similar.popitem(last=False)
+
+
+def clear() -> None:
+    """Drop all cached entries."""
+    _entries.clear()
+    _similar.clear()
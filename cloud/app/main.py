@@ -12,10 +12,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy import text
 
+from app import browser_pool
 from app.config import settings
 from app.database import engine
 from app.models import Base
-from app.routers import billing, documents, keys, scan, tests, v1
+from app.routers import billing, documents, keys, live, scan, tests, v1
+from app.scenario_utils import close_shared_adapters
 
 logger = logging.getLogger(__name__)
 
@@ -84,6 +86,8 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     for col_sql in [
         "ALTER TABLE scans ADD COLUMN observations_json TEXT",
         "ALTER TABLE scans ADD COLUMN logs_json TEXT",
+        "ALTER TABLE scans ADD COLUMN matched_patterns_json TEXT",
+        "ALTER TABLE scans ADD COLUMN page_outline_json TEXT",
     ]:
         try:
             async with engine.begin() as conn:
@@ -92,15 +96,58 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         except Exception:
             pass  # column already exists
 
+    # Indexes for tables that predate them (create_all skips existing tables).
+    # PostgreSQL builds them CONCURRENTLY so writes keep flowing, which
+    # cannot run inside a transaction — hence AUTOCOMMIT. A CONCURRENTLY
+    # build that fails leaves an INVALID index that IF NOT EXISTS would skip
+    # forever, so drop any such leftover and build it again.
+    postgres = not db_url.startswith("sqlite")
+    concurrently = " CONCURRENTLY" if postgres else ""
+    for index_name, index_def in [
+        ("ix_tests_user_created", "tests (user_id, created_at DESC, id DESC)"),
+        ("ix_tests_status_created", "tests (status, created_at)"),
+    ]:
+        index_sql = f"CREATE INDEX{concurrently} IF NOT EXISTS {index_name} ON {index_def}"
+        try:
+            async with engine.connect() as conn:
+                await conn.execution_options(isolation_level="AUTOCOMMIT")
+                if postgres and await conn.scalar(
+                    text(
+                        "SELECT NOT indisvalid FROM pg_index"
+                        " WHERE indexrelid = to_regclass(:name)"
+                    ),
+                    {"name": index_name},
+                ):
+                    logger.warning("Rebuilding INVALID index %s", index_name)
+                    await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}"))
+                await conn.execute(text(index_sql))
+        except Exception:
+            logger.warning(
+                "Index migration failed: %s — the index may be left INVALID;"
+                " it is rebuilt on next startup, or run DROP INDEX %s manually",
+                index_sql, index_name, exc_info=True,
+            )
+
     # Background worker
     from app.worker import worker
 
     await worker.start()
 
+    # Cross-process WebSocket relay (optional)
+    if settings.redis_url:
+        from app.ws import ws_manager
+
+        await ws_manager.start_relay(settings.redis_url)
+
     yield
 
     # Shutdown
     await worker.stop()
+    await scan.shutdown_crawls()
+    await browser_pool.close()
+    await close_shared_adapters()
+    if settings.redis_url:
+        await ws_manager.stop_relay()
 
 
 app = FastAPI(
@@ -135,6 +182,7 @@ app.include_router(documents.router)
 app.include_router(keys.router)
 app.include_router(v1.router)
 app.include_router(billing.router)
+app.include_router(live.router)
 
 
 # -- Rate limit response headers --
@@ -8,6 +8,7 @@ from datetime import UTC, datetime, timedelta
 from fastapi import Depends, HTTPException, Request
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 
 from app.auth import get_current_user
 from app.config import settings
@@ -46,7 +47,7 @@ async def get_monthly_used(user_id: str, db: AsyncSession) -> int:
         .select_from(Test)
         .where(Test.user_id == user_id, Test.created_at >= month_start)
     )
-    return (await db.execute(q)).scalar() or 0
+    return await db.scalar(q) or 0
 
 
 async def get_active_count(user_id: str, db: AsyncSession) -> int:
@@ -59,7 +60,7 @@ async def get_active_count(user_id: str, db: AsyncSession) -> int:
             Test.status.in_([TestStatus.GENERATING, TestStatus.QUEUED, TestStatus.RUNNING]),
         )
     )
-    return (await db.execute(q)).scalar() or 0
+    return await db.scalar(q) or 0
 
 
 async def check_rate_limit(
@@ -99,7 +100,7 @@ async def check_rate_limit(
         )
 
     # -- Auto-clean stuck tests for this user (before concurrent check) --
-    stuck_cutoff = datetime.now(UTC) - timedelta(
+    stuck_cutoff = now - timedelta(
         minutes=settings.stuck_timeout_minutes
     )
     stuck_q = (
@@ -110,15 +111,15 @@ async def check_rate_limit(
             ),
             Test.updated_at < stuck_cutoff,
         )
+        .options(load_only(Test.status, raiseload=True))
     )
-    stuck_result = await db.execute(stuck_q)
-    stuck_tests = list(stuck_result.scalars().all())
+    stuck_tests = list((await db.scalars(stuck_q)).all())
     for t in stuck_tests:
         t.status = TestStatus.FAILED
         t.error_message = (
             f"Auto-cleaned: test stuck > {settings.stuck_timeout_minutes} min"
         )
-        t.updated_at = datetime.now(UTC)
+        t.updated_at = now
         logger.warning("Auto-cleaned stuck test %d for user %s", t.id, user.id)
     if stuck_tests:
         await db.commit()
@@ -142,7 +143,7 @@ async def check_rate_limit(
         .select_from(Test)
         .where(Test.status == TestStatus.RUNNING)
     )
-    global_running = (await db.execute(global_running_q)).scalar() or 0
+    global_running = await db.scalar(global_running_q) or 0
     if global_running >= settings.max_concurrent:
         raise HTTPException(
             status_code=429,
@@ -5,7 +5,7 @@ from __future__ import annotations
 import enum
 from datetime import UTC, datetime
 
-from sqlalchemy import DateTime, Enum, Integer, String, Text, func
+from sqlalchemy import DateTime, Enum, Index, Integer, String, Text, func
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 
@@ -36,6 +36,9 @@ class Test(Base):
     """A test run record."""
 
     __tablename__ = "tests"
+    # Flushes leave server-generated values on the object (RETURNING), so
+    # the routes can serialize an updated test without a refresh SELECT
+    __mapper_args__ = {"eager_defaults": True}
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[str] = mapped_column(String(128), index=True, nullable=False)
@@ -54,14 +57,24 @@ class Test(Base):
         server_default=func.now(),
         default=lambda: datetime.now(UTC),
     )
+    # Set client-side on every ORM flush and bulk UPDATE: func.now() is
+    # whole seconds on SQLite, too coarse for the ETag of GET /api/tests/{id}
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now(),
-        onupdate=func.now(),
+        onupdate=lambda: datetime.now(UTC),
         default=lambda: datetime.now(UTC),
     )
 
 
+# GET /api/tests order — a user's newest tests come straight off the index
+# (no sort); cursor pages seek into it. Added to existing DBs in main.lifespan.
+Index("ix_tests_user_created", Test.user_id, Test.created_at.desc(), Test.id.desc())
+# Worker polls — queue pick-up (GENERATING/QUEUED, oldest first) and the
+# per-user RUNNING counts touch the few active rows, not the whole history.
+Index("ix_tests_status_created", Test.status, Test.created_at)
+
+
 class User(Base):
     """User profile (synced from Supabase Auth)."""
 
@@ -111,11 +124,15 @@ class Scan(Base):
     # JSON text columns (SQLite compatible)
     summary_json: Mapped[str | None] = mapped_column(Text, nullable=True)
     pages_json: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # JSON array — slim per-page view read by /plan (see _page_outline)
+    page_outline_json: Mapped[str | None] = mapped_column(Text, nullable=True)
     broken_links_json: Mapped[str | None] = mapped_column(Text, nullable=True)
     detected_features: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON array
     plan_json: Mapped[str | None] = mapped_column(Text, nullable=True)
     observations_json: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON array
     logs_json: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON array of scan logs
+    # JSON array — match_elements_to_patterns() result, cached at plan time
+    matched_patterns_json: Mapped[str | None] = mapped_column(Text, nullable=True)
     error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
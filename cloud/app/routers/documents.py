@@ -20,6 +20,7 @@ logger = logging.getLogger(__name__)
 
 _MAX_FILE_BYTES = 5 * 1024 * 1024  # 5 MB
 _MAX_DOCS_PER_USER = 3
+_MAX_PROMPT_DOC_CHARS = 16_000  # combined reference text handed to the AI
 
 
 @router.post("/upload", response_model=DocumentResponse, status_code=201)
@@ -48,7 +49,7 @@ async def upload_document(
 
     # Per-user count limit
     count_q = select(func.count()).select_from(Document).where(Document.user_id == user.id)
-    current_count = (await db.execute(count_q)).scalar() or 0
+    current_count = await db.scalar(count_q) or 0
     if current_count >= _MAX_DOCS_PER_USER:
         raise HTTPException(
             status_code=409,
@@ -74,8 +75,7 @@ async def upload_document(
         extracted_text=extracted,
     )
     db.add(doc)
-    await db.commit()
-    await db.refresh(doc)
+    await db.commit()  # INSERT returns the id; no refresh SELECT needed
 
     return {
         "id": doc.id,
@@ -98,8 +98,7 @@ async def list_documents(
         .where(Document.user_id == user.id)
         .order_by(Document.created_at.desc())
     )
-    result = await db.execute(query)
-    docs = list(result.scalars().all())
+    docs = list((await db.scalars(query)).all())
 
     return {
         "documents": [
@@ -126,7 +125,7 @@ async def delete_document(
 ) -> None:
     """Delete a reference document."""
     query = select(Document).where(Document.id == doc_id, Document.user_id == user.id)
-    doc = (await db.execute(query)).scalar_one_or_none()
+    doc = await db.scalar(query)
     if doc is None:
         raise HTTPException(status_code=404, detail="Document not found")
     await db.delete(doc)
@@ -135,8 +134,13 @@ async def delete_document(
 
 async def get_user_doc_text(user_id: str, db: AsyncSession) -> str:
     """Combine all user document texts (for AI prompt injection)."""
+    # No single text can contribute more than the combined cap, so longer
+    # ones are cut in the database instead of being transferred whole
     query = (
-        select(Document.filename, Document.extracted_text)
+        select(
+            Document.filename,
+            func.substr(Document.extracted_text, 1, _MAX_PROMPT_DOC_CHARS),
+        )
         .where(Document.user_id == user_id)
         .order_by(Document.created_at)
     )
@@ -152,6 +156,6 @@ async def get_user_doc_text(user_id: str, db: AsyncSession) -> str:
     combined = "\n\n".join(parts)
 
     # Truncate to 16,000 chars (match executor.py pattern)
-    if len(combined) > 16_000:
-        combined = combined[:16_000] + "\n... (truncated)"
+    if len(combined) > _MAX_PROMPT_DOC_CHARS:
+        combined = combined[:_MAX_PROMPT_DOC_CHARS] + "\n... (truncated)"
     return combined
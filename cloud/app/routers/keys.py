@@ -41,8 +41,7 @@ async def create_api_key(
         name=body.name,
     )
     db.add(ak)
-    await db.commit()
-    await db.refresh(ak)
+    await db.commit()  # INSERT returns the id; no refresh SELECT needed
 
     return {
         "id": ak.id,
@@ -59,12 +58,12 @@ async def list_api_keys(
     db: AsyncSession = Depends(get_db),
 ) -> list[ApiKey]:
     """List current user's API keys (prefix only, no full key)."""
-    result = await db.execute(
+    result = await db.scalars(
         select(ApiKey)
         .where(ApiKey.user_id == user.id)
         .order_by(ApiKey.created_at.desc())
     )
-    return list(result.scalars().all())
+    return list(result.all())
 
 
 @router.delete("/{key_id}", status_code=204)
@@ -74,10 +73,9 @@ async def delete_api_key(
     db: AsyncSession = Depends(get_db),
 ) -> None:
     """Revoke an API key (owner only)."""
-    result = await db.execute(
+    ak = await db.scalar(
         select(ApiKey).where(ApiKey.id == key_id, ApiKey.user_id == user.id)
     )
-    ak = result.scalar_one_or_none()
     if ak is None:
         raise HTTPException(status_code=404, detail="API key not found")
 
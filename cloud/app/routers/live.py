@@ -0,0 +1,124 @@
+"""Multiplexed WebSocket — one connection for many test/scan channels."""
+
+from __future__ import annotations
+
+from fastapi import APIRouter, HTTPException, WebSocket, status
+from sqlalchemy import select
+
+from app.auth import authenticate
+from app.database import async_session
+from app.models import Scan, Test, User
+from app.scenario_utils import dump_json, parse_json
+from app.ws import parse_channel, ws_manager
+
+router = APIRouter(prefix="/api", tags=["ws"])
+
+# Subscriptions one socket may hold (bounds per-connection server state)
+_MAX_CHANNELS = 100
+
+# Largest test/scan primary key (32-bit signed INTEGER column)
+_MAX_ROW_ID = 2**31 - 1
+
+
+async def _socket_user(websocket: WebSocket) -> User | None:
+    """The caller of *websocket*, or None if its credentials are missing/invalid.
+
+    Browsers cannot set headers on a WebSocket, so the API key or Supabase
+    JWT may also come as the ``api_key`` / ``token`` query parameter.
+    """
+    params, headers = websocket.query_params, websocket.headers
+    api_key = headers.get("X-API-Key") or params.get("api_key")
+    token = params.get("token")
+    auth_header = headers.get("Authorization", "")
+    if not token and auth_header.startswith("Bearer "):
+        token = auth_header[7:]
+    # A short-lived session — the socket may stay open for hours
+    async with async_session() as db:
+        try:
+            return await authenticate(db, api_key=api_key, token=token)
+        except HTTPException:
+            return None
+
+
+async def _may_watch(user: User, channel: str) -> bool:
+    """Whether *user* owns the test, scan or convert session behind *channel*."""
+    kind, _, ident = channel.partition(":")
+    if kind == "convert":
+        return await ws_manager.claim(channel, user.id)
+    row_id = int(ident)
+    if row_id > _MAX_ROW_ID:  # cannot exist, and would overflow the query
+        return False
+    model = Test if kind == "test" else Scan
+    async with async_session() as db:
+        owner = await db.scalar(select(model.user_id).where(model.id == row_id))
+    return owner == user.id
+
+
+@router.websocket("/ws")
+async def multiplexed_websocket(websocket: WebSocket) -> None:
+    """WebSocket carrying the events of any number of channels.
+
+    Client frames (JSON):
+        {"op": "subscribe", "channel": "scan:123"}
+        {"op": "unsubscribe", "channel": "scan:123"}
+        {"op": "ping"}
+
+    Authenticated like the REST API (``X-API-Key`` / ``Authorization``
+    headers, or the ``api_key`` / ``token`` query parameter); sockets without
+    valid credentials are closed with 1008. Channels are ``test:<id>``,
+    ``scan:<id>`` and ``convert:<session_id>``, and only the caller's own
+    tests, scans and convert sessions can be subscribed.
+    Events arrive batched (up to every 50 ms) as a JSON array of
+    ``{"channel": "scan:123", "data": {...}}`` items, ``data`` being the
+    payload the per-resource ``/ws`` endpoints send; replies to client
+    frames are single objects.
+    """
+    user = await _socket_user(websocket)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    channels: set[str] = set()
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            frame = parse_json(message.get("text") or message.get("bytes"))
+            op = frame.get("op") if isinstance(frame, dict) else None
+            if op == "ping":
+                await ws_manager.send(websocket, '{"type":"pong"}')
+                continue
+            if op not in ("subscribe", "unsubscribe"):
+                await ws_manager.send(
+                    websocket, dump_json({"type": "error", "error": "Unknown op"}),
+                )
+                continue
+
+            channel = parse_channel(frame.get("channel"))
+            if channel is None:
+                await ws_manager.send(websocket, dump_json({
+                    "type": "error", "error": f"Invalid channel: {frame.get('channel')!r}",
+                }))
+                continue
+            if op == "subscribe":
+                if channel not in channels and len(channels) >= _MAX_CHANNELS:
+                    await ws_manager.send(websocket, dump_json({
+                        "type": "error", "error": f"Too many channels (max {_MAX_CHANNELS})",
+                    }))
+                    continue
+                if channel not in channels and not await _may_watch(user, channel):
+                    await ws_manager.send(websocket, dump_json({
+                        "type": "error", "error": f"Channel not found: {channel}",
+                    }))
+                    continue
+                ws_manager.subscribe(channel, websocket)
+                channels.add(channel)
+            else:
+                ws_manager.unsubscribe(channel, websocket)
+                channels.discard(channel)
+            await ws_manager.send(websocket, dump_json({"type": f"{op}d", "channel": channel}))
+    finally:
+        for channel in channels:
+            ws_manager.unsubscribe(channel, websocket)
+        ws_manager.release(websocket)
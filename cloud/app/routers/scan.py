@@ -3,50 +3,86 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
+import functools
 import json
 import logging
+import re
+from collections import OrderedDict, defaultdict
+from collections.abc import Iterable
 from datetime import UTC, datetime, timedelta
+from itertools import chain, islice
 from typing import Any
 
 import yaml
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Response, WebSocket
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 
+from app import llm_cache
 from app.auth import get_current_user
+from app.auth_patterns import build_auth_context_for_ai
 from app.config import settings
 from app.crawler import crawl_site, get_scan_limits
-from app.database import get_db
-from app.models import Scan, ScanStatus, User
-from app.scenario_utils import (
-    DEFAULT_AI_MODELS as _DEFAULT_MODELS,
-)
+from app.database import async_session, get_db
+from app.models import Scan, ScanStatus, Test, TestStatus, User
+from app.routers.documents import get_user_doc_text
 from app.scenario_utils import (
+    PromptTemplate,
+    button_key,
     compress_observations_for_ai,
+    dump_json,
+    dump_json_prefix,
     ensure_post_submit_assert,
     fix_field_targets,
     fix_form_submit_steps,
+    form_key,
+    nav_key,
     parse_json,
+    scenario_list_adapter,
+    scenarios_to_yaml,
+    settings_ai_config,
+    shared_adapter,
+    unique_elements,
     validate_and_retry,
 )
+from app.scenario_utils import (
+    YamlDumper as _YamlDumper,
+)
 from app.schemas import (
     ScanExecuteRequest,
     ScanPlanRequest,
     ScanPlanResponse,
     ScanRequest,
     ScanResponse,
-    ScanSummary,
 )
 from app.test_patterns import (
     build_pattern_summary,
     build_pattern_tests,
     match_elements_to_patterns,
 )
-from app.ws import ws_manager
+from app.ws import scan_ws
+
+# The AAT core is optional for the cloud API — resolve it once at import
+# time; endpoints that need it check _AAT_IMPORT_ERROR instead.
+try:
+    from aat.adapters import ADAPTER_REGISTRY
+
+    _AAT_IMPORT_ERROR: str | None = None
+except ImportError as _exc:
+    ADAPTER_REGISTRY = {}  # type: ignore[misc]
+    _AAT_IMPORT_ERROR = str(_exc)
 
 router = APIRouter(prefix="/api/scan", tags=["scan"])
 logger = logging.getLogger(__name__)
 
+# Background crawls: the event loop only keeps weak references to tasks, so
+# hold them here until done; each crawl drives a browser, so cap how many run
+_crawl_tasks: set[asyncio.Task[None]] = set()
+_crawl_slots = asyncio.Semaphore(settings.max_concurrent_scans)
+
 # ---------------------------------------------------------------------------
 # Business test templates — site-type-specific test suggestions
 # ---------------------------------------------------------------------------
@@ -253,6 +289,88 @@ BUSINESS_TEMPLATES: dict[str, list[dict[str, Any]]] = {
 }
 
 
+def _index_templates_by_feature() -> dict[str, list[tuple[int, str, dict[str, Any]]]]:
+    """Map requires_feature → [(global order, site type, template), ...]."""
+    index: dict[str, list[tuple[int, str, dict[str, Any]]]] = defaultdict(list)
+    order = 0
+    for site_type, templates in BUSINESS_TEMPLATES.items():
+        for tmpl in templates:
+            index[tmpl["requires_feature"]].append((order, site_type, tmpl))
+            order += 1
+    return dict(index)
+
+
+_FEATURE_TO_TEMPLATES = _index_templates_by_feature()
+
+
+@functools.lru_cache(maxsize=128)
+def _select_business_templates(
+    site_type: str, features: frozenset[str],
+) -> tuple[dict[str, Any], ...]:
+    """Templates for the default plan's business category, one per feature.
+
+    Static per (site type, detected features), so memoized.
+    """
+    covered_features: set[str] = set()
+    selected: list[dict[str, Any]] = []
+
+    # Phase 1: site-type-specific templates
+    for tmpl in BUSINESS_TEMPLATES.get(site_type, ()):
+        req_feat = tmpl["requires_feature"]
+        if req_feat in features and req_feat not in covered_features:
+            covered_features.add(req_feat)
+            selected.append(tmpl)
+
+    # Phase 2: cross-cutting — first template from another site type for
+    # each still-uncovered detected feature, kept in BUSINESS_TEMPLATES order
+    cross_cutting: list[tuple[int, dict[str, Any]]] = []
+    for feat in features - covered_features:
+        for order, other_type, tmpl in _FEATURE_TO_TEMPLATES.get(feat, ()):
+            if other_type != site_type:
+                cross_cutting.append((order, tmpl))
+                break
+    cross_cutting.sort(key=lambda item: item[0])
+    selected.extend(tmpl for _, tmpl in cross_cutting)
+    return tuple(selected)
+
+
+def _index_business_hints() -> dict[str, tuple[tuple[str, str], ...]]:
+    """Map site type → ((requires_feature, hint line), ...) in prompt order.
+
+    The site type's own templates come first, then every other type's; only
+    the first template per feature yields a hint. Key "" covers site types
+    without templates.
+    """
+    def _hints(site_type: str) -> tuple[tuple[str, str], ...]:
+        seen: set[str] = set()
+        hints: list[tuple[str, str]] = []
+        for st in [site_type] + [k for k in BUSINESS_TEMPLATES if k != site_type]:
+            for tmpl in BUSINESS_TEMPLATES.get(st, ()):
+                feat = tmpl["requires_feature"]
+                if feat not in seen:
+                    seen.add(feat)
+                    hints.append((feat, f"- {tmpl.get('name_en', '')}: {tmpl.get('desc_en', '')}"))
+        return tuple(hints)
+
+    index = {site_type: _hints(site_type) for site_type in BUSINESS_TEMPLATES}
+    index[""] = _hints("")
+    return index
+
+
+_BUSINESS_HINTS = _index_business_hints()
+
+
+@functools.lru_cache(maxsize=128)
+def _business_hints(site_type: str, features: frozenset[str]) -> str:
+    """Prompt text of the business hints for *features* (few distinct inputs)."""
+    lines = [
+        line
+        for feat, line in _BUSINESS_HINTS.get(site_type, _BUSINESS_HINTS[""])
+        if feat in features
+    ]
+    return "\n".join(lines) if lines else "No specific business tests for this site type."
+
+
 # ---------------------------------------------------------------------------
 # Feature → Required test mapping (post-plan validation)
 # If a feature is detected, the corresponding test MUST exist in the plan.
@@ -478,19 +596,108 @@ def _dedup_section_nav_tests(plan: dict[str, Any]) -> dict[str, Any]:
 _parse_json = parse_json  # alias for internal usage
 
 
+# (scan id, completed_at) → parsed response columns of a few finished scans
+_SCAN_COLUMNS_CACHE_SIZE = 4
+_scan_columns_cache: OrderedDict[
+    tuple[int, datetime], tuple[Any, Any, Any, Any]
+] = OrderedDict()
+
+
+def _parsed_scan_columns(scan: Scan) -> tuple[Any, Any, Any, Any]:
+    """Parsed summary, pages, broken links and features of *scan*.
+
+    These columns are written once, together with ``completed_at``, so a
+    finished scan's parse is memoized on (id, completed_at): polling GETs
+    parse each (potentially multi-MB) blob once, and the key holds no column
+    text. Results are shared between calls and must not be mutated.
+    """
+    if scan.completed_at is None:
+        return _parse_scan_columns(scan)
+    key = (scan.id, scan.completed_at)
+    cached = _scan_columns_cache.get(key)
+    if cached is not None:
+        _scan_columns_cache.move_to_end(key)
+        return cached
+    parsed = _scan_columns_cache[key] = _parse_scan_columns(scan)
+    while len(_scan_columns_cache) > _SCAN_COLUMNS_CACHE_SIZE:
+        _scan_columns_cache.popitem(last=False)
+    return parsed
+
+
+def _parse_scan_columns(scan: Scan) -> tuple[Any, Any, Any, Any]:
+    return (
+        parse_json(scan.summary_json), parse_json(scan.pages_json),
+        parse_json(scan.broken_links_json), parse_json(scan.detected_features),
+    )
+
+
+def _first_page_observations(pages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Observations of the first page that has any (legacy per-page storage)."""
+    for p in pages:
+        if p.get("observations"):
+            return list(p["observations"])
+    return []
+
+
+def _page_outline(pages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Slim per-page view of a crawl holding only what ``/plan`` reads.
+
+    Each page keeps its URL, first 10 links (text/href) and the nav menus,
+    forms and buttons not already seen on an earlier page; screenshots,
+    inputs and the rest are dropped. Observations stay on the first page
+    that has any. The plan prompt built from it matches the one built from
+    the full pages, without decoding the pages blob (screenshots included).
+    """
+    seen_navs: set[Any] = set()
+    seen_forms: set[Any] = set()
+    seen_buttons: set[Any] = set()
+
+    outline: list[dict[str, Any]] = []
+    observations_kept = False
+    for p in pages:
+        entry: dict[str, Any] = {"url": p.get("url", "")}
+        elements = (
+            ("nav_menus", unique_elements(p.get("nav_menus", ()), nav_key, seen_navs)),
+            ("forms", unique_elements(p.get("forms", ()), form_key, seen_forms)),
+            ("buttons", unique_elements(p.get("buttons", ()), button_key, seen_buttons)),
+            ("links", [
+                {"text": link.get("text", ""), "href": link.get("href", "")}
+                for link in islice(p.get("links", ()), 10)
+            ]),
+        )
+        entry.update((name, items) for name, items in elements if items)
+        if not observations_kept and p.get("observations"):
+            entry["observations"] = p["observations"]
+            observations_kept = True
+        outline.append(entry)
+    return outline
+
+
+# Columns ScanResponse is built from — plan, logs and observation blobs
+# are not part of the response and stay in the DB
+_SCAN_RESPONSE_COLUMNS = (
+    Scan.target_url, Scan.status, Scan.summary_json, Scan.pages_json,
+    Scan.broken_links_json, Scan.detected_features, Scan.error_message,
+    Scan.created_at, Scan.completed_at,
+)
+
+
 def _scan_to_response(scan: Scan) -> dict:
-    """Convert Scan ORM to response dict."""
-    summary = _parse_json(scan.summary_json)
+    """Convert Scan ORM to response dict.
+
+    Values stay plain parsed JSON — the ScanResponse response_model
+    validates them once; building ScanSummary here would validate twice.
+    Only ``_SCAN_RESPONSE_COLUMNS`` are read.
+    """
+    summary, pages, broken_links, features = _parsed_scan_columns(scan)
     return {
         "id": scan.id,
         "target_url": scan.target_url,
         "status": scan.status,
-        "summary": ScanSummary(**summary) if summary else None,
-        "pages": _parse_json(scan.pages_json),
-        "broken_links": _parse_json(scan.broken_links_json),
-        "detected_features": _parse_json(scan.detected_features) or [],
-        "observations": _parse_json(getattr(scan, "observations_json", None)) or [],
-        "logs": _parse_json(getattr(scan, "logs_json", None)) or [],
+        "summary": summary or None,
+        "pages": pages,
+        "broken_links": broken_links,
+        "detected_features": features or [],
         "error_message": scan.error_message,
         "created_at": scan.created_at,
         "completed_at": scan.completed_at,
@@ -502,6 +709,39 @@ def _scan_to_response(scan: Scan) -> dict:
 # ---------------------------------------------------------------------------
 
 
+def _model_response(model: BaseModel) -> Response:
+    """JSON response encoded by pydantic-core in one pass.
+
+    For large payloads: returning a dict makes FastAPI validate it against
+    ``response_model``, convert it to jsonable Python and then json.dumps
+    it. The endpoint's ``response_model`` still documents the schema.
+    """
+    return Response(model.model_dump_json(), media_type="application/json")
+
+
+def _crawl_result_values(result: dict[str, Any], logs: list[dict[str, Any]]) -> dict[str, Any]:
+    """Column values for a finished crawl (CPU-bound JSON encoding)."""
+    values: dict[str, Any] = {}
+    if "error" in result:
+        values["status"] = ScanStatus.FAILED
+        values["error_message"] = result["error"]
+    else:
+        values["status"] = ScanStatus.COMPLETED
+        values["summary_json"] = dump_json(result["summary"])
+        values["pages_json"] = dump_json(result["pages"])
+        values["page_outline_json"] = dump_json(_page_outline(result["pages"]))
+        values["broken_links_json"] = dump_json(result["broken_links"])
+        values["detected_features"] = dump_json(result["detected_features"])
+        # Store observations if available
+        if result.get("observations"):
+            values["observations_json"] = dump_json(result["observations"])
+    # Always persist collected scan logs
+    if logs:
+        values["logs_json"] = dump_json(logs)
+    values["completed_at"] = datetime.now(UTC)
+    return values
+
+
 @router.post("", response_model=ScanResponse, status_code=201)
 async def start_scan(
     body: ScanRequest,
@@ -522,21 +762,22 @@ async def start_scan(
         max_depth=max_depth,
     )
     db.add(scan)
+    # id comes back with the INSERT and created_at is a Python-side default;
+    # the session does not expire on commit, so no refresh SELECT is needed
     await db.commit()
-    await db.refresh(scan)
 
     scan_id = scan.id
 
     # Run crawl in background
     async def _run_crawl() -> None:
-        # Wrap WSManager to collect scan_log messages for persistence
+        # Wrap the scan topic to collect scan_log messages for persistence
         collected_logs: list[dict[str, Any]] = []
 
         class _LogCollectingWS:
             """Proxy that intercepts scan_log broadcasts."""
 
             async def broadcast(self, sid: int, msg: dict) -> None:
-                await ws_manager.broadcast(sid, msg)
+                await scan_ws.broadcast(sid, msg)
                 if msg.get("type") == "scan_log":
                     collected_logs.append({
                         "phase": msg.get("phase", ""),
@@ -544,78 +785,96 @@ async def start_scan(
                         "level": msg.get("level"),
                     })
 
+        log_ws = _LogCollectingWS()
         try:
-            result = await crawl_site(
-                str(body.target_url),
-                scan_id,
-                max_pages=max_pages,
-                max_depth=max_depth,
-                total_timeout=float(tier_limits["timeout"]),
-                screenshot_limit=tier_limits["screenshots"],
-                ws=_LogCollectingWS(),
-            )
-
-            # Update DB with results FIRST, then broadcast
-            from app.database import async_session
-
-            async with async_session() as session:
-                s = (await session.execute(
-                    select(Scan).where(Scan.id == scan_id)
-                )).scalar_one()
+            if _crawl_slots.locked():
+                # Tell the client why nothing happens until a slot frees up
+                await log_ws.broadcast(scan_id, {
+                    "type": "scan_log",
+                    "phase": "queued",
+                    "message": "다른 스캔이 끝나기를 기다리는 중... (동시 스캔 한도)",
+                })
+            async with _crawl_slots:
+                result = await crawl_site(
+                    str(body.target_url),
+                    scan_id,
+                    max_pages=max_pages,
+                    max_depth=max_depth,
+                    total_timeout=float(tier_limits["timeout"]),
+                    screenshot_limit=tier_limits["screenshots"],
+                    ws=log_ws,
+                )
 
-                if "error" in result:
-                    s.status = ScanStatus.FAILED
-                    s.error_message = result["error"]
-                else:
-                    s.status = ScanStatus.COMPLETED
-                    s.summary_json = json.dumps(result["summary"])
-                    s.pages_json = json.dumps(result["pages"])
-                    s.broken_links_json = json.dumps(result["broken_links"])
-                    s.detected_features = json.dumps(result["detected_features"])
-                    # Store observations if available
-                    if result.get("observations"):
-                        s.observations_json = json.dumps(result["observations"])
-                # Always persist collected scan logs
-                if collected_logs:
-                    s.logs_json = json.dumps(collected_logs)
-                s.completed_at = datetime.now(UTC)
-                await session.commit()
+            # Serialize before opening the session so it is held only for
+            # the single UPDATE; large crawls are encoded off the event loop
+            values = await asyncio.to_thread(_crawl_result_values, result, collected_logs)
 
-            # Broadcast scan_complete AFTER DB commit so /plan endpoint sees COMPLETED status
             if "error" in result:
-                await ws_manager.broadcast(scan_id, {
-                    "type": "scan_error",
-                    "error": result["error"],
-                })
+                event = {"type": "scan_error", "error": result["error"]}
             else:
-                await ws_manager.broadcast(scan_id, {
-                    "type": "scan_complete",
-                    "summary": result["summary"],
-                })
-
-        except Exception as exc:
-            logger.exception("Scan %d failed", scan_id)
-            from app.database import async_session
+                event = {"type": "scan_complete", "summary": result["summary"]}
 
+            # Update DB with results FIRST, then broadcast — the /plan endpoint
+            # must see COMPLETED
             async with async_session() as session:
-                s = (await session.execute(
-                    select(Scan).where(Scan.id == scan_id)
-                )).scalar_one()
-                s.status = ScanStatus.FAILED
-                s.error_message = str(exc)[:500]
-                s.completed_at = datetime.now(UTC)
+                await session.execute(
+                    update(Scan).where(Scan.id == scan_id).values(**values)
+                )
                 await session.commit()
 
-            await ws_manager.broadcast(scan_id, {
-                "type": "scan_error",
-                "error": str(exc)[:500],
-            })
+        except asyncio.CancelledError:
+            # shutdown_crawls gave up waiting — do not leave it SCANNING
+            logger.warning("Scan %d interrupted by shutdown", scan_id)
+            error = "Scan interrupted by server shutdown"
+            await _mark_failed(error)
+            await _notify({"type": "scan_error", "error": error})
+            raise
+        except Exception as exc:
+            logger.exception("Scan %d failed", scan_id)
+            error = str(exc)[:500]
+            await _mark_failed(error)
+            event = {"type": "scan_error", "error": error}
+
+        # Outside the error handling: the stored status is final by now, and
+        # a failed notification must not turn a finished scan into FAILED
+        await _notify(event)
+
+    async def _mark_failed(error: str) -> None:
+        async with async_session() as session:
+            await session.execute(
+                update(Scan).where(Scan.id == scan_id).values(
+                    status=ScanStatus.FAILED,
+                    error_message=error,
+                    completed_at=datetime.now(UTC),
+                )
+            )
+            await session.commit()
 
-    asyncio.create_task(_run_crawl())
+    async def _notify(event: dict[str, Any]) -> None:
+        try:
+            await scan_ws.broadcast(scan_id, event)
+        except Exception:
+            logger.warning("Scan %d: result notification failed", scan_id, exc_info=True)
+
+    task = asyncio.create_task(_run_crawl())
+    _crawl_tasks.add(task)
+    task.add_done_callback(_crawl_tasks.discard)
 
     return _scan_to_response(scan)
 
 
+async def shutdown_crawls(timeout: float = 10.0) -> None:
+    """Give in-flight crawls *timeout* seconds to finish, then cancel them."""
+    if not _crawl_tasks:
+        return
+    _, pending = await asyncio.wait(set(_crawl_tasks), timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+        logger.info("Cancelled %d in-flight scan(s) on shutdown", len(pending))
+
+
 # ---------------------------------------------------------------------------
 # GET /api/scan/{scan_id} — get scan result
 # ---------------------------------------------------------------------------
@@ -626,20 +885,30 @@ async def get_scan(
     scan_id: int,
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
-) -> dict:
-    """Get scan result by ID."""
-    query = select(Scan).where(Scan.id == scan_id, Scan.user_id == user.id)
-    scan = (await db.execute(query)).scalar_one_or_none()
+) -> Response:
+    """Get scan result by ID.
+
+    Polled while a scan runs and returns the full pages blob once it is
+    done, hence the single-pass ``_model_response`` encoding.
+    """
+    query = (
+        select(Scan)
+        .where(Scan.id == scan_id, Scan.user_id == user.id)
+        .options(load_only(*_SCAN_RESPONSE_COLUMNS, raiseload=True))
+    )
+    scan = await db.scalar(query)
     if scan is None:
         raise HTTPException(status_code=404, detail="Scan not found")
-    return _scan_to_response(scan)
+    return _model_response(ScanResponse.model_validate(_scan_to_response(scan)))
 
 
 # ---------------------------------------------------------------------------
 # POST /api/scan/{scan_id}/plan — AI test plan generation
 # ---------------------------------------------------------------------------
 
-_PLAN_PROMPT = """\
+# Static rules + output schema — sent as the system prompt so providers can
+# cache it (byte-identical across calls; no format placeholders).
+_PLAN_SYSTEM = """\
 You are a senior QA engineer creating a test plan based on actual crawl data and \
 **real interaction observations**.
 
@@ -649,16 +918,16 @@ CRITICAL RULES:
 3. Use EXACT text strings from the crawl data (copy-paste, do not paraphrase).
 4. Group tests by category with clear priority.
 5. For all text assertions, set case_insensitive: true to handle dynamic casing.
-6. Respond in {language}.
+6. Respond in the language given under "## Language" in the request.
 7. FORM FIELD RULE: For tests involving forms, reference the EXACT field data from crawl data:
    - Use placeholder text as-is (e.g., if placeholder is "이메일", use "이메일" NOT "Email")
    - Use label text as-is (e.g., if label is "비밀번호", keep "비밀번호" NOT "Password")
    - For auth_fields, set the "label" to match the actual form field label/placeholder from crawl data
    - NEVER translate form field labels or placeholders into another language
 8. For auth_fields in test entries: copy the exact label/placeholder from the crawl data forms.
-   Example: if crawl shows {{placeholder: "이메일", label: "이메일 주소"}}, then auth_fields should be:
-   {{"key": "email", "label": "이메일 주소", "type": "email", "required": true}}
-9. **OBSERVATION-BASED PLANNING**: The "Interaction Observations" section below contains
+   Example: if crawl shows {placeholder: "이메일", label: "이메일 주소"}, then auth_fields should be:
+   {"key": "email", "label": "이메일 주소", "type": "email", "required": true}
+9. **OBSERVATION-BASED PLANNING**: The "Interaction Observations" section of the request contains
    REAL results from actually clicking each element. DO NOT GUESS what happens —
    use the observed change type (page_navigation, modal_opened, anchor_scroll, section_change)
    to decide how to assert test results:
@@ -683,47 +952,12 @@ CRITICAL RULES:
    - carousel → test slide navigation
    - form → test input validation with actual fields
 
-## Site Info
-- URL: {target_url}
-- Pages scanned: {total_pages}
-- Detected features: {detected_features}
-- Site type: {site_type} (confidence: {site_type_confidence})
-
-## Crawl Data
-
-### Navigation Menus
-{nav_menus_json}
-
-### Forms
-{forms_json}
-
-### Buttons
-{buttons_json}
-
-### Links (sample)
-{links_json}
-
-### Broken Links
-{broken_links_json}
-
-### Interaction Observations (REAL click results — DO NOT GUESS)
-{observations_json}
-
-## Business Test Hints (based on site type)
-{business_hints}
-
-## Reference Documents
-{reference_documents}
-
-## Special Instructions
-{special_instructions}
-
 ## Generate Test Plan
 
 Create a JSON test plan with these categories. Only include categories that have matching data:
 
 CATEGORY "basic" - Basic Health Check (auto_selected: true):
-- broken_link_check: Check all broken links found ({broken_count} found)
+- broken_link_check: Check all broken links found (count in Site Info)
 - nav_menu_test: Click each navigation menu item and verify page loads
 - page_load_test: Verify all scanned pages load without errors
 
@@ -737,7 +971,7 @@ CATEGORY "auth" - Authentication (only if login_form detected):
 
 CATEGORY "business" - Business Flows (based on detected features):
 - Only for features actually detected in the crawl
-- Use the business test hints above as guidance
+- Use the business test hints in the request as guidance
 - Test names and descriptions MUST reflect actual observed behavior, NOT generic labels
 - WRONG: "Product Browsing Test" (generic — no "product" in observations)
 - WRONG: "기능 섹션 네비게이션 테스트" (this is just section navigation — ALREADY covered by nav menu test)
@@ -751,7 +985,7 @@ IMPORTANT — SELECTOR-FIRST RULE:
 - Include the access path: how to reach each element (e.g., "homepage → click a[href='#login'] → modal").
 
 For each test provide:
-{{
+{
     "id": "t1",
     "name": "Test name",
     "description": "What this test does",
@@ -763,21 +997,102 @@ For each test provide:
     "test_data_fields": [],
     "actual_elements": ["selector or text used"],
     "access_path": "homepage → click selector → result"
-}}
+}
 
 Return ONLY valid JSON in this exact structure:
-{{
+{
     "categories": [
-        {{
+        {
             "id": "basic",
             "name": "Category Name",
             "auto_selected": true,
             "tests": [...]
-        }}
+        }
     ]
-}}\
+}\
 """
 
+_MAX_CACHE_BREAKPOINTS = 4
+
+# Crawl data sections of the plan prompt are cut at this many chars
+_PLAN_SECTION_CHARS = 3000
+
+# Each sampled link is at least 40 chars of indented JSON, so 75 of them
+# already fill the 3000-char links slice of the plan prompt
+_PLAN_LINK_SAMPLE_CAP = 75
+
+
+def _prompt_slice(
+    items: Iterable[dict[str, Any]], limit: int = _PLAN_SECTION_CHARS,
+) -> list[dict[str, Any]]:
+    """Leading *items* whose JSON reaches *limit* chars; the rest is not consumed.
+
+    Compact JSON is never longer than the indented prompt form, so cutting
+    the result at *limit* gives the same text as cutting the full list.
+    """
+    out: list[dict[str, Any]] = []
+    size = 0
+    for item in items:
+        if size >= limit:
+            break
+        out.append(item)
+        size += len(dump_json(item))
+    return out
+
+# Per-scan data — the user message, split into blocks ordered from most to
+# least stable across re-scans of a site. Anthropic gets a cache breakpoint
+# after each block but the last, so e.g. new buttons do not invalidate the
+# cached language / documents / hints / navigation prefix.
+_PLAN_USER_SECTIONS = (
+    # Per user + site type
+    """\
+## Language
+{language}
+
+## Reference Documents
+{reference_documents}
+
+## Business Test Hints (based on site type)
+{business_hints}\
+""",
+    # Site structure
+    """\
+## Crawl Data
+
+### Navigation Menus
+{nav_menus_json}
+
+### Forms
+{forms_json}\
+""",
+    # Changes on most re-scans
+    """\
+### Buttons
+{buttons_json}
+
+### Links (sample)
+{links_json}
+
+### Broken Links
+{broken_links_json}
+
+### Interaction Observations (REAL click results — DO NOT GUESS)
+{observations_json}
+
+## Site Info
+- URL: {target_url}
+- Pages scanned: {total_pages}
+- Detected features: {detected_features}
+- Site type: {site_type} (confidence: {site_type_confidence})
+- Broken links: {broken_count}
+
+## Special Instructions
+{special_instructions}
+
+Generate the test plan JSON now.\
+""",
+)
+
 
 @router.post("/{scan_id}/plan", response_model=ScanPlanResponse)
 async def generate_plan(
@@ -785,10 +1100,19 @@ async def generate_plan(
     body: ScanPlanRequest,
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
-) -> dict:
+) -> Response:
     """Generate an AI test plan from scan results."""
-    query = select(Scan).where(Scan.id == scan_id, Scan.user_id == user.id)
-    scan = (await db.execute(query)).scalar_one_or_none()
+    # Only the crawl columns the prompt needs — plan/logs blobs stay in the DB
+    query = (
+        select(Scan)
+        .where(Scan.id == scan_id, Scan.user_id == user.id)
+        .options(load_only(
+            Scan.status, Scan.target_url, Scan.page_outline_json, Scan.broken_links_json,
+            Scan.detected_features, Scan.summary_json, Scan.observations_json,
+            raiseload=True,
+        ))
+    )
+    scan = await db.scalar(query)
     if scan is None:
         raise HTTPException(status_code=404, detail="Scan not found")
     if scan.status not in (ScanStatus.COMPLETED, ScanStatus.PLANNED):
@@ -797,31 +1121,35 @@ async def generate_plan(
             detail=f"Cannot generate plan in '{scan.status.value}' status",
         )
 
-    pages = _parse_json(scan.pages_json) or []
+    # The outline written at crawl time; scans from before it existed
+    # derive it from the full pages blob
+    pages = _parse_json(scan.page_outline_json)
+    if pages is None:
+        pages_json = await db.scalar(select(Scan.pages_json).where(Scan.id == scan_id))
+        pages = _page_outline(_parse_json(pages_json) or [])
     broken = _parse_json(scan.broken_links_json) or []
     features = _parse_json(scan.detected_features) or []
     summary = _parse_json(scan.summary_json) or {}
     observations = _parse_json(getattr(scan, "observations_json", None)) or []
 
-    # Collect elements for the prompt
-    nav_menus = []
-    forms = []
-    buttons = []
-    links_sample = []
-    for p in pages:
-        nav_menus.extend(p.get("nav_menus", []))
-        forms.extend(p.get("forms", []))
-        buttons.extend(p.get("buttons", []))
-        for link in p.get("links", [])[:10]:
-            links_sample.append({"text": link.get("text", ""), "href": link.get("href", "")})
-        # Also collect per-page observations
-        if not observations:
-            observations.extend(p.get("observations", []))
+    # Collect elements for the prompt (the outline holds no repeats), only
+    # as many as the truncated prompt sections can show
+    nav_menus = _prompt_slice(chain.from_iterable(p.get("nav_menus", ()) for p in pages))
+    forms = _prompt_slice(chain.from_iterable(p.get("forms", ()) for p in pages))
+    buttons = _prompt_slice(chain.from_iterable(p.get("buttons", ()) for p in pages))
+    # Up to 10 links per page, and no more than the prompt slice can show
+    links_sample = list(islice((
+        {"text": link.get("text", ""), "href": link.get("href", "")}
+        for p in pages
+        for link in islice(p.get("links", ()), 10)
+    ), _PLAN_LINK_SAMPLE_CAP))
+    # Fall back to the first page that recorded observations
+    if not observations:
+        observations = _first_page_observations(pages)
 
     # Truncate for prompt size
-    def _trunc_json(obj: Any, limit: int = 3000) -> str:
-        s = json.dumps(obj, ensure_ascii=False, indent=2)
-        return s[:limit] if len(s) > limit else s
+    def _trunc_json(obj: Any, limit: int = _PLAN_SECTION_CHARS) -> str:
+        return dump_json_prefix(obj, limit, indent=True)
 
     # Build site type info for prompt
     site_type_info = summary.get("site_type") or {}
@@ -832,26 +1160,8 @@ async def generate_plan(
         site_type_info.get("confidence", 0.0) if isinstance(site_type_info, dict) else 0.0
     )
 
-    # Build business hints from templates (site-type + cross-cutting)
-    business_hints_lines = []
-    hint_covered: set[str] = set()
-    for st in [site_type_name] + [k for k in BUSINESS_TEMPLATES if k != site_type_name]:
-        for tmpl in BUSINESS_TEMPLATES.get(st, []):
-            req_feat = tmpl.get("requires_feature", "")
-            if req_feat and req_feat not in features:
-                continue
-            if req_feat in hint_covered:
-                continue
-            if req_feat:
-                hint_covered.add(req_feat)
-            name = tmpl.get("name_en", "")
-            desc = tmpl.get("desc_en", "")
-            business_hints_lines.append(f"- {name}: {desc}")
-    business_hints = (
-        "\n".join(business_hints_lines)
-        if business_hints_lines
-        else "No specific business tests for this site type."
-    )
+    # Business hints from templates (site-type + cross-cutting)
+    business_hints = _business_hints(site_type_name, frozenset(features))
 
     # Build special instructions based on detected features
     special_parts: list[str] = []
@@ -884,8 +1194,6 @@ async def generate_plan(
         special_parts.append(pattern_hint)
 
     # Auth pattern context — inject limitations and pattern hints
-    from app.auth_patterns import build_auth_context_for_ai
-
     for obs in observations:
         auth_info = obs.get("auth_pattern")
         if auth_info:
@@ -897,13 +1205,11 @@ async def generate_plan(
     special_instructions = "\n\n".join(special_parts)
 
     # Fetch user reference documents
-    from app.routers.documents import get_user_doc_text
-
     ref_docs = await get_user_doc_text(user.id, db)
 
     # Build AI prompt
     lang = "Korean" if body.language == "ko" else "English"
-    prompt = _PLAN_PROMPT.format(
+    prompt_fields = dict(
         language=lang,
         target_url=scan.target_url,
         total_pages=summary.get("total_pages", len(pages)),
@@ -925,40 +1231,67 @@ async def generate_plan(
         reference_documents=(ref_docs[:6000] if ref_docs else "No reference documents provided."),
         special_instructions=special_instructions,
     )
+    prompt_blocks = [section.format(**prompt_fields) for section in _PLAN_USER_SECTIONS]
+    prompt = "\n\n".join(prompt_blocks)
 
     # Try AI plan generation, fall back to default plan on failure
     plan = None
+    plan_text: str | None = None  # AI reply's JSON text, reused if plan is untouched
     lang = body.language or "en"
 
     try:
-        from aat.adapters import ADAPTER_REGISTRY
-        from aat.core.models import AIConfig
+        if _AAT_IMPORT_ERROR is not None:
+            raise RuntimeError(f"AAT core not installed: {_AAT_IMPORT_ERROR}")
 
-        ai_config = AIConfig(
-            provider=settings.ai_provider,
-            api_key=settings.ai_api_key,
-            model=settings.ai_model or _DEFAULT_MODELS.get(settings.ai_provider, ""),
-        )
+        ai_config = settings_ai_config()
         adapter_cls = ADAPTER_REGISTRY.get(ai_config.provider)
         if adapter_cls is None:
             raise ValueError(f"Unknown AI provider: {ai_config.provider}")
 
-        adapter = adapter_cls(ai_config)
-        raw_response = await _ai_raw_call(adapter, prompt)
-        plan = _extract_json(raw_response)
-
-        categories = plan.get("categories", [])
-        if not categories:
-            logger.warning("AI returned no categories, using default plan")
+        # Identical crawl data → identical prompt; reuse the earlier answer
+        cache_key = llm_cache.make_key(
+            ai_config.provider, ai_config.model, _PLAN_SYSTEM, prompt,
+        )
+        # Same user + site + model with a near-identical re-scan also counts,
+        # as long as the short sections a re-plan may change are identical —
+        # they barely move the similarity of the whole prompt
+        settings_key = llm_cache.make_key(
+            prompt_fields["language"], prompt_fields["reference_documents"],
+            special_instructions,
+        ).hex()
+        similar_scope = (
+            f"plan|{user.id}|{scan.target_url}|{ai_config.provider}|{ai_config.model}"
+            f"|{settings_key}"
+        )
+        raw_response = llm_cache.get(cache_key)
+        if raw_response is None:
+            raw_response = llm_cache.get_similar(similar_scope, prompt)
+        from_cache = raw_response is not None
+        if raw_response is None:
+            adapter = shared_adapter(adapter_cls, ai_config)
+            raw_response = await _ai_raw_call(adapter, prompt_blocks, system=_PLAN_SYSTEM)
+        plan, plan_text = _extract_json_text(raw_response)
+
+        if not _is_usable_plan(plan):
+            logger.warning("AI returned no usable categories, using default plan")
             plan = None
+        elif from_cache:
+            logger.info("AI plan served from cache (scan_id=%d)", scan_id)
+        else:
+            # Only checked plans, re-encoded — a hit then parses plain JSON
+            cached_text = dump_json(plan)
+            llm_cache.put(cache_key, cached_text)
+            llm_cache.put_similar(similar_scope, prompt, cached_text)
     except Exception as exc:
         logger.warning("AI plan generation failed (%s), using default plan", exc)
         plan = None
 
     # Fallback: generate plan from crawl data without AI
     if plan is None:
+        plan_text = None
         plan = _generate_default_plan(
             scan, pages, broken, features, summary, lang, observations,
+            matched_patterns=matched_patterns,
         )
 
     # --- Debug logging ---
@@ -971,41 +1304,83 @@ async def generate_plan(
             logger.info("  %s", lo.get("access_path", ""))
 
     # --- Post-plan validation: force-add tests for detected features ---
+    shape = _plan_shape(plan)
     plan = _validate_plan_against_features(plan, features, lang)
+    added = _plan_shape(plan) != shape
 
     # --- Dedup: remove section nav tests that duplicate nav menu test ---
+    shape = _plan_shape(plan)
     plan = _dedup_section_nav_tests(plan)
+    removed = _plan_shape(plan) != shape
 
     categories = plan.get("categories", [])
 
-    # Save plan to DB
-    scan.plan_json = json.dumps(plan, ensure_ascii=False)
+    # Save plan to DB (matched patterns are reused by /execute). Both passes
+    # above only add/remove tests or categories, so an unchanged shape means
+    # the AI's own JSON text still describes the plan.
+    if plan_text is None or added or removed:
+        plan_text = dump_json(plan)
+    scan.plan_json = plan_text
+    scan.matched_patterns_json = dump_json(matched_patterns)
     scan.status = ScanStatus.PLANNED
     await db.commit()
 
-    return {"scan_id": scan_id, "categories": categories}
+    return _model_response(ScanPlanResponse(scan_id=scan_id, categories=categories))
+
 
+async def _ai_raw_call(
+    adapter: Any, prompt: str | list[str], system: str | None = None,
+) -> str:
+    """Call AI adapter for raw text response.
 
-async def _ai_raw_call(adapter: Any, prompt: str) -> str:
-    """Call AI adapter for raw text response."""
+    A static *system* prompt is sent first so it can be served from the
+    provider's prompt cache (explicit cache_control for Anthropic, automatic
+    prefix caching for OpenAI). *prompt* may be a list of blocks ordered
+    from most to least stable; Anthropic gets a cache breakpoint after each
+    block but the last, other providers see the blocks joined.
+    """
     client = getattr(adapter, "_client", None)
     config = getattr(adapter, "_config", None)
     model = config.model if config else ""
 
+    content: str | list[dict[str, Any]]
+    if isinstance(prompt, str):
+        content = prompt
+        prompt_text = prompt
+    else:
+        # Anthropic allows 4 breakpoints per request, one is the system block
+        cached = set(range(len(prompt) - 1)[-(_MAX_CACHE_BREAKPOINTS - 1):])
+        content = [
+            {"type": "text", "text": block, "cache_control": {"type": "ephemeral"}}
+            if i in cached
+            else {"type": "text", "text": block}
+            for i, block in enumerate(prompt)
+        ]
+        prompt_text = "\n\n".join(prompt)
+
     # Anthropic-style (ClaudeAdapter._client = AsyncAnthropic)
     if client and hasattr(client, "messages") and hasattr(client.messages, "create"):
+        kwargs: dict[str, Any] = {}
+        if system:
+            kwargs["system"] = [
+                {"type": "text", "text": system, "cache_control": {"type": "ephemeral"}},
+            ]
         response = await client.messages.create(
             model=model,
             max_tokens=4096,
-            messages=[{"role": "user", "content": prompt}],
+            messages=[{"role": "user", "content": content}],
+            **kwargs,
         )
         return response.content[0].text if response.content else ""
 
     # OpenAI-style (OpenAIAdapter._client = AsyncOpenAI)
     if client and hasattr(client, "chat"):
+        messages = [{"role": "user", "content": prompt_text}]
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
         response = await client.chat.completions.create(
             model=model,
-            messages=[{"role": "user", "content": prompt}],
+            messages=messages,
             temperature=0.3,
         )
         return response.choices[0].message.content or ""
@@ -1021,8 +1396,13 @@ def _generate_default_plan(
     summary: dict,
     language: str,
     observations: list | None = None,
+    matched_patterns: list[dict[str, Any]] | None = None,
 ) -> dict:
-    """Generate a default test plan from crawl data without AI."""
+    """Generate a default test plan from crawl data without AI.
+
+    ``matched_patterns`` may be passed in when the caller has already run
+    ``match_elements_to_patterns`` on the same data.
+    """
     ko = language == "ko"
     categories = []
 
@@ -1047,22 +1427,19 @@ def _generate_default_plan(
         })
         tid += 1
 
-    # Nav menu tests
-    nav_items = []
-    for p in pages:
-        for nav in p.get("nav_menus", []):
-            for item in nav.get("items", []):
-                text = (item.get("text") or "").strip()
-                href = item.get("href", "")
-                if text and href and len(text) < 50:
-                    nav_items.append({"text": text, "href": href})
-    # Deduplicate by href
+    # Nav menu tests — items deduplicated by href as they are collected
     seen_hrefs: set[str] = set()
     unique_nav: list[dict] = []
-    for item in nav_items:
-        if item["href"] not in seen_hrefs:
-            seen_hrefs.add(item["href"])
-            unique_nav.append(item)
+    for p in pages:
+        for nav in p.get("nav_menus", ()):
+            for item in nav.get("items", ()):
+                href = item.get("href", "")
+                if not href or href in seen_hrefs:
+                    continue
+                text = (item.get("text") or "").strip()
+                if text and len(text) < 50:
+                    seen_hrefs.add(href)
+                    unique_nav.append({"text": text, "href": href})
 
     if unique_nav:
         basic_tests.append({
@@ -1147,26 +1524,10 @@ def _generate_default_plan(
     site_type_name = (
         site_type_info.get("type", "unknown") if isinstance(site_type_info, dict) else "unknown"
     )
-    feature_set = set(features)
-
-    def _add_template(tmpl: dict, covered: set[str]) -> dict[str, Any] | None:
-        """Convert a template to a test entry if its required feature is detected."""
-        req_feat = tmpl.get("requires_feature", "")
-        if req_feat and req_feat not in feature_set:
-            return None
-        if req_feat in covered:
-            return None  # already covered
-        if req_feat:
-            covered.add(req_feat)
-        return tmpl
+    selected_templates = _select_business_templates(site_type_name, frozenset(features))
 
-    covered_features: set[str] = set()
     business_tests = []
-
-    # Phase 1: site-type-specific templates
-    for tmpl in BUSINESS_TEMPLATES.get(site_type_name, []):
-        if _add_template(tmpl, covered_features) is None:
-            continue
+    for tmpl in selected_templates:
         test_entry: dict[str, Any] = {
             "id": f"t{tid}",
             "name": tmpl["name_ko"] if ko else tmpl["name_en"],
@@ -1183,29 +1544,6 @@ def _generate_default_plan(
         business_tests.append(test_entry)
         tid += 1
 
-    # Phase 2: cross-cutting — scan ALL site types for uncovered detected features
-    for other_type, other_templates in BUSINESS_TEMPLATES.items():
-        if other_type == site_type_name:
-            continue  # already processed
-        for tmpl in other_templates:
-            if _add_template(tmpl, covered_features) is None:
-                continue
-            test_entry = {
-                "id": f"t{tid}",
-                "name": tmpl["name_ko"] if ko else tmpl["name_en"],
-                "description": tmpl["desc_ko"] if ko else tmpl["desc_en"],
-                "priority": tmpl.get("priority", "medium"),
-                "estimated_time": tmpl.get("estimated_time", 30),
-                "requires_auth": tmpl.get("requires_auth", False),
-                "selected": not tmpl.get("requires_auth", False),
-            }
-            if tmpl.get("auth_fields"):
-                test_entry["auth_fields"] = tmpl["auth_fields"]
-            if tmpl.get("test_data_fields"):
-                test_entry["test_data_fields"] = tmpl["test_data_fields"]
-            business_tests.append(test_entry)
-            tid += 1
-
     if business_tests:
         categories.append({
             "id": "business",
@@ -1215,7 +1553,9 @@ def _generate_default_plan(
         })
 
     # 4. Standard element test patterns
-    matched = match_elements_to_patterns(pages, observations or [])
+    matched = matched_patterns
+    if matched is None:
+        matched = match_elements_to_patterns(pages, observations or [])
     pattern_category = build_pattern_tests(matched, language)
     if pattern_category:
         categories.append(pattern_category)
@@ -1223,33 +1563,91 @@ def _generate_default_plan(
     return {"categories": categories}
 
 
+# Fenced ```json block, then any fenced block (language tag skipped)
+_JSON_FENCE_PATTERNS = (
+    re.compile(r"```json\s*([\s\S]*?)```"),
+    re.compile(r"```\w*\s*([\s\S]*?)```"),
+)
+
+def _reject_constant(name: str) -> Any:
+    raise ValueError(f"Non-standard JSON constant: {name}")
+
+
+# Parses one JSON value at an offset and stops at its end (C scanner);
+# NaN/Infinity are not JSON and make the candidate invalid
+_JSON_DECODER = json.JSONDecoder(parse_constant=_reject_constant)
+# "{" positions tried for an object embedded in prose
+_MAX_JSON_STARTS = 5
+
+
 def _extract_json(text: str) -> dict:
     """Extract JSON object from AI response text."""
-    # Try direct parse
-    try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        pass
-
-    # Try to find JSON block in markdown code fence
-    import re
-    patterns = [
-        r"```json\s*([\s\S]*?)```",
-        r"```\s*([\s\S]*?)```",
-        r"\{[\s\S]*\}",
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, text)
-        if match:
-            candidate = match.group(1) if match.lastindex else match.group(0)
-            try:
-                return json.loads(candidate.strip())
-            except json.JSONDecodeError:
-                continue
+    return _extract_json_text(text)[0]
+
+
+def _extract_json_text(text: str) -> tuple[Any, str]:
+    """Like ``_extract_json`` but also return the JSON text that was parsed."""
+    # Try direct parse (only worth it when the reply is bare JSON)
+    tried = {text.strip()} if text.lstrip()[:1] in ("{", "[") else set()
+    if tried:
+        try:
+            return _JSON_DECODER.decode(text), text.strip()
+        except ValueError:
+            pass
+
+    # Fenced blocks — a ```json fence also matches the generic fence, so
+    # each text is parsed once
+    for pattern in _JSON_FENCE_PATTERNS:
+        match = pattern.search(text)
+        if not match:
+            continue
+        candidate = match.group(1).strip()
+        if candidate in tried:
+            continue
+        tried.add(candidate)
+        try:
+            return _JSON_DECODER.decode(candidate), candidate
+        except ValueError:
+            continue
+
+    # Object embedded in prose: decode from a "{" up to its own closing brace,
+    # so trailing text (even with braces) is ignored; no regex backtracking
+    start = text.find("{")
+    for _ in range(_MAX_JSON_STARTS):
+        if start < 0:
+            break
+        try:
+            obj, end = _JSON_DECODER.raw_decode(text, start)
+        except ValueError:
+            start = text.find("{", start + 1)
+            continue
+        return obj, text[start:end]
 
     raise ValueError(f"No valid JSON found in response: {text[:200]}")
 
 
+def _is_usable_plan(plan: Any) -> bool:
+    """Whether an AI *plan* has categories of test dicts the endpoint can use."""
+    if not isinstance(plan, dict):
+        return False
+    try:
+        categories = ScanPlanResponse(
+            scan_id=0, categories=plan.get("categories") or [],
+        ).categories
+    except ValidationError:
+        return False
+    return bool(categories) and all(
+        isinstance(tests, list) and all(isinstance(t, dict) for t in tests)
+        for tests in (c.get("tests", []) for c in categories)
+    )
+
+
+def _plan_shape(plan: dict[str, Any]) -> tuple[int, int]:
+    """(category count, test count) — detects tests added or removed."""
+    categories = plan.get("categories", [])
+    return len(categories), sum(len(c.get("tests", [])) for c in categories)
+
+
 def _build_observation_table(observations: list[dict]) -> str:
     """Convert raw observations into a structured reference table for AI.
 
@@ -1262,6 +1660,9 @@ def _build_observation_table(observations: list[dict]) -> str:
         return "No observations collected. Use crawl data forms/buttons for targets."
 
     lines: list[str] = []
+    # Collected in the same pass for the summary at the end
+    all_assert_texts: list[str] = []
+    all_element_texts: list[str] = []
     for i, obs in enumerate(observations, 1):
         elem = obs.get("element", {})
         change = obs.get("observed_change", {})
@@ -1274,6 +1675,8 @@ def _build_observation_table(observations: list[dict]) -> str:
         sel = elem.get("selector") or "NONE"
         txt = elem.get("text") or ""
         etype = elem.get("type") or ""
+        if txt:
+            all_element_texts.append(txt)
 
         lines.append(f"### Observation {i}: {txt}")
         lines.append(f"  - element.selector: {sel}")
@@ -1289,8 +1692,11 @@ def _build_observation_table(observations: list[dict]) -> str:
         if new_text:
             lines.append(
                 f"  - OBSERVED new_text (use for assert): "
-                f"{json.dumps(new_text[:10], ensure_ascii=False)}"
+                f"{dump_json(new_text[:10])}"
             )
+            for nt in new_text:
+                if nt.strip():
+                    all_assert_texts.append(nt.strip())
 
         # Modal form fields (for find_and_type targets)
         modal_fields = change.get("modal_form_fields", [])
@@ -1347,30 +1753,17 @@ def _build_observation_table(observations: list[dict]) -> str:
         lines.append("")
 
     # Add summary of all available texts for assertions
-    all_assert_texts: list[str] = []
-    all_element_texts: list[str] = []
-    for obs in observations:
-        elem = obs.get("element", {})
-        change = obs.get("observed_change", {})
-        if change.get("type") == "no_change":
-            continue
-        txt = elem.get("text", "")
-        if txt:
-            all_element_texts.append(txt)
-        for nt in change.get("new_text", []):
-            if nt.strip():
-                all_assert_texts.append(nt.strip())
     if all_assert_texts or all_element_texts:
         lines.append("### ===== AVAILABLE DATA SUMMARY =====")
         if all_element_texts:
             lines.append(
                 f"Clickable element texts: "
-                f"{json.dumps(all_element_texts, ensure_ascii=False)}"
+                f"{dump_json(all_element_texts)}"
             )
         if all_assert_texts:
             lines.append(
                 f"Observable texts (valid for assert): "
-                f"{json.dumps(all_assert_texts, ensure_ascii=False)}"
+                f"{dump_json(all_assert_texts)}"
             )
         lines.append("REMINDER: Only use texts from above for assert values. NEVER invent text.")
         lines.append("")
@@ -1536,10 +1929,44 @@ FINAL CHECK before responding:
    If not, REMOVE that assert step.
 2. Does every form scenario end with assert AFTER submit? If last step is find_and_click (submit),
    ADD wait + assert.
+3. For every find_and_click / find_and_type step, verify target.text (or target.selector)
+   matches an element in the Observation Reference Table or Crawl Data.
+   If not, replace it with the closest listed element — never invent targets.
+   (Targets are re-validated after you respond; unverified ones cost a full retry.)
 
 Return ONLY valid JSON array.\
 """
 
+# Parsed once; the prompt size is also known before formatting
+_EXECUTE_TEMPLATE = PromptTemplate(_EXECUTE_PROMPT)
+
+
+def _execute_prompt_len(fields: dict[str, str]) -> int:
+    """``len(_EXECUTE_PROMPT.format(**fields))`` without building the prompt."""
+    return _EXECUTE_TEMPLATE.length(fields)
+
+
+async def _generate_scenarios_cached(
+    adapter: Any, ai_config: Any, prompt: str,
+) -> list[Any]:
+    """``adapter.generate_scenarios`` behind the exact-match response cache.
+
+    Scenarios are cached as JSON strings and re-validated on a hit, since the
+    post-generation fixups modify the returned objects in place.
+    """
+    cache_key = llm_cache.make_key(
+        ai_config.provider, ai_config.model, ai_config.temperature, prompt,
+    )
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        logger.info("Scenario generation served from cache")
+        return scenario_list_adapter().validate_json(f"[{','.join(cached)}]")
+
+    scenarios: list[Any] = await adapter.generate_scenarios(prompt)
+    if scenarios:
+        llm_cache.put(cache_key, tuple(s.model_dump_json() for s in scenarios))
+    return scenarios
+
 
 @router.post("/{scan_id}/execute")
 async def execute_scan_tests(
@@ -1549,102 +1976,133 @@ async def execute_scan_tests(
     db: AsyncSession = Depends(get_db),
 ) -> dict:
     """Generate scenarios from selected tests and create a test execution."""
-    query = select(Scan).where(Scan.id == scan_id, Scan.user_id == user.id)
-    scan = (await db.execute(query)).scalar_one_or_none()
-    if scan is None:
+    # Validate against the small columns first; the crawl blobs (pages_json
+    # can run to MBs) are only read once the request is known to be good
+    checked = (await db.execute(
+        select(Scan.status, Scan.plan_json)
+        .where(Scan.id == scan_id, Scan.user_id == user.id)
+    )).one_or_none()
+    if checked is None:
         raise HTTPException(status_code=404, detail="Scan not found")
-    if scan.status != ScanStatus.PLANNED:
+    if checked.status != ScanStatus.PLANNED:
         raise HTTPException(
             status_code=409,
-            detail=f"Cannot execute in '{scan.status.value}' status. Generate a plan first.",
+            detail=f"Cannot execute in '{checked.status.value}' status. Generate a plan first.",
         )
 
-    plan = _parse_json(scan.plan_json)
+    # The plan is the AI reply — tens of KB even for a hundred tests — so a
+    # full parse costs well under a millisecond; no streaming walk needed
+    plan = _parse_json(checked.plan_json)
     if not plan:
         raise HTTPException(status_code=422, detail="No test plan found")
 
-    # Extract selected test details from plan
-    selected_details = []
-    for cat in plan.get("categories", []):
-        for test in cat.get("tests", []):
-            if test.get("id") in body.selected_tests:
-                selected_details.append(test)
+    # Extract selected test details from plan (plan order, O(1) id lookups).
+    # Only str ids can match; the check also skips unhashable AI-made ids.
+    selected_ids = frozenset(body.selected_tests)
+    selected_details = [
+        test
+        for cat in plan.get("categories", [])
+        for test in cat.get("tests", [])
+        if isinstance(tid := test.get("id"), str) and tid in selected_ids
+    ]
 
     if not selected_details:
         raise HTTPException(status_code=422, detail="No valid tests selected")
 
-    # Gather crawl data for context
-    pages = _parse_json(scan.pages_json) or []
-    observations = _parse_json(getattr(scan, "observations_json", None)) or []
-    crawl_context = {"nav_menus": [], "forms": [], "buttons": []}
-    for p in pages[:5]:
-        crawl_context["nav_menus"].extend(p.get("nav_menus", []))
-        crawl_context["forms"].extend(p.get("forms", []))
-        crawl_context["buttons"].extend(p.get("buttons", []))
-        # Collect per-page observations as fallback
-        if not observations:
-            observations.extend(p.get("observations", []))
+    scan = (await db.execute(
+        select(
+            Scan.target_url, Scan.pages_json, Scan.detected_features,
+            Scan.observations_json, Scan.matched_patterns_json,
+        ).where(Scan.id == scan_id)
+    )).one_or_none()
+    if scan is None:  # deleted since the check above
+        raise HTTPException(status_code=404, detail="Scan not found")
+
+    # Gather crawl data for context. The pages blob (screenshots included)
+    # can run to MBs — decode it off the event loop.
+    pages = await asyncio.to_thread(_parse_json, scan.pages_json) or []
+    observations = _parse_json(scan.observations_json) or []
+    # Per-page caps keep the context (and its serialized size) bounded
+    context_pages = pages[:5]
+    crawl_context = {
+        "nav_menus": unique_elements(chain.from_iterable(
+            islice(p.get("nav_menus", ()), 10) for p in context_pages
+        ), nav_key),
+        "forms": unique_elements(chain.from_iterable(
+            islice(p.get("forms", ()), 20) for p in context_pages
+        ), form_key),
+        "buttons": unique_elements(chain.from_iterable(
+            islice(p.get("buttons", ()), 30) for p in context_pages
+        ), button_key),
+    }
+    # Collect per-page observations as fallback
+    if not observations:
+        observations = _first_page_observations(context_pages)
 
     user_data = {**body.auth_data, **body.test_data}
 
     # Generate scenarios via AI
-    try:
-        from aat.adapters import ADAPTER_REGISTRY
-        from aat.core.models import AIConfig
-    except ImportError as exc:
-        raise HTTPException(status_code=503, detail=f"AAT core not installed: {exc}") from exc
-
-    ai_config = AIConfig(
-        provider=settings.ai_provider,
-        api_key=settings.ai_api_key,
-        model=settings.ai_model or _DEFAULT_MODELS.get(settings.ai_provider, ""),
-    )
+    if _AAT_IMPORT_ERROR is not None:
+        raise HTTPException(
+            status_code=503, detail=f"AAT core not installed: {_AAT_IMPORT_ERROR}"
+        )
+
+    ai_config = settings_ai_config()
     adapter_cls = ADAPTER_REGISTRY.get(ai_config.provider)
     if adapter_cls is None:
         raise HTTPException(status_code=503, detail=f"Unknown AI provider: {ai_config.provider}")
 
-    adapter = adapter_cls(ai_config)
+    adapter = shared_adapter(adapter_cls, ai_config)
 
-    def _trunc(obj: Any, limit: int = 4000) -> str:
-        s = json.dumps(obj, ensure_ascii=False, indent=2)
-        return s[:limit] if len(s) > limit else s
+    # Fetch user reference documents while the prompt context is assembled.
+    # The session is not touched again until the task is awaited; if building
+    # the context fails, the task is cancelled before the session is closed.
+    ref_docs_task = asyncio.create_task(get_user_doc_text(user.id, db))
+    await asyncio.sleep(0)  # let the query go out before the CPU-bound work
 
-    # Build extra instructions based on detected features
-    features = _parse_json(scan.detected_features) or []
-    extra_parts: list[str] = []
-    if "spa" in features:
-        extra_parts.append(
-            "SPA SITE: Do NOT assert URL changes. Use text_visible assertions. "
-            "Anchor links scroll within the page — assert section content is visible."
-        )
-    if "sticky_header" in features:
-        extra_parts.append(
-            "STICKY HEADER: Add scroll(0,0,0) before clicking header menu items."
-        )
-
-    # Tell AI which elements already have standard tests
-    matched_patterns = match_elements_to_patterns(pages, observations)
-    pattern_hint = build_pattern_summary(matched_patterns)
-    if pattern_hint:
-        extra_parts.append(pattern_hint)
-
-    # Auth pattern context — inject limitations and pattern hints
-    from app.auth_patterns import build_auth_context_for_ai
-
-    for obs in observations:
-        auth_info = obs.get("auth_pattern")
-        if auth_info:
-            auth_ctx = build_auth_context_for_ai(auth_info)
-            if auth_ctx:
-                extra_parts.append(auth_ctx)
-            break  # first auth observation only
-
-    extra_instructions = "\n".join(extra_parts) if extra_parts else ""
+    def _trunc(s: str, limit: int = 4000) -> str:
+        return s[:limit] if len(s) > limit else s
 
-    # Fetch user reference documents
-    from app.routers.documents import get_user_doc_text
+    try:
+        # Build extra instructions based on detected features
+        features = _parse_json(scan.detected_features) or []
+        extra_parts: list[str] = []
+        if "spa" in features:
+            extra_parts.append(
+                "SPA SITE: Do NOT assert URL changes. Use text_visible assertions. "
+                "Anchor links scroll within the page — assert section content is visible."
+            )
+        if "sticky_header" in features:
+            extra_parts.append(
+                "STICKY HEADER: Add scroll(0,0,0) before clicking header menu items."
+            )
 
-    ref_docs = await get_user_doc_text(user.id, db)
+        # Tell AI which elements already have standard tests
+        # (computed at plan time; recompute only for scans planned before caching)
+        matched_patterns = _parse_json(scan.matched_patterns_json)
+        if matched_patterns is None:
+            matched_patterns = match_elements_to_patterns(pages, observations)
+        pattern_hint = build_pattern_summary(matched_patterns)
+        if pattern_hint:
+            extra_parts.append(pattern_hint)
+
+        # Auth pattern context — inject limitations and pattern hints
+        for obs in observations:
+            auth_info = obs.get("auth_pattern")
+            if auth_info:
+                auth_ctx = build_auth_context_for_ai(auth_info)
+                if auth_ctx:
+                    extra_parts.append(auth_ctx)
+                break  # first auth observation only
+
+        extra_instructions = "\n".join(extra_parts) if extra_parts else ""
+    except BaseException:
+        ref_docs_task.cancel()
+        with contextlib.suppress(Exception, asyncio.CancelledError):
+            await ref_docs_task
+        raise
+
+    ref_docs = await ref_docs_task
 
     # --- Dynamic token budget allocation ---
     # Reserve tokens for: template (~4000), output (~5000), overhead (~1000)
@@ -1654,7 +2112,7 @@ async def execute_scan_tests(
     budget = max_input_tokens - template_tokens - overhead_tokens  # ~15000
 
     # Fixed-size parts first
-    user_data_str = json.dumps(user_data, ensure_ascii=False)
+    user_data_str = dump_json(user_data)
     extra_str = extra_instructions
     fixed_tokens = (len(user_data_str) + len(extra_str)) // 3
 
@@ -1679,12 +2137,17 @@ async def execute_scan_tests(
             logger.info(
                 "Observation '%s' → %s has %d navigated_page_fields: %s",
                 elem_text, after_url, len(nav_fields),
-                json.dumps(nav_fields[:5], ensure_ascii=False)[:500],
+                dump_json_prefix(nav_fields[:5], 500),
             )
 
+    # Serialize once (compact), only as far as the largest slice taken
+    # below — the trim/retry paths re-slice these strings to 2000/1500
+    crawl_json = dump_json_prefix(crawl_context, max(crawl_limit, 2000))
+    selected_json = dump_json_prefix(selected_details, max(selected_limit, 2000))
+
     observation_table = compress_observations_for_ai(observations, max_tokens=obs_tokens)
-    crawl_data_str = _trunc(crawl_context, crawl_limit)
-    selected_str = _trunc(selected_details, selected_limit)
+    crawl_data_str = _trunc(crawl_json, crawl_limit)
+    selected_str = _trunc(selected_json, selected_limit)
 
     # Log for debugging
     prompt_parts_info = (
@@ -1699,7 +2162,7 @@ async def execute_scan_tests(
         observation_table[:3000],
     )
 
-    prompt = _EXECUTE_PROMPT.format(
+    prompt_fields = dict(
         target_url=scan.target_url,
         crawl_data=crawl_data_str,
         observation_table=observation_table,
@@ -1709,43 +2172,46 @@ async def execute_scan_tests(
         reference_documents=ref_docs_str,
     )
 
-    # Final safety check: if prompt is still too large, aggressively trim
-    estimated_total = len(prompt) // 3
+    # Final safety check: if prompt is still too large, aggressively trim.
+    # Sized from the parts, so an oversized prompt is never built.
+    estimated_total = _execute_prompt_len(prompt_fields) // 3
     if estimated_total > max_input_tokens:
         logger.warning(
             "Prompt still %d tokens (limit %d), trimming further",
             estimated_total, max_input_tokens,
         )
         observation_table = compress_observations_for_ai(observations, max_tokens=3000)
-        prompt = _EXECUTE_PROMPT.format(
-            target_url=scan.target_url,
-            crawl_data=_trunc(crawl_context, 2000),
+        prompt_fields.update(
+            crawl_data=_trunc(crawl_json, 2000),
             observation_table=observation_table,
-            selected_tests=_trunc(selected_details, 2000),
-            user_data=user_data_str,
-            extra_instructions=extra_str,
+            selected_tests=_trunc(selected_json, 2000),
             reference_documents=ref_docs_str[:3000],
         )
+    prompt = _EXECUTE_TEMPLATE.format(**prompt_fields)
+
+    # End the read transaction before the AI call (often tens of seconds):
+    # the pooled connection goes back instead of idling in a transaction.
+    # Loaded attributes stay usable (expire_on_commit=False); the writes
+    # below check out a connection again.
+    await db.commit()
 
     try:
-        scenarios = await adapter.generate_scenarios(prompt)
+        scenarios = await _generate_scenarios_cached(adapter, ai_config, prompt)
     except Exception as exc:
         err_msg = str(exc).lower()
         # Token limit exceeded → compress further and retry
         if "token" in err_msg and ("limit" in err_msg or "rate" in err_msg or "tpm" in err_msg):
             logger.warning("Token limit exceeded, retrying with minimal prompt")
             observation_table = compress_observations_for_ai(observations, max_tokens=2000)
-            prompt = _EXECUTE_PROMPT.format(
-                target_url=scan.target_url,
-                crawl_data=_trunc(crawl_context, 1500),
-                observation_table=observation_table,
-                selected_tests=_trunc(selected_details, 1500),
-                user_data=user_data_str,
-                extra_instructions=extra_str,
-                reference_documents="(omitted to fit token limit)",
-            )
+            prompt = _EXECUTE_TEMPLATE.format(**{
+                **prompt_fields,
+                "crawl_data": _trunc(crawl_json, 1500),
+                "observation_table": observation_table,
+                "selected_tests": _trunc(selected_json, 1500),
+                "reference_documents": "(omitted to fit token limit)",
+            })
             try:
-                scenarios = await adapter.generate_scenarios(prompt)
+                scenarios = await _generate_scenarios_cached(adapter, ai_config, prompt)
             except Exception as retry_exc:
                 logger.exception("Retry also failed")
                 raise HTTPException(
@@ -1763,14 +2229,19 @@ async def execute_scan_tests(
         raise HTTPException(
             status_code=422, detail="AI generated no scenarios",
         )
+    await scan_ws.broadcast(scan_id, {"type": "scenarios_generated", "count": len(scenarios)})
 
     # === DEBUG: Log generated scenarios FULL YAML ===
-    for sc in scenarios:
-        sc_dict = sc.model_dump(mode="json") if hasattr(sc, "model_dump") else sc
-        sc_yaml = yaml.safe_dump(sc_dict, default_flow_style=False, allow_unicode=True)
-        logger.debug(
-            "=== GENERATED SCENARIO ===\n%s", sc_yaml,
-        )
+    # (only serialized when DEBUG is on — the dump is not free)
+    if logger.isEnabledFor(logging.DEBUG):
+        for sc in scenarios:
+            sc_dict = sc.model_dump(mode="json") if hasattr(sc, "model_dump") else sc
+            sc_yaml = yaml.dump(
+                sc_dict, Dumper=_YamlDumper, default_flow_style=False, allow_unicode=True,
+            )
+            logger.debug(
+                "=== GENERATED SCENARIO ===\n%s", sc_yaml,
+            )
 
     # === DEBUG: Log signup-related observation data ===
     for obs in observations:
@@ -1827,38 +2298,28 @@ async def execute_scan_tests(
                 f"⚠️ '{rel['test_name']}': {rel['reason']}"
             )
 
-    # Serialize to YAML
-    scenario_dicts = [
-        s.model_dump(mode="json", exclude_none=True)
-        for s in scenarios
-    ]
-    scenario_yaml = yaml.safe_dump(
-        scenario_dicts,
-        default_flow_style=False,
-        allow_unicode=True,
-    )
-    total_steps = sum(len(s.steps) for s in scenarios)
+    # Serialize to YAML off the event loop (steps counted in the same pass)
+    scenario_yaml, total_steps = await asyncio.to_thread(scenarios_to_yaml, scenarios)
 
     # Clean up stuck tests for this user before creating a new one
-    from app.models import Test, TestStatus
-
-    stuck_cutoff = datetime.now(UTC) - timedelta(
+    now = datetime.now(UTC)
+    stuck_cutoff = now - timedelta(
         minutes=settings.stuck_timeout_minutes
     )
-    stuck_result = await db.execute(
+    stuck_result = await db.scalars(
         select(Test).where(
             Test.user_id == user.id,
             Test.status.in_([TestStatus.RUNNING, TestStatus.QUEUED]),
             Test.updated_at < stuck_cutoff,
-        )
+        ).options(load_only(Test.status, raiseload=True))
     )
-    for stuck_test in stuck_result.scalars().all():
+    for stuck_test in stuck_result.all():
         stuck_test.status = TestStatus.FAILED
         stuck_test.error_message = (
             f"Auto-cancelled: stuck {stuck_test.status.value}"
             f" > {settings.stuck_timeout_minutes} min"
         )
-        stuck_test.updated_at = datetime.now(UTC)
+        stuck_test.updated_at = now
         logger.warning(
             "Pre-exec cleanup: auto-failed stuck test %d for user %s",
             stuck_test.id,
@@ -1874,8 +2335,7 @@ async def execute_scan_tests(
         steps_total=total_steps,
     )
     db.add(test)
-    await db.commit()
-    await db.refresh(test)
+    await db.commit()  # INSERT returns the id; no refresh SELECT needed
 
     result: dict[str, Any] = {
         "test_id": test.id,
@@ -2057,9 +2517,4 @@ async def scan_websocket(websocket: WebSocket, scan_id: int) -> None:
 
     Events: scan_start, page_scanned, feature_detected, scan_complete, scan_error.
     """
-    await ws_manager.connect(scan_id, websocket)
-    try:
-        while True:
-            await websocket.receive_text()
-    except WebSocketDisconnect:
-        ws_manager.disconnect(scan_id, websocket)
+    await scan_ws.serve(scan_id, websocket)
@@ -2,11 +2,19 @@
 
 from __future__ import annotations
 
+import asyncio
 import contextlib
-import json
+import hashlib
+import hmac
 import logging
-from datetime import UTC
+import os
+import secrets
+import tempfile
+from collections.abc import Callable, Iterator
+from datetime import UTC, datetime, timedelta
+from itertools import chain, islice
 from pathlib import Path
+from typing import Any, BinaryIO
 
 import yaml
 from fastapi import (
@@ -14,13 +22,17 @@ from fastapi import (
     Depends,
     HTTPException,
     Query,
+    Request,
+    Response,
     UploadFile,
     WebSocket,
-    WebSocketDisconnect,
 )
-from sqlalchemy import func, select
+from sqlalchemy import func, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from sqlalchemy.orm.interfaces import ORMOption
 
+from app import browser_pool, llm_cache
 from app.auth import get_current_user
 from app.config import settings
 from app.database import get_db
@@ -28,13 +40,22 @@ from app.docparse import allowed_extension, extract_text
 from app.middleware import check_rate_limit
 from app.models import Test, TestStatus, User
 from app.scenario_utils import (
-    DEFAULT_AI_MODELS as _DEFAULT_MODELS,
-)
-from app.scenario_utils import (
+    PromptTemplate,
+    YamlLoader,
+    button_key,
     compress_observations_for_ai,
+    dump_json,
+    dump_json_prefix,
     ensure_post_submit_assert,
     fix_field_targets,
     fix_form_submit_steps,
+    form_key,
+    nav_key,
+    scenario_list_adapter,
+    scenarios_to_yaml,
+    settings_ai_config,
+    shared_adapter,
+    unique_elements,
     validate_and_retry,
 )
 from app.scenario_utils import (
@@ -49,11 +70,46 @@ from app.schemas import (
     TestResponse,
     UploadResponse,
 )
-from app.ws import ws_manager
+from app.ws import convert_ws, test_ws
+
+# The AAT core is optional for the cloud API — resolve it once at import
+# time; endpoints that need it check _AAT_IMPORT_ERROR instead.
+try:
+    from aat.adapters import ADAPTER_REGISTRY
+
+    _AAT_IMPORT_ERROR: str | None = None
+except ImportError as _exc:
+    ADAPTER_REGISTRY = {}  # type: ignore[misc]
+    _AAT_IMPORT_ERROR = str(_exc)
 
 router = APIRouter(prefix="/api/tests", tags=["tests"])
 
 
+def _validate_scenario_yaml(text: str) -> int | None:
+    """Parse and validate user scenario YAML; return its total step count.
+
+    None when the AAT core (and so the Scenario model) is not installed.
+    Raises 422 for invalid, empty or non-scenario YAML. CPU-bound for large
+    documents — async callers run it via ``asyncio.to_thread``.
+    """
+    try:
+        parsed = yaml.load(text, Loader=YamlLoader)
+    except yaml.YAMLError as exc:
+        raise HTTPException(status_code=422, detail=f"Invalid YAML: {exc}") from exc
+    if not parsed:
+        raise HTTPException(status_code=422, detail="Empty scenario YAML")
+    if _AAT_IMPORT_ERROR is not None:
+        return None
+    try:
+        items = parsed if isinstance(parsed, list) else [parsed]
+        scenarios = scenario_list_adapter().validate_python(items)
+    except Exception as exc:
+        raise HTTPException(
+            status_code=422, detail=f"Scenario validation error: {exc}"
+        ) from exc
+    return sum(len(s.steps) for s in scenarios)
+
+
 @router.post("", response_model=TestResponse, status_code=201)
 async def create_test(
     body: TestCreate,
@@ -69,22 +125,8 @@ async def create_test(
     # Pre-built scenario: validate and go straight to QUEUED
     steps_total = 0
     if body.scenario_yaml:
-        try:
-            parsed = yaml.safe_load(body.scenario_yaml)
-        except yaml.YAMLError as exc:
-            raise HTTPException(status_code=422, detail=f"Invalid YAML: {exc}") from exc
-        if not parsed:
-            raise HTTPException(status_code=422, detail="Empty scenario YAML")
-        try:
-            from aat.core.models import Scenario
-
-            items = parsed if isinstance(parsed, list) else [parsed]
-            scenarios = [Scenario.model_validate(item) for item in items]
-            steps_total = sum(len(s.steps) for s in scenarios)
-        except ImportError:
-            pass
-        except Exception as exc:
-            raise HTTPException(status_code=422, detail=f"Scenario validation error: {exc}") from exc
+        validated = await asyncio.to_thread(_validate_scenario_yaml, body.scenario_yaml)
+        steps_total = validated or 0
 
     if body.scenario_yaml:
         initial_status = TestStatus.QUEUED
@@ -101,59 +143,196 @@ async def create_test(
         steps_total=steps_total,
     )
     db.add(test)
+    # The INSERT returns the id and every other column is set client-side
+    # (defaults or None), so no refresh SELECT is needed
     await db.commit()
-    await db.refresh(test)
     return test
 
 
+_EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+
+# Signs the total carried in list cursors. Per process: a cursor served by
+# another worker (or from before a restart) just counts again.
+_CURSOR_KEY = secrets.token_bytes(16)
+
+
+def _cursor_sig(position: str, total: int) -> str:
+    return hmac.new(
+        _CURSOR_KEY, f"{position}_{total}".encode(), hashlib.sha256,
+    ).hexdigest()[:16]
+
+
+def _encode_cursor(test: Test, total: int) -> str:
+    """Keyset cursor for the page after *test*: ``<created_at µs>_<id>_<total>_<sig>``.
+
+    The listing's total rides along, so later pages skip the COUNT; it is
+    signed so a client cannot make the API report a total of its choosing.
+    """
+    created = test.created_at
+    if created.tzinfo is None:  # SQLite returns naive UTC timestamps
+        created = created.replace(tzinfo=UTC)
+    position = f"{(created - _EPOCH) // timedelta(microseconds=1)}_{test.id}"
+    return f"{position}_{total}_{_cursor_sig(position, total)}"
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int, int | None]:
+    """Inverse of :func:`_encode_cursor` (422 on malformed input).
+
+    The total is ``None`` (to be counted) for cursors without one (``<µs>_<id>``)
+    and for ones whose signature does not match.
+    """
+    try:
+        micros, test_id, *rest = cursor.split("_")
+        if len(rest) > 2:
+            raise ValueError(cursor)
+        created_at = _EPOCH + timedelta(microseconds=int(micros))
+        total = int(rest[0]) if rest else None
+        if total is not None and (
+            len(rest) < 2
+            or not hmac.compare_digest(rest[1], _cursor_sig(f"{micros}_{test_id}", total))
+        ):
+            total = None
+        return created_at, int(test_id), total
+    except (ValueError, OverflowError, TypeError) as exc:  # TypeError: non-ASCII sig
+        raise HTTPException(status_code=422, detail="Invalid cursor") from exc
+
+
 @router.get("", response_model=TestListResponse)
 async def list_tests(
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Items per page"),
+    cursor: str | None = Query(
+        None, description="next_cursor of the previous page (overrides page)"
+    ),
 ) -> dict:
-    """List current user's tests (newest first, paginated)."""
-    # Total count
-    count_q = select(func.count()).select_from(Test).where(Test.user_id == user.id)
-    total = (await db.execute(count_q)).scalar() or 0
+    """List current user's tests (newest first, paginated).
 
-    # Paginated results
-    offset = (page - 1) * page_size
+    Pages are addressed by number (OFFSET) or, for deep listings, by the
+    ``next_cursor`` of the previous page, which seeks past it instead of
+    scanning and discarding the skipped rows. Cursor pages report the total
+    the listing started with, and no page number.
+    """
+    # One row past the page tells whether another page exists, so a full
+    # last page does not hand out a cursor to an empty one
     query = (
         select(Test)
         .where(Test.user_id == user.id)
-        .order_by(Test.created_at.desc())
-        .offset(offset)
-        .limit(page_size)
+        .order_by(Test.created_at.desc(), Test.id.desc())
+        .limit(page_size + 1)
     )
-    result = await db.execute(query)
-    tests = list(result.scalars().all())
+    total: int | None = None
+    if cursor is not None:
+        created_at, test_id, total = _decode_cursor(cursor)
+        query = query.where(tuple_(Test.created_at, Test.id) < tuple_(created_at, test_id))
+        tests = list((await db.scalars(query)).all())
+    else:
+        # Page rows and the total in one round trip: count(*) OVER () is
+        # evaluated before OFFSET/LIMIT, so every row carries the full total.
+        offset = (page - 1) * page_size
+        rows = (await db.execute(
+            query.add_columns(func.count().over().label("total")).offset(offset)
+        )).all()
+        tests = [row[0] for row in rows]
+        if rows:
+            total = rows[0].total
+        elif not offset:
+            total = 0
+    has_more = len(tests) > page_size
+    tests = tests[:page_size]
+    if total is None:
+        # Pages past the end and cursors without a total
+        count_q = select(func.count()).select_from(Test).where(Test.user_id == user.id)
+        total = await db.scalar(count_q) or 0
 
     return {
         "tests": tests,
         "total": total,
-        "page": page,
+        "page": page if cursor is None else None,
         "page_size": page_size,
+        "next_cursor": (
+            _encode_cursor(tests[-1], total) if has_more else None
+        ),
     }
 
 
-@router.get("/{test_id}", response_model=TestResponse)
+async def _get_user_test(
+    db: AsyncSession, test_id: int, user: User, *options: ORMOption,
+) -> Test:
+    """Load a test of *user* by primary key, or raise 404.
+
+    ``db.get`` takes the primary-key fast path (identity map first, no
+    SELECT composed per call); ownership is checked on the loaded row, so
+    options limiting the loaded columns must keep ``Test.user_id``.
+    """
+    test = await db.get(Test, test_id, options=options)
+    if test is None or test.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Test not found")
+    return test
+
+
+def _test_etag(
+    test_id: int, status: TestStatus, steps_completed: int, steps_total: int,
+    updated_at: datetime,
+) -> str:
+    """Weak ETag of a test's API representation.
+
+    Every write, ORM flush or bulk UPDATE, sets ``updated_at`` to the
+    microsecond (client-side, see ``Test.updated_at``); status and step
+    counts are part of the tag as well, so progress writes within one clock
+    tick still change it.
+    """
+    return (
+        f'W/"{test_id}-{status.value}-{steps_completed}-{steps_total}'
+        f'-{updated_at.timestamp():.6f}"'
+    )
+
+
+# Browsers keep the response but revalidate it (If-None-Match) every time
+_REVALIDATE = "private, no-cache"
+
+
+@router.get(
+    "/{test_id}",
+    response_model=TestResponse,
+    responses={304: {"description": "Not modified since the ETag sent"}},
+)
 async def get_test(
     test_id: int,
+    request: Request,
+    response: Response,
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
-) -> Test:
-    """Get a single test by ID (must belong to current user)."""
-    query = select(Test).where(Test.id == test_id, Test.user_id == user.id)
-    result = await db.execute(query)
-    test = result.scalar_one_or_none()
-
-    if test is None:
-        from fastapi import HTTPException
+) -> Test | Response:
+    """Get a single test by ID (must belong to current user).
 
-        raise HTTPException(status_code=404, detail="Test not found")
+    Responses carry an ETag. Progress polls repeating it in If-None-Match
+    get 304 from a query of the few columns every write changes, without
+    loading or serializing the result, document and scenario texts.
+    """
+    if if_none_match := request.headers.get("if-none-match"):
+        row = (await db.execute(
+            select(
+                Test.user_id, Test.status, Test.steps_completed, Test.steps_total,
+                Test.updated_at,
+            ).where(Test.id == test_id)
+        )).one_or_none()
+        if row is not None and row.user_id == user.id:
+            etag = _test_etag(
+                test_id, row.status, row.steps_completed, row.steps_total, row.updated_at,
+            )
+            if etag in {tag.strip() for tag in if_none_match.split(",")}:
+                return Response(
+                    status_code=304, headers={"ETag": etag, "Cache-Control": _REVALIDATE},
+                )
 
+    test = await _get_user_test(db, test_id, user)
+    response.headers["ETag"] = _test_etag(
+        test.id, test.status, test.steps_completed, test.steps_total, test.updated_at,
+    )
+    response.headers["Cache-Control"] = _REVALIDATE
     return test
 
 
@@ -165,40 +344,19 @@ async def update_scenarios(
     db: AsyncSession = Depends(get_db),
 ) -> Test:
     """Update scenario YAML (only allowed in REVIEW status)."""
-    query = select(Test).where(Test.id == test_id, Test.user_id == user.id)
-    test = (await db.execute(query)).scalar_one_or_none()
-    if test is None:
-        raise HTTPException(status_code=404, detail="Test not found")
+    test = await _get_user_test(db, test_id, user)
     if test.status != TestStatus.REVIEW:
         raise HTTPException(
             status_code=409, detail=f"Cannot edit scenarios in '{test.status.value}' status"
         )
 
-    # Validate YAML syntax
-    try:
-        parsed = yaml.safe_load(body.scenario_yaml)
-    except yaml.YAMLError as exc:
-        raise HTTPException(status_code=422, detail=f"Invalid YAML: {exc}") from exc
-    if not parsed:
-        raise HTTPException(status_code=422, detail="Empty scenario YAML")
-
-    # Validate with Scenario model
-    try:
-        from aat.core.models import Scenario
-
-        items = parsed if isinstance(parsed, list) else [parsed]
-        scenarios = [Scenario.model_validate(item) for item in items]
-    except ImportError:
-        pass  # AAT not installed — skip model validation
-    except Exception as exc:
-        raise HTTPException(status_code=422, detail=f"Scenario validation error: {exc}") from exc
+    # Validate YAML syntax and, with the AAT core installed, the scenarios
+    steps_total = await asyncio.to_thread(_validate_scenario_yaml, body.scenario_yaml)
 
     test.scenario_yaml = body.scenario_yaml
-    test.steps_total = sum(
-        len(s.steps) for s in scenarios
-    ) if "scenarios" in dir() else test.steps_total
+    if steps_total is not None:
+        test.steps_total = steps_total
     await db.commit()
-    await db.refresh(test)
     return test
 
 
@@ -209,10 +367,7 @@ async def approve_test(
     db: AsyncSession = Depends(get_db),
 ) -> Test:
     """Approve scenarios and queue test for execution (REVIEW → QUEUED)."""
-    query = select(Test).where(Test.id == test_id, Test.user_id == user.id)
-    test = (await db.execute(query)).scalar_one_or_none()
-    if test is None:
-        raise HTTPException(status_code=404, detail="Test not found")
+    test = await _get_user_test(db, test_id, user)
     if test.status != TestStatus.REVIEW:
         raise HTTPException(
             status_code=409, detail=f"Cannot approve test in '{test.status.value}' status"
@@ -222,7 +377,6 @@ async def approve_test(
 
     test.status = TestStatus.QUEUED
     await db.commit()
-    await db.refresh(test)
     return test
 
 
@@ -233,10 +387,7 @@ async def cancel_test(
     db: AsyncSession = Depends(get_db),
 ) -> Test:
     """Cancel a test that is generating, queued, or running."""
-    query = select(Test).where(Test.id == test_id, Test.user_id == user.id)
-    test = (await db.execute(query)).scalar_one_or_none()
-    if test is None:
-        raise HTTPException(status_code=404, detail="Test not found")
+    test = await _get_user_test(db, test_id, user)
 
     cancellable = {TestStatus.GENERATING, TestStatus.REVIEW, TestStatus.QUEUED, TestStatus.RUNNING}
     if test.status not in cancellable:
@@ -247,14 +398,11 @@ async def cancel_test(
 
     test.status = TestStatus.FAILED
     test.error_message = "Cancelled by user"
-    from datetime import datetime
     test.updated_at = datetime.now(UTC)
     await db.commit()
-    await db.refresh(test)
 
     # Notify WebSocket clients
-    from app.ws import ws_manager
-    await ws_manager.broadcast(test_id, {
+    await test_ws.broadcast(test_id, {
         "type": "test_fail",
         "test_id": test_id,
         "error": "Cancelled by user",
@@ -263,6 +411,35 @@ async def cancel_test(
     return test
 
 
+_UPLOAD_CHUNK = 64 * 1024
+
+
+def _save_upload(src: BinaryIO, dest: Path, limit: int) -> int | None:
+    """Copy *src* to *dest* chunk by chunk; return its size.
+
+    Returns None, leaving *dest* untouched, once more than *limit* bytes
+    are read. Blocking file I/O — run it in a worker thread.
+    """
+    # Unique temp name so concurrent uploads of one filename never collide
+    out = tempfile.NamedTemporaryFile(  # noqa: SIM115 - closed below
+        dir=dest.parent, prefix=dest.name + ".", suffix=".part", delete=False,
+    )
+    part = Path(out.name)
+    try:
+        size = 0
+        with out:
+            while chunk := src.read(_UPLOAD_CHUNK):
+                size += len(chunk)
+                if size > limit:
+                    return None
+                out.write(chunk)
+        os.replace(part, dest)
+        return size
+    finally:
+        # No-op once replaced; otherwise drops partial or oversize data
+        part.unlink(missing_ok=True)
+
+
 @router.post("/{test_id}/upload", response_model=UploadResponse)
 async def upload_document(
     test_id: int,
@@ -275,10 +452,10 @@ async def upload_document(
     Supported formats: .md, .txt, .pdf, .docx. Max 10MB.
     Extracts text and appends to test.doc_text.
     """
-    query = select(Test).where(Test.id == test_id, Test.user_id == user.id)
-    test = (await db.execute(query)).scalar_one_or_none()
-    if test is None:
-        raise HTTPException(status_code=404, detail="Test not found")
+    test = await _get_user_test(
+        db, test_id, user,
+        load_only(Test.user_id, Test.status, Test.doc_text, raiseload=True),
+    )
     if test.status not in (TestStatus.GENERATING, TestStatus.REVIEW):
         raise HTTPException(
             status_code=409,
@@ -293,19 +470,23 @@ async def upload_document(
             detail="Unsupported file type. Allowed: .md, .txt, .pdf, .docx",
         )
 
-    # Read file content with size check
-    content = await file.read()
-    if len(content) > settings.upload_max_bytes:
-        raise HTTPException(
-            status_code=413,
-            detail=f"File too large. Max {settings.upload_max_bytes // (1024*1024)}MB",
-        )
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"File too large. Max {settings.upload_max_bytes // (1024*1024)}MB",
+    )
+    # The multipart parser has already measured (and spooled) the upload
+    if file.size is not None and file.size > settings.upload_max_bytes:
+        raise too_large
 
-    # Save file to disk
+    # Stream it to disk — never the whole file in memory at once
     upload_dir = Path(settings.upload_dir) / str(test_id)
     upload_dir.mkdir(parents=True, exist_ok=True)
     file_path = upload_dir / filename
-    file_path.write_bytes(content)
+    size = await asyncio.to_thread(
+        _save_upload, file.file, file_path, settings.upload_max_bytes,
+    )
+    if size is None:
+        raise too_large
 
     # Extract text
     try:
@@ -324,7 +505,7 @@ async def upload_document(
 
     return {
         "filename": filename,
-        "size": len(content),
+        "size": size,
         "extracted_chars": len(text),
     }
 
@@ -462,6 +643,9 @@ FINAL CHECK: Before responding, verify:
 Remove any scenario that tests a feature the user did NOT request.\
 """
 
+# Parsed once; rendered with a join instead of str.format per request
+_CONVERT_TEMPLATE = PromptTemplate(_CONVERT_PROMPT)
+
 
 @router.post("/convert", response_model=ConvertScenarioResponse)
 async def convert_scenario(
@@ -474,37 +658,37 @@ async def convert_scenario(
     Visits the target URL, extracts page data, observes interactions
     related to user keywords, then generates scenarios with real data.
     """
-    import json
 
+    if _AAT_IMPORT_ERROR is not None:
+        raise HTTPException(
+            status_code=503, detail=f"AAT core not installed: {_AAT_IMPORT_ERROR}"
+        )
     try:
-        from aat.adapters import ADAPTER_REGISTRY
-        from aat.core.models import AIConfig, EngineConfig
-        from aat.engine.web import WebEngine
+        # Page visits pull in Playwright — keep it lazy
+        import playwright.async_api  # noqa: F401
     except ImportError as exc:
         raise HTTPException(
             status_code=503,
             detail=f"AAT core not installed: {exc}",
         ) from exc
 
+    # Progress goes to the session's /api/ws subscribers — only its owner's
+    if body.session_id is not None and not await convert_ws.claim(body.session_id, user.id):
+        raise HTTPException(status_code=409, detail="Convert session belongs to another user")
+
     from app.crawler import (
         _extract_page_data,
         _observe_interactions,
     )
 
-    ai_config = AIConfig(
-        provider=settings.ai_provider,
-        api_key=settings.ai_api_key,
-        model=settings.ai_model or _DEFAULT_MODELS.get(
-            settings.ai_provider, ""
-        ),
-    )
+    ai_config = settings_ai_config()
     adapter_cls = ADAPTER_REGISTRY.get(ai_config.provider)
     if adapter_cls is None:
         raise HTTPException(
             status_code=503,
             detail=f"Unknown AI provider: {ai_config.provider}",
         )
-    adapter = adapter_cls(ai_config)
+    adapter = shared_adapter(adapter_cls, ai_config)
 
     # --- Gather page data + observations ---
     page_data_str = "Page visit failed — using user prompt only."
@@ -523,43 +707,23 @@ async def convert_scenario(
             "message": "기존 스캔 데이터 사용 중...",
         })
 
-        scan_q = select(Scan).where(
-            Scan.id == body.scan_id, Scan.user_id == user.id,
+        scan_q = (
+            select(Scan)
+            .where(Scan.id == body.scan_id, Scan.user_id == user.id)
+            .options(load_only(
+                Scan.status, Scan.pages_json, Scan.observations_json, raiseload=True,
+            ))
         )
-        scan = (await db.execute(scan_q)).scalar_one_or_none()
+        scan = await db.scalar(scan_q)
         if scan and scan.status in (ScanStatus.COMPLETED, ScanStatus.PLANNED):
-            pages = _parse_json(scan.pages_json) or []
-            observations_raw = _parse_json(
-                getattr(scan, "observations_json", None),
-            ) or []
-            # Collect per-page observations as fallback
-            if not observations_raw:
-                for p in pages:
-                    observations_raw.extend(p.get("observations", []))
-
-            # Build page data from all scanned pages
-            all_page_data: dict = {
-                "nav_menus": [], "forms": [], "buttons": [],
-                "links": [], "images": [],
-            }
-            for p in pages:
-                all_page_data["nav_menus"].extend(p.get("nav_menus", []))
-                all_page_data["forms"].extend(p.get("forms", []))
-                all_page_data["buttons"].extend(p.get("buttons", []))
-                all_page_data["links"].extend(p.get("links", [])[:20])
-                all_page_data["images"].extend(p.get("images", []))
-
-            pdata_raw = all_page_data
+            # MB-sized with screenshots — decode and summarize off the event loop
+            pages, observations_raw, scan_page_data = await asyncio.to_thread(
+                _scan_page_data, scan.pages_json, scan.observations_json,
+            )
+            pdata_raw = scan_page_data
             page_list_for_validation = pages
-            page_data_str = json.dumps(
-                all_page_data, ensure_ascii=False, indent=2,
-            )[:8000]
-            if observations_raw:
-                observations_str = compress_observations_for_ai(observations_raw, max_tokens=10000)
-
-            # Build element summary with counts
-            element_summary = _build_element_summary(
-                observations_raw, all_page_data,
+            page_data_str, observations_str, element_summary = await asyncio.to_thread(
+                _prompt_sections, scan_page_data, observations_raw, 8000,
             )
             await _broadcast_convert(body.session_id, {
                 "type": "convert_progress", "phase": "observing",
@@ -580,79 +744,66 @@ async def convert_scenario(
             "Convert: visiting %s (prompt: '%s')",
             body.target_url, body.user_prompt[:60],
         )
-        engine_config = EngineConfig(
-            type="web", headless=settings.playwright_headless,
-            viewport_width=1920, viewport_height=1080,
-        )
-        engine = WebEngine(engine_config)
-
         try:
-            await engine.start()
-            page = engine.page
-            logger.info("Convert: navigating to %s", body.target_url)
-            await page.goto(
-                str(body.target_url),
-                wait_until="domcontentloaded",
-                timeout=12000,
-            )
-            with contextlib.suppress(Exception):
-                await page.wait_for_load_state(
-                    "networkidle", timeout=5000,
+            # Fresh context on the warm browser — no Chromium start per request
+            async with browser_pool.page(viewport_width=1920, viewport_height=1080) as page:
+                logger.info("Convert: navigating to %s", body.target_url)
+                await page.goto(
+                    str(body.target_url),
+                    wait_until="domcontentloaded",
+                    timeout=12000,
+                )
+                with contextlib.suppress(Exception):
+                    await page.wait_for_load_state(
+                        "networkidle", timeout=5000,
+                    )
+
+                # Extract page data (single page, no full crawl)
+                await _broadcast_convert(body.session_id, {
+                    "type": "convert_progress", "phase": "extracting",
+                    "message": "페이지 데이터 추출 중...",
+                })
+                logger.info("Convert: extracting page data...")
+                pdata_raw = await _extract_page_data(
+                    page, str(body.target_url), take_screenshot=False,
                 )
 
-            # Extract page data (single page, no full crawl)
-            await _broadcast_convert(body.session_id, {
-                "type": "convert_progress", "phase": "extracting",
-                "message": "페이지 데이터 추출 중...",
-            })
-            logger.info("Convert: extracting page data...")
-            pdata_raw = await _extract_page_data(
-                page, str(body.target_url), take_screenshot=False,
-            )
-
-            # Filter clickable elements by user keywords for
-            # targeted observation (not full scan)
-            keywords = _extract_keywords(body.user_prompt)
-            await _broadcast_convert(body.session_id, {
-                "type": "convert_progress", "phase": "extracting",
-                "message": f"키워드: {', '.join(keywords)}",
-            })
-            logger.info("Convert: keywords=%s", keywords)
-            filtered_data = _filter_by_keywords(pdata_raw, keywords)
-
-            # Observe only keyword-relevant elements
-            n_filtered = len(filtered_data.get("links", []))
-            await _broadcast_convert(body.session_id, {
-                "type": "convert_progress", "phase": "observing",
-                "message": f"{n_filtered}개 요소 관찰 중...",
-            })
-            logger.info(
-                "Convert: observing %d keyword-relevant elements...",
-                n_filtered,
-            )
-            observations_raw = await _observe_interactions(
-                page, filtered_data, str(body.target_url),
-                max_interactions=10,
-            )
-            await _broadcast_convert(body.session_id, {
-                "type": "convert_progress", "phase": "observing",
-                "message": f"{len(observations_raw)}개 관찰 데이터 수집 완료",
-            })
-            logger.info(
-                "Convert: collected %d observations", len(observations_raw),
-            )
+                # Filter clickable elements by user keywords for
+                # targeted observation (not full scan)
+                keywords = _extract_keywords(body.user_prompt)
+                await _broadcast_convert(body.session_id, {
+                    "type": "convert_progress", "phase": "extracting",
+                    "message": f"키워드: {', '.join(keywords)}",
+                })
+                logger.info("Convert: keywords=%s", keywords)
+                filtered_data = _filter_by_keywords(pdata_raw, keywords)
+
+                # Observe only keyword-relevant elements
+                n_filtered = len(filtered_data.get("links", []))
+                await _broadcast_convert(body.session_id, {
+                    "type": "convert_progress", "phase": "observing",
+                    "message": f"{n_filtered}개 요소 관찰 중...",
+                })
+                logger.info(
+                    "Convert: observing %d keyword-relevant elements...",
+                    n_filtered,
+                )
+                observations_raw = await _observe_interactions(
+                    page, filtered_data, str(body.target_url),
+                    max_interactions=10,
+                )
+                await _broadcast_convert(body.session_id, {
+                    "type": "convert_progress", "phase": "observing",
+                    "message": f"{len(observations_raw)}개 관찰 데이터 수집 완료",
+                })
+                logger.info(
+                    "Convert: collected %d observations", len(observations_raw),
+                )
 
             # Serialize for prompt (strip screenshots)
             pdata_raw.pop("screenshot_base64", None)
-            page_data_str = json.dumps(
-                pdata_raw, ensure_ascii=False, indent=2,
-            )[:6000]
-            if observations_raw:
-                observations_str = compress_observations_for_ai(observations_raw, max_tokens=10000)
-
-            # Build element summary with counts
-            element_summary = _build_element_summary(
-                observations_raw, pdata_raw,
+            page_data_str, observations_str, element_summary = await asyncio.to_thread(
+                _prompt_sections, pdata_raw, observations_raw, 6000,
             )
         except Exception as exc:
             await _broadcast_convert(body.session_id, {
@@ -662,9 +813,6 @@ async def convert_scenario(
             logger.warning(
                 "Page observation failed for convert: %s", exc,
             )
-        finally:
-            with contextlib.suppress(Exception):
-                await engine.stop()
 
     # Fetch user reference documents
     from app.routers.documents import get_user_doc_text
@@ -699,7 +847,7 @@ async def convert_scenario(
         "message": "AI 시나리오 생성 중...",
     })
     logger.info("Convert: generating scenarios via AI...")
-    prompt = _CONVERT_PROMPT.format(
+    prompt = _CONVERT_TEMPLATE.format(
         url=body.target_url,
         user_prompt=body.user_prompt,
         element_summary=element_summary,
@@ -708,8 +856,47 @@ async def convert_scenario(
         reference_documents=ref_docs or "No reference documents provided.",
     )
 
+    # The prompt holds everything the result depends on (URL, request, page
+    # data, observations, documents), so an identical one reuses the
+    # scenarios accepted last time. A re-visit whose crawl data barely
+    # changed matches too, but only for the same user, request text,
+    # temperature and documents — a short document barely moves the
+    # similarity of the whole prompt. Cached as JSON — the fixups below
+    # modify the scenarios in place.
+    cache_key = llm_cache.make_key(
+        ai_config.provider, ai_config.model, ai_config.temperature, prompt,
+    )
+    settings_key = llm_cache.make_key(ai_config.temperature, ref_docs).hex()
+    similar_scope = (
+        f"convert|{user.id}|{body.target_url}|{ai_config.provider}|"
+        f"{ai_config.model}|{settings_key}|{body.user_prompt}"
+    )
+    cached = llm_cache.get(cache_key)
+    if cached is None:
+        cached = llm_cache.get_similar(similar_scope, prompt)
+    from_cache = cached is not None
+
+    # Only requests with a detected intent are relevance-checked (and
+    # possibly retried); those may race a strict variant instead
+    speculate = (
+        not from_cache
+        and settings.ai_speculative_retry
+        and not relevance_pre.get("valid")
+    )
     try:
-        scenarios = await adapter.generate_scenarios(prompt)
+        if cached is not None:
+            logger.info("Convert: scenarios served from cache")
+            scenarios = scenario_list_adapter().validate_json(f"[{','.join(cached)}]")
+        elif speculate:
+            scenarios, relevance = await _generate_speculative(
+                adapter, prompt,
+                prompt + _STRICT_SUFFIX.format(user_prompt=body.user_prompt),
+                lambda candidate: validate_scenario_relevance(
+                    body.user_prompt, candidate, observations_raw, pdata_raw,
+                ),
+            )
+        else:
+            scenarios = await adapter.generate_scenarios(prompt)
     except Exception as exc:
         logger.exception("Scenario conversion failed")
         await _broadcast_convert(body.session_id, {
@@ -750,13 +937,18 @@ async def convert_scenario(
             sc_name, len(sc_steps), "\n".join(step_lines),
         )
 
-    # --- Post-generation: validate relevance ---
-    relevance = validate_scenario_relevance(
-        body.user_prompt, scenarios, observations_raw, pdata_raw,
-    )
+    # --- Post-generation: validate relevance (done above when speculating) ---
+    if not speculate:
+        relevance = validate_scenario_relevance(
+            body.user_prompt, scenarios, observations_raw, pdata_raw,
+        )
 
     # If invalid (wrong scenario), retry once with stronger prompt
-    if not relevance.get("valid") and not relevance.get("feature_missing"):
+    if (
+        not speculate
+        and not relevance.get("valid")
+        and not relevance.get("feature_missing")
+    ):
         logger.info(
             "Convert: relevance check failed (%s), retrying",
             relevance.get("reason", ""),
@@ -783,6 +975,11 @@ async def convert_scenario(
         except Exception as exc:
             logger.warning("Relevance retry failed: %s", exc)
 
+    if not from_cache and relevance.get("valid"):
+        entry = tuple(s.model_dump_json() for s in scenarios)
+        llm_cache.put(cache_key, entry)
+        llm_cache.put_similar(similar_scope, prompt, entry)
+
     await _broadcast_convert(body.session_id, {
         "type": "convert_progress", "phase": "fixing",
         "message": f"{len(scenarios)}개 시나리오 생성됨, 검증 중...",
@@ -832,17 +1029,8 @@ async def convert_scenario(
     verified = sum(1 for v in validation if v["status"] == "verified")
     total_v = len(validation)
 
-    # Serialize to YAML
-    scenario_dicts = [
-        s.model_dump(mode="json", exclude_none=True)
-        for s in scenarios
-    ]
-    scenario_yaml = yaml.safe_dump(
-        scenario_dicts,
-        default_flow_style=False,
-        allow_unicode=True,
-    )
-    total_steps = sum(len(s.steps) for s in scenarios)
+    # Serialize to YAML off the event loop (steps counted in the same pass)
+    scenario_yaml, total_steps = await asyncio.to_thread(scenarios_to_yaml, scenarios)
 
     await _broadcast_convert(body.session_id, {
         "type": "convert_complete",
@@ -867,6 +1055,113 @@ async def convert_scenario(
     }
 
 
+_STRICT_SUFFIX = """
+
+## STRICT RELEVANCE
+User asked for: {user_prompt}
+Generate ONLY scenarios that EXACTLY match the user's request, including \
+its page/modal entry, field input and submit steps.
+If the requested feature does not exist in the page data, return an EMPTY array [].
+Return ONLY valid JSON array."""
+
+
+async def _generate_speculative(
+    adapter: Any,
+    prompt: str,
+    strict_prompt: str,
+    check: Callable[[list[Any]], dict[str, Any]],
+) -> tuple[list[Any], dict[str, Any]]:
+    """Generate from *prompt* and *strict_prompt* concurrently.
+
+    The first result *check* marks valid wins and the other request is
+    cancelled. Otherwise the non-empty strict result is preferred (as the
+    sequential retry would replace the first one), then the primary's.
+    Returns ``(scenarios, check(scenarios))``; raises the primary's error
+    when both requests fail.
+    """
+    primary = asyncio.create_task(adapter.generate_scenarios(prompt))
+    strict = asyncio.create_task(adapter.generate_scenarios(strict_prompt))
+    pending = {primary, strict}
+    results: dict[asyncio.Task[Any], tuple[list[Any], dict[str, Any]]] = {}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    logger.warning(
+                        "Speculative generation failed: %s", task.exception(),
+                    )
+                    continue
+                scenarios = task.result() or []
+                relevance = check(scenarios)
+                if relevance.get("valid"):
+                    return scenarios, relevance
+                results[task] = (scenarios, relevance)
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    for task in (strict, primary):
+        if task in results and results[task][0]:
+            return results[task]
+    if primary in results:
+        return results[primary]
+    if strict in results:
+        return results[strict]
+    raise primary.exception()  # type: ignore[misc]
+
+
+def _scan_page_data(
+    pages_json: str | None, observations_json: str | None,
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]], dict[str, Any]]:
+    """Decode a scan's crawl into ``(pages, observations, page_data)``.
+
+    *page_data* merges the element lists of all pages (up to 20 links per
+    page). Nav menus, forms and buttons repeated across pages (site-wide
+    header/footer) are kept once, so the lists grow with the site's
+    distinct elements rather than its page count. Scan-level observations
+    fall back to the per-page ones.
+    """
+    pages = _parse_json(pages_json) or []
+    observations = _parse_json(observations_json) or []
+    if not observations:
+        observations = list(
+            chain.from_iterable(p.get("observations", ()) for p in pages),
+        )
+
+    def merged(key: str) -> Iterator[dict[str, Any]]:
+        return chain.from_iterable(p.get(key, ()) for p in pages)
+
+    page_data: dict[str, Any] = {
+        "nav_menus": unique_elements(merged("nav_menus"), nav_key),
+        "forms": unique_elements(merged("forms"), form_key),
+        "buttons": unique_elements(merged("buttons"), button_key),
+        "links": list(chain.from_iterable(islice(p.get("links", ()), 20) for p in pages)),
+        "images": list(merged("images")),
+    }
+    return pages, observations, page_data
+
+
+def _prompt_sections(
+    page_data: dict[str, Any], observations: list[dict[str, Any]], page_limit: int,
+) -> tuple[str, str, str]:
+    """Render the page data, observations and element summary prompt parts.
+
+    Page data is cut to *page_limit* characters. CPU-bound on large crawls,
+    so the convert route runs it in a worker thread.
+    """
+    observations_str = (
+        compress_observations_for_ai(observations, max_tokens=10000)
+        if observations else "No observations."
+    )
+    return (
+        dump_json_prefix(page_data, page_limit, indent=True),
+        observations_str,
+        _build_element_summary(observations, page_data),
+    )
+
+
 def _build_element_summary(
     observations: list[dict], page_data: dict,
 ) -> str:
@@ -906,17 +1201,17 @@ def _build_element_summary(
     if accordion_items:
         lines.append(
             f"- Accordions: {len(accordion_items)} items — "
-            f"test ALL: {json.dumps(accordion_items, ensure_ascii=False)}"
+            f"test ALL: {dump_json(accordion_items)}"
         )
     if modal_items:
         lines.append(
             f"- Modals: {len(modal_items)} triggers — "
-            f"test ALL: {json.dumps(modal_items, ensure_ascii=False)}"
+            f"test ALL: {dump_json(modal_items)}"
         )
     if page_nav_items:
         lines.append(
             f"- Page navigations: {len(page_nav_items)} links — "
-            f"{json.dumps(page_nav_items, ensure_ascii=False)}"
+            f"{dump_json(page_nav_items)}"
         )
 
     # Count page data elements
@@ -928,13 +1223,13 @@ def _build_element_summary(
         ]
         lines.append(
             f"- Images: {len(images)} total — "
-            f"test ALL: {json.dumps(img_alts, ensure_ascii=False)}"
+            f"test ALL: {dump_json(img_alts)}"
         )
 
     buttons = page_data.get("buttons", [])
     if buttons:
         btn_texts = [(b.get("text") or "")[:30] for b in buttons[:15]]
-        lines.append(f"- Buttons: {len(buttons)} — {json.dumps(btn_texts, ensure_ascii=False)}")
+        lines.append(f"- Buttons: {len(buttons)} — {dump_json(btn_texts)}")
 
     forms = page_data.get("forms", [])
     if forms:
@@ -1049,7 +1344,7 @@ def _check_feature_exists(
     page_data: dict | None,
 ) -> bool:
     """Check if the requested feature exists in observation/page data."""
-    obs_kw = intent["observation_kw"]
+    obs_kw = [kw.lower() for kw in intent["observation_kw"]]
 
     # Check observations
     for obs in observations:
@@ -1062,18 +1357,17 @@ def _check_feature_exists(
             str(obs.get("access_path", "")),
             str(change.get("navigated_page_fields", [])),
         ]).lower()
-        for kw in obs_kw:
-            if kw.lower() in searchable:
-                return True
+        if any(kw in searchable for kw in obs_kw):
+            return True
 
-    # Check page data (nav menus, buttons, links, forms)
+    # Check page data (nav menus, buttons, links, forms) — item by item, so a
+    # keyword never matches across two items
     if page_data:
-        for section in ["nav_menus", "buttons", "links", "forms"]:
-            for item in page_data.get(section, []):
-                item_str = json.dumps(item, ensure_ascii=False).lower()
-                for kw in obs_kw:
-                    if kw.lower() in item_str:
-                        return True
+        for section in ("nav_menus", "buttons", "links", "forms"):
+            for item in page_data.get(section, ()):
+                item_str = dump_json(item).lower()
+                if any(kw in item_str for kw in obs_kw):
+                    return True
 
     return False
 
@@ -1352,18 +1646,13 @@ def _filter_by_keywords(
 async def _broadcast_convert(session_id: int | None, data: dict) -> None:
     """Send progress data to convert WebSocket if session_id is set."""
     if session_id is not None:
-        await ws_manager.broadcast(session_id, data)
+        await convert_ws.broadcast(session_id, data)
 
 
 @router.websocket("/convert/ws/{session_id}")
 async def convert_websocket(websocket: WebSocket, session_id: int) -> None:
     """WebSocket for live convert progress."""
-    await ws_manager.connect(session_id, websocket)
-    try:
-        while True:
-            await websocket.receive_text()
-    except WebSocketDisconnect:
-        ws_manager.disconnect(session_id, websocket)
+    await convert_ws.serve(session_id, websocket)
 
 
 @router.websocket("/{test_id}/ws")
@@ -1373,10 +1662,4 @@ async def test_websocket(websocket: WebSocket, test_id: int) -> None:
     Events sent: test_start, scenarios_generated, step_start, step_done,
     step_fail, test_complete, test_fail.
     """
-    await ws_manager.connect(test_id, websocket)
-    try:
-        while True:
-            # Keep connection alive; client can send pings
-            await websocket.receive_text()
-    except WebSocketDisconnect:
-        ws_manager.disconnect(test_id, websocket)
+    await test_ws.serve(test_id, websocket)
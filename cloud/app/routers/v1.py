@@ -35,8 +35,7 @@ async def create_test_v1(
         status=initial_status,
     )
     db.add(test)
-    await db.commit()
-    await db.refresh(test)
+    await db.commit()  # INSERT returns the id; no refresh SELECT needed
 
     if not wait:
         return test
@@ -51,12 +50,13 @@ async def create_test_v1(
         await asyncio.sleep(poll_interval)
         elapsed += poll_interval
 
-        # Expire cached state so we see latest DB changes (worker commits)
-        db.expire_all()
-        result = await db.execute(select(Test).where(Test.id == test_id))
-        refreshed = result.scalar_one_or_none()
-        if refreshed and refreshed.status in (TestStatus.DONE, TestStatus.FAILED):
-            return refreshed
+        # Poll the status column only; load the full row once it is final
+        status = await db.scalar(select(Test.status).where(Test.id == test_id))
+        if status in (TestStatus.DONE, TestStatus.FAILED):
+            # Expire cached state so we see latest DB changes (worker commits)
+            db.expire_all()
+            result = await db.execute(select(Test).where(Test.id == test_id))
+            return result.scalar_one()
 
     raise HTTPException(
         status_code=408,
@@ -71,10 +71,7 @@ async def get_test_v1(
     db: AsyncSession = Depends(get_db),
 ) -> Test:
     """Get test status and results."""
-    result = await db.execute(
-        select(Test).where(Test.id == test_id, Test.user_id == user.id)
-    )
-    test = result.scalar_one_or_none()
-    if test is None:
+    test = await db.get(Test, test_id)
+    if test is None or test.user_id != user.id:
         raise HTTPException(status_code=404, detail="Test not found")
     return test
@@ -6,9 +6,31 @@ common logic (compression, validation, form-submit fix) in one place.
 
 from __future__ import annotations
 
+import functools
+import inspect
 import json
 import logging
-from typing import Any
+import math
+import string
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from typing import TYPE_CHECKING, Any
+
+import yaml
+
+from app.config import settings
+
+if TYPE_CHECKING:
+    from pydantic import TypeAdapter
+
+try:
+    import orjson  # type: ignore[import-not-found]
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+# libyaml-backed YAML (de)serializers when PyYAML was built with it
+YamlDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
 logger = logging.getLogger(__name__)
 
@@ -16,12 +38,6 @@ logger = logging.getLogger(__name__)
 # Constants
 # ---------------------------------------------------------------------------
 
-DEFAULT_AI_MODELS: dict[str, str] = {
-    "claude": "claude-sonnet-4-20250514",
-    "openai": "gpt-4o",
-    "ollama": "codellama:7b",
-}
-
 FORM_SUBMIT_RULE = """\
 **FORM SUBMIT BUTTON — CRITICAL**:
    After filling form fields (find_and_type steps), the NEXT click MUST be the
@@ -40,16 +56,331 @@ NOT '가입' (SUBMIT[nav])
 # Helpers
 # ---------------------------------------------------------------------------
 
-def parse_json(text: str | None) -> Any:
-    """Safely parse JSON text."""
-    if not text:
+def _orjson_text(obj: Any, option: int = 0) -> str:
+    """``orjson.dumps`` decoded to text (only call when orjson is installed)."""
+    data: bytes = orjson.dumps(obj, option=option)
+    return data.decode()
+
+
+def dump_json(obj: Any, *, indent: bool = False) -> str:
+    """Serialize *obj* to JSON text (non-ASCII kept as-is).
+
+    Used for AI prompts and the JSON text columns. Uses orjson when
+    installed; the stdlib fallback produces the same text, including
+    ``null`` for NaN/Infinity. Output is compact unless *indent* is set
+    (2 spaces).
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            return _orjson_text(obj, option)
+        except TypeError:
+            pass  # e.g. ints beyond 64 bits — let the stdlib handle it
+    kwargs: dict[str, Any] = {"indent": 2} if indent else {"separators": (",", ":")}
+    kwargs["allow_nan"] = False
+    try:
+        text = json.dumps(obj, ensure_ascii=False, **kwargs)
+    except ValueError:
+        obj = _finite(obj)
+        text = json.dumps(obj, ensure_ascii=False, **kwargs)
+    try:
+        text.encode()
+    except UnicodeEncodeError:
+        # Lone surrogates (an emoji cut in half by a crawler's JS substring)
+        # are not valid UTF-8 and the DB driver rejects them — \u-escape them
+        return json.dumps(obj, ensure_ascii=True, **kwargs)
+    return text
+
+
+def _finite(obj: Any) -> Any:
+    """Copy of *obj* with NaN/Infinity floats replaced by None.
+
+    orjson writes those as ``null``; the stdlib would write bare ``NaN``,
+    which is not JSON.
+    """
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(item) for item in obj]
+    return obj
+
+
+_COMPACT_ENCODER = json.JSONEncoder(
+    ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+)
+_INDENT_ENCODER = json.JSONEncoder(ensure_ascii=False, allow_nan=False, indent=2)
+
+
+def _orjson_chunks(
+    obj: Any, option: int, indent: bool, depth: int
+) -> Iterator[str]:
+    """Yield the JSON text of *obj* piecewise for :func:`dump_json_prefix`.
+
+    The two outer container levels are walked item by item; anything
+    deeper is handed to orjson whole. Matches :func:`dump_json` output.
+    """
+    if depth < 2 and isinstance(obj, (dict, list, tuple)) and obj:
+        is_dict = isinstance(obj, dict)
+        opener, closer = ("{", "}") if is_dict else ("[", "]")
+        if indent:
+            inner = "\n" + "  " * (depth + 1)
+            sep, close, colon = "," + inner, "\n" + "  " * depth + closer, ": "
+        else:
+            inner, sep, close, colon = "", ",", closer, ":"
+        yield opener + inner
+        items: Iterable[Any] = obj.items() if isinstance(obj, dict) else obj
+        for i, item in enumerate(items):
+            if i:
+                yield sep
+            if is_dict:
+                key, item = item
+                if not isinstance(key, str):
+                    raise TypeError("non-str key")
+                yield _orjson_text(key) + colon
+            yield from _orjson_chunks(item, option, indent, depth + 1)
+        yield close
+        return
+    text = _orjson_text(obj, option)
+    if indent and depth:
+        # JSON strings never contain raw newlines, so this only re-indents
+        text = text.replace("\n", "\n" + "  " * depth)
+    yield text
+
+
+def dump_json_prefix(obj: Any, limit: int, *, indent: bool = False) -> str:
+    """Return ``dump_json(obj, indent=indent)[:limit]``.
+
+    For prompt snippets cut to a fixed size. Both paths encode
+    incrementally and stop once *limit* characters exist, so large crawl
+    data is not serialized only to be thrown away.
+    """
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if indent else 0
+        chunks: list[str] = []
+        size = 0
+        try:
+            for chunk in _orjson_chunks(obj, option, indent, 0):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= limit:
+                    break
+        except TypeError:
+            pass  # non-str keys, huge ints — use the stdlib encoder below
+        else:
+            return "".join(chunks)[:limit]
+    encoder = _INDENT_ENCODER if indent else _COMPACT_ENCODER
+    try:
+        return _encode_prefix(encoder, obj, limit)
+    except ValueError:
+        return _encode_prefix(encoder, _finite(obj), limit)
+
+
+def _encode_prefix(encoder: json.JSONEncoder, obj: Any, limit: int) -> str:
+    """The first *limit* characters *encoder* produces for *obj*."""
+    chunks: list[str] = []
+    size = 0
+    for chunk in encoder.iterencode(obj):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= limit:
+            break
+    return "".join(chunks)[:limit]
+
+
+class PromptTemplate:
+    """A ``str.format`` prompt template parsed once at import time.
+
+    ``format(**fields)`` gives the same text as ``template.format(**fields)``
+    by joining the pre-split literal parts with the field values, and
+    ``length(fields)`` gives its size without building it. Only plain
+    ``{name}`` fields are supported (no conversions or format specs).
+    """
+
+    __slots__ = ("_parts", "fields", "fixed_len")
+
+    def __init__(self, template: str) -> None:
+        parts: list[str | None] = []  # literal text, then field name or None
+        fields: Counter[str] = Counter()
+        fixed_len = 0
+        for literal, name, spec, conversion in string.Formatter().parse(template):
+            if spec or conversion or (name is not None and not name.isidentifier()):
+                raise ValueError(f"Unsupported prompt field: {{{name}}}")
+            parts += (literal, name)
+            fixed_len += len(literal)
+            if name is not None:
+                fields[name] += 1
+        self._parts = tuple(parts)
+        self.fields = fields
+        self.fixed_len = fixed_len
+
+    def format(self, **values: str) -> str:
+        """Fill the template; a missing field raises KeyError."""
+        parts = self._parts
+        return "".join([
+            part if i % 2 == 0 else values[part]
+            for i, part in enumerate(parts)
+            if part is not None
+        ])
+
+    def length(self, values: dict[str, str]) -> int:
+        """``len(self.format(**values))`` without building the text."""
+        return self.fixed_len + sum(
+            len(values[name]) * count for name, count in self.fields.items()
+        )
+
+
+@functools.lru_cache(maxsize=8)
+def _ai_config(provider: str, api_key: str, model: str) -> Any:
+    from aat.core.models import AIConfig
+
+    return AIConfig(provider=provider, api_key=api_key, model=model)
+
+
+def settings_ai_config() -> Any:
+    """AIConfig for the configured AI provider (requires the AAT core).
+
+    Built once per provider/key/model value rather than per request; the
+    instance is shared, so callers must not mutate it.
+    """
+    return _ai_config(settings.ai_provider, settings.ai_api_key, settings.ai_model)
+
+
+@functools.cache
+def scenario_list_adapter() -> TypeAdapter[list[Any]]:
+    """``TypeAdapter(list[Scenario])`` (requires the AAT core), built once.
+
+    Validates a whole scenario list in one pydantic-core call instead of a
+    ``Scenario.model_validate`` per item.
+    """
+    from pydantic import TypeAdapter
+
+    from aat.core.models import Scenario
+
+    return TypeAdapter(list[Scenario])
+
+
+_adapters: dict[tuple[Any, str], Any] = {}
+
+
+def shared_adapter(adapter_cls: Any, ai_config: Any) -> Any:
+    """Return one AI adapter per (class, config), created on first use.
+
+    Adapters hold no state besides their SDK client, so sharing one keeps
+    its HTTP connection pool (and TLS sessions) warm across requests.
+    """
+    key = (adapter_cls, ai_config.model_dump_json())
+    adapter = _adapters.get(key)
+    if adapter is None:
+        adapter = _adapters[key] = adapter_cls(ai_config)
+    return adapter
+
+
+async def close_shared_adapters() -> None:
+    """Close the SDK clients of the shared adapters (app shutdown)."""
+    adapters = list(_adapters.values())
+    _adapters.clear()
+    for adapter in adapters:
+        close = getattr(getattr(adapter, "_client", None), "close", None)
+        if close is None:
+            continue
+        try:
+            result = close()
+            if inspect.isawaitable(result):
+                await result
+        except Exception:
+            logger.debug("Closing %s client failed", type(adapter).__name__, exc_info=True)
+
+
+def parse_json(text: str | bytes | bytearray | None) -> Any:
+    """Safely parse JSON text or UTF-8 bytes (orjson when installed)."""
+    if not text or text.isspace():  # blank column — nothing for either parser
         return None
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except (orjson.JSONDecodeError, TypeError):
+            pass  # NaN / oversized ints / bad input — stdlib decides below
     try:
         return json.loads(text)
     except (json.JSONDecodeError, TypeError):
         return None
 
 
+class _TreeDumper(YamlDumper):  # type: ignore[misc, valid-type]
+    """YamlDumper for freshly built trees, which never share a container.
+
+    Skips the representer's per-node alias bookkeeping — the output is the
+    same, since such a tree has nothing to anchor.
+    """
+
+    def ignore_aliases(self, data: Any) -> bool:
+        return True
+
+
+def scenarios_to_yaml(scenarios: list[Any]) -> tuple[str, int]:
+    """Serialize scenarios to the stored YAML document.
+
+    Returns ``(yaml_text, total_steps)``. Each scenario is dumped as a
+    single-item block list, which concatenates to the same document as
+    dumping the whole list while keeping only one dict alive at a time.
+    Pure CPU work — async callers run it via ``asyncio.to_thread``.
+    """
+    parts: list[str] = []
+    total_steps = 0
+    for sc in scenarios:
+        parts.append(yaml.dump(
+            [sc.model_dump(mode="json", exclude_none=True)],
+            Dumper=_TreeDumper,
+            default_flow_style=False,
+            allow_unicode=True,
+        ))
+        total_steps += len(sc.steps)
+    return "".join(parts), total_steps
+
+
+# ---------------------------------------------------------------------------
+# Crawled element identity
+# ---------------------------------------------------------------------------
+
+# Site-wide headers, footers and forms repeat on every crawled page, and
+# duplicates would only use up the prompt budget
+def nav_key(nav: dict[str, Any]) -> tuple[Any, ...]:
+    return nav.get("selector"), tuple(
+        (item.get("text"), item.get("href")) for item in nav.get("items", ())
+    )
+
+
+def form_key(form: dict[str, Any]) -> tuple[Any, ...]:
+    return form.get("selector"), form.get("action"), tuple(
+        field.get("name") for field in form.get("fields", ())
+    )
+
+
+def button_key(button: dict[str, Any]) -> tuple[Any, ...]:
+    return button.get("text"), button.get("selector")
+
+
+def unique_elements(
+    items: Iterable[dict[str, Any]],
+    key: Callable[[dict[str, Any]], Any],
+    seen: set[Any] | None = None,
+) -> list[dict[str, Any]]:
+    """*items* without repeats (by *key*), first occurrence kept.
+
+    Pass *seen* to also drop items already returned by earlier calls.
+    """
+    seen = set() if seen is None else seen
+    out: list[dict[str, Any]] = []
+    for item in items:
+        k = key(item)
+        if k not in seen:
+            seen.add(k)
+            out.append(item)
+    return out
+
+
 # ---------------------------------------------------------------------------
 # Observation compression
 # ---------------------------------------------------------------------------
@@ -120,7 +451,7 @@ def compress_observations_for_ai(
             summary_parts.append(f"→ {ct}")
 
         if new_text:
-            texts_preview = json.dumps(new_text[:5], ensure_ascii=False)
+            texts_preview = dump_json(new_text[:5])
             summary_parts.append(f"assert: {texts_preview}")
 
         lines.append(" | ".join(summary_parts))
@@ -412,58 +743,58 @@ def fix_form_submit_steps(
     After find_and_type steps, the next click should be a form submit
     button (context=form), not a navigation link (context=nav).
     """
+    # One pass over the observations collects the form submit buttons and
+    # the labels of nav links (nav-context submit buttons, nav items)
+    debug = logger.isEnabledFor(logging.DEBUG)
     form_submits: dict[str, dict] = {}
     all_submit_buttons: list[dict] = []
+    nav_labels: set[str] = set()
     for obs in observations:
-        change = obs.get("observed_change", {})
-        nav_fields = change.get("navigated_page_fields", [])
+        elem = obs.get("element", {})
+        if elem.get("type", "") == "nav_item":
+            t = (elem.get("text") or "").strip().lower()
+            if t:
+                nav_labels.add(t)
+        nav_fields = obs.get("observed_change", {}).get("navigated_page_fields", [])
         if not nav_fields:
             continue
-        elem_text = (obs.get("element", {}).get("text") or "").strip()
+        elem_text = (elem.get("text") or "").strip()
         for f in nav_fields:
-            if f.get("type") == "submit_button":
+            if f.get("type") != "submit_button":
+                continue
+            context = f.get("context")
+            if debug:
                 all_submit_buttons.append({
                     "obs_elem": elem_text,
                     "label": f.get("label"),
                     "selector": f.get("selector"),
-                    "context": f.get("context"),
+                    "context": context,
                 })
-                if f.get("context") == "form" and elem_text not in form_submits:
+            if context == "form":
+                if elem_text not in form_submits:
                     form_submits[elem_text] = {
                         "selector": f.get("selector", ""),
                         "label": f.get("label", ""),
                     }
+            elif context == "nav":
+                lbl = (f.get("label") or "").strip().lower()
+                if lbl:
+                    nav_labels.add(lbl)
 
-    logger.debug(
-        "=== FORM-SUBMIT FIX: all submit buttons found ===\n%s",
-        json.dumps(all_submit_buttons, ensure_ascii=False, indent=2),
-    )
-    logger.debug(
-        "=== FORM-SUBMIT FIX: form_submits (context=form) ===\n%s",
-        json.dumps(form_submits, ensure_ascii=False, indent=2),
-    )
+    if debug:
+        logger.debug(
+            "=== FORM-SUBMIT FIX: all submit buttons found ===\n%s",
+            dump_json(all_submit_buttons, indent=True),
+        )
+        logger.debug(
+            "=== FORM-SUBMIT FIX: form_submits (context=form) ===\n%s",
+            dump_json(form_submits, indent=True),
+        )
 
     if not form_submits:
         logger.debug("=== FIX APPLIED: NO (no form submit buttons found) ===")
         return scenarios
 
-    nav_labels: set[str] = set()
-    for obs in observations:
-        change = obs.get("observed_change", {})
-        for f in change.get("navigated_page_fields", []):
-            if f.get("type") == "submit_button" and f.get("context") == "nav":
-                lbl = (f.get("label") or "").strip().lower()
-                if lbl:
-                    nav_labels.add(lbl)
-
-    for obs in observations:
-        elem = obs.get("element", {})
-        elem_type = elem.get("type", "")
-        if elem_type == "nav_item":
-            t = (elem.get("text") or "").strip().lower()
-            if t:
-                nav_labels.add(t)
-
     logger.debug(
         "=== FORM-SUBMIT FIX: nav_labels (will be replaced) === %s",
         nav_labels,
@@ -785,11 +1116,11 @@ def ensure_post_submit_assert(scenarios: list) -> list:
 
         def _get_action(step: object) -> str:
             if hasattr(step, "action") and hasattr(step.action, "value"):
-                return step.action.value
+                return str(step.action.value)
             if hasattr(step, "action"):
                 return str(step.action)
             if isinstance(step, dict):
-                return step.get("action", "")
+                return str(step.get("action", ""))
             return ""
 
         # Find the last submit click after form input
@@ -105,8 +105,9 @@ class TestListResponse(BaseModel):
 
     tests: list[TestResponse]
     total: int
-    page: int
+    page: int | None  # None for pages fetched by cursor
     page_size: int
+    next_cursor: str | None = None  # pass as ?cursor= for the next page
 
 
 class UserResponse(BaseModel):
@@ -10,15 +10,16 @@ import contextlib
 import json
 import logging
 from datetime import UTC, datetime, timedelta
+from typing import Any
 
-from sqlalchemy import func, select
+from sqlalchemy import func, select, update
 
 from app.config import settings
 from app.database import async_session
 from app.executor import execute_test, generate_scenarios_for_test
 from app.middleware import get_concurrent_limit
 from app.models import Test, TestStatus, User, UserTier
-from app.ws import ws_manager
+from app.ws import test_ws
 
 logger = logging.getLogger(__name__)
 
@@ -113,38 +114,40 @@ class Worker:
     async def _recover_stuck(self) -> None:
         """On startup: fail tests stuck in RUNNING from previous crash."""
         async with async_session() as db:
-            result = await db.execute(
+            result = await db.scalars(
                 select(Test).where(Test.status == TestStatus.RUNNING)
             )
-            stuck = list(result.scalars().all())
+            stuck = list(result.all())
+            now = datetime.now(UTC)
             for test in stuck:
                 test.status = TestStatus.FAILED
                 test.error_message = "Test was interrupted by server restart"
-                test.updated_at = datetime.now(UTC)
+                test.updated_at = now
                 logger.warning("Startup: marked stuck test %d as FAILED", test.id)
             if stuck:
                 await db.commit()
 
     async def _fail_stuck_tests(self) -> None:
         """Periodically fail tests stuck in RUNNING or QUEUED beyond the timeout."""
-        cutoff = datetime.now(UTC) - timedelta(
+        now = datetime.now(UTC)
+        cutoff = now - timedelta(
             minutes=settings.stuck_timeout_minutes
         )
         async with async_session() as db:
-            result = await db.execute(
+            result = await db.scalars(
                 select(Test).where(
                     Test.status.in_([TestStatus.RUNNING, TestStatus.QUEUED]),
                     Test.updated_at < cutoff,
                 )
             )
-            stuck = list(result.scalars().all())
+            stuck = list(result.all())
             for test in stuck:
                 old_status = test.status
                 test.status = TestStatus.FAILED
                 test.error_message = (
                     f"Test timed out ({old_status.value} > {settings.stuck_timeout_minutes} min)"
                 )
-                test.updated_at = datetime.now(UTC)
+                test.updated_at = now
                 logger.warning(
                     "Auto-failed stuck test %d (%s > %d min)",
                     test.id,
@@ -158,7 +161,7 @@ class Worker:
                     task.cancel()
                     logger.info("Cancelled stuck asyncio task for test %d", test.id)
 
-                await ws_manager.broadcast(
+                await test_ws.broadcast(
                     test.id,
                     {
                         "type": "test_fail",
@@ -203,8 +206,7 @@ class Worker:
             if not _is_sqlite:
                 stmt = stmt.with_for_update(skip_locked=True)
 
-            result = await db.execute(stmt)
-            candidates = list(result.scalars().all())
+            candidates = list((await db.scalars(stmt)).all())
             if not candidates:
                 return None
 
@@ -253,18 +255,19 @@ class Worker:
             # DB status already updated by _fail_stuck_tests; just clean up
         except Exception as exc:
             logger.exception("Test %d failed unexpectedly", test_id)
-            async with async_session() as db:
-                test = (
-                    await db.execute(select(Test).where(Test.id == test_id))
-                ).scalar_one_or_none()
-                if test and test.status == TestStatus.RUNNING:
-                    test.status = TestStatus.FAILED
-                    test.result_json = json.dumps({"error": str(exc)})
-                    test.error_message = str(exc)
-                    test.updated_at = datetime.now(UTC)
-                    await db.commit()
-
-            await ws_manager.broadcast(
+            async with async_session.begin() as db:
+                await db.execute(
+                    update(Test)
+                    .where(Test.id == test_id, Test.status == TestStatus.RUNNING)
+                    .values(
+                        status=TestStatus.FAILED,
+                        result_json=json.dumps({"error": str(exc)}),
+                        error_message=str(exc),
+                        updated_at=datetime.now(UTC),
+                    )
+                )
+
+            await test_ws.broadcast(
                 test_id,
                 {"type": "test_fail", "test_id": test_id, "error": str(exc)},
             )
@@ -274,26 +277,23 @@ class Worker:
 
     async def _run_generate(self, test_id: int) -> None:
         """Generate scenarios and transition to REVIEW."""
-        await ws_manager.broadcast(
+        await test_ws.broadcast(
             test_id, {"type": "test_start", "test_id": test_id, "phase": "generate"}
         )
 
-        result = await generate_scenarios_for_test(test_id, ws_manager)
+        result = await generate_scenarios_for_test(test_id, test_ws)
 
-        async with async_session() as db:
-            test = (
-                await db.execute(select(Test).where(Test.id == test_id))
-            ).scalar_one()
-            if result.get("error"):
-                test.status = TestStatus.FAILED
-                test.error_message = result["error"]
-            else:
-                test.status = TestStatus.REVIEW
-            test.updated_at = datetime.now(UTC)
-            await db.commit()
+        values: dict[str, Any] = {"updated_at": datetime.now(UTC)}
+        if result.get("error"):
+            values["status"] = TestStatus.FAILED
+            values["error_message"] = result["error"]
+        else:
+            values["status"] = TestStatus.REVIEW
+        async with async_session.begin() as db:
+            await db.execute(update(Test).where(Test.id == test_id).values(**values))
 
         if result.get("error"):
-            await ws_manager.broadcast(
+            await test_ws.broadcast(
                 test_id,
                 {"type": "test_fail", "test_id": test_id, "error": result["error"]},
             )
@@ -302,26 +302,23 @@ class Worker:
 
     async def _run_execute(self, test_id: int) -> None:
         """Execute test scenarios and transition to DONE/FAILED."""
-        await ws_manager.broadcast(
+        await test_ws.broadcast(
             test_id, {"type": "test_start", "test_id": test_id}
         )
 
-        result = await execute_test(test_id, ws_manager)
+        result = await execute_test(test_id, test_ws)
 
-        async with async_session() as db:
-            test = (
-                await db.execute(select(Test).where(Test.id == test_id))
-            ).scalar_one()
-            test.status = (
-                TestStatus.DONE if result.get("passed") else TestStatus.FAILED
-            )
-            test.result_json = json.dumps(result, default=str)
-            if result.get("error"):
-                test.error_message = result["error"]
-            test.updated_at = datetime.now(UTC)
-            await db.commit()
+        values = {
+            "status": TestStatus.DONE if result.get("passed") else TestStatus.FAILED,
+            "result_json": json.dumps(result, default=str),
+            "updated_at": datetime.now(UTC),
+        }
+        if result.get("error"):
+            values["error_message"] = result["error"]
+        async with async_session.begin() as db:
+            await db.execute(update(Test).where(Test.id == test_id).values(**values))
 
-        await ws_manager.broadcast(
+        await test_ws.broadcast(
             test_id,
             {
                 "type": "test_complete",
@@ -1,51 +1,336 @@
-"""WebSocket connection manager for per-test live progress."""
+"""WebSocket connection manager for live test/scan progress.
+
+Events are routed by channel — ``"test:<id>"``, ``"scan:<id>"`` or
+``"convert:<session_id>"``. Per-kind :class:`WSTopic` views (``test_ws``,
+``scan_ws``, ``convert_ws``) keep the ``(id, event)`` call style and stop
+ids of different kinds from sharing a channel.
+"""
 
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import logging
-from collections import defaultdict
+import time
+from collections import OrderedDict, defaultdict
+from collections.abc import Hashable
 from typing import Any
 
 from fastapi import WebSocket
 
+from app.scenario_utils import dump_json
+
 logger = logging.getLogger(__name__)
 
+_CHANNEL_PREFIX = "awt:ws:"
+
+CHANNEL_KINDS = ("test", "scan", "convert")
+
+# Multiplexed sockets get the events of one window in a single frame
+_BATCH_WINDOW = 0.05  # seconds
+
+# Redis relay resubscribe backoff (seconds)
+_RELAY_RETRY_DELAY = 1.0
+_RELAY_MAX_RETRY_DELAY = 30.0
+
+# Owners of channels with no DB row (convert sessions), see WSManager.claim
+_OWNER_PREFIX = "awt:ws-owner:"
+_CLAIM_TTL = 3600  # seconds
+_MAX_CLAIMS = 10_000
+
 
 class WSManager:
-    """Manage WebSocket connections per test_id."""
+    """Manage WebSocket connections per channel.
+
+    A socket either watches one channel (the per-resource ``/ws`` endpoints,
+    one raw event per frame) or is multiplexed over many (``/api/ws``).
+    Multiplexed sockets receive the events of each ``_BATCH_WINDOW`` as one
+    JSON array of ``{"channel": ..., "data": ...}`` items, so a dashboard
+    watching many busy channels is not sent a frame per event.
+
+    By default broadcasts only reach sockets held by this process. With
+    ``start_relay`` (Redis pub/sub) every broadcast is published instead and
+    each worker process delivers it to its own sockets, so multi-worker
+    deployments do not lose events. A dropped subscription is re-established
+    with backoff; until then broadcasts are delivered locally.
+    """
 
     def __init__(self) -> None:
-        self._connections: dict[int, list[WebSocket]] = defaultdict(list)
+        self._connections: dict[Hashable, list[WebSocket]] = defaultdict(list)
+        self._subscribers: dict[Hashable, set[WebSocket]] = defaultdict(set)
+        # Per multiplexed socket: items waiting for the next frame, and the
+        # task that sends them (one sender per socket keeps frames ordered)
+        self._outbox: dict[WebSocket, list[str]] = {}
+        self._flushers: dict[WebSocket, asyncio.Task[None]] = {}
+        # Held for every send on a multiplexed socket, so replies to its
+        # client frames never overlap a batch frame
+        self._send_locks: dict[WebSocket, asyncio.Lock] = {}
+        # Redis client to publish to — set only while the relay is subscribed
+        self._redis: Any = None
+        self._relay_client: Any = None
+        self._listener: asyncio.Task[None] | None = None
+        # channel → (owner, expires_at), oldest first
+        self._owners: OrderedDict[str, tuple[str, float]] = OrderedDict()
+
+    def topic(self, kind: str) -> WSTopic:
+        """Id-keyed view of the ``"<kind>:<id>"`` channels."""
+        return WSTopic(self, kind)
 
-    async def connect(self, test_id: int, ws: WebSocket) -> None:
+    async def connect(self, channel: Hashable, ws: WebSocket) -> None:
         await ws.accept()
-        self._connections[test_id].append(ws)
+        self._connections[channel].append(ws)
         logger.debug(
-            "WS connected: test_id=%d (total=%d)", test_id, len(self._connections[test_id])
+            "WS connected: channel=%s (total=%d)", channel, len(self._connections[channel])
         )
 
-    def disconnect(self, test_id: int, ws: WebSocket) -> None:
-        conns = self._connections.get(test_id)
+    def disconnect(self, channel: Hashable, ws: WebSocket) -> None:
+        conns = self._connections.get(channel)
         if conns and ws in conns:
             conns.remove(ws)
             if not conns:
-                del self._connections[test_id]
+                del self._connections[channel]
+
+    def subscribe(self, channel: Hashable, ws: WebSocket) -> None:
+        """Add an already-accepted multiplexed socket to *channel*."""
+        self._subscribers[channel].add(ws)
+        self._send_locks.setdefault(ws, asyncio.Lock())
+
+    async def send(self, ws: WebSocket, text: str) -> None:
+        """Send one frame to multiplexed *ws*, between its event batches."""
+        async with self._send_locks.setdefault(ws, asyncio.Lock()):
+            await ws.send_text(text)
+
+    def release(self, ws: WebSocket) -> None:
+        """Forget multiplexed *ws* once its endpoint has unsubscribed it."""
+        self._send_locks.pop(ws, None)
 
-    async def broadcast(self, test_id: int, data: dict[str, Any]) -> None:
-        """Send JSON event to all WebSocket clients watching a test."""
-        conns = self._connections.get(test_id)
-        if not conns:
+    def unsubscribe(self, channel: Hashable, ws: WebSocket) -> None:
+        subs = self._subscribers.get(channel)
+        if subs is not None:
+            subs.discard(ws)
+            if not subs:
+                del self._subscribers[channel]
+
+    async def claim(self, channel: str, owner: str) -> bool:
+        """Bind *channel* to *owner* on first use; False if another owner holds it.
+
+        For channels whose ids are picked by the client (convert sessions),
+        so no DB row says who may watch them. Claims expire after
+        ``_CLAIM_TTL``. With the Redis relay they are shared by all worker
+        processes; otherwise they are held in this process.
+        """
+        if self._relay_client is not None:
+            key = f"{_OWNER_PREFIX}{channel}"
+            try:
+                await self._relay_client.set(key, owner, nx=True, ex=_CLAIM_TTL)
+                held = await self._relay_client.get(key)
+                if isinstance(held, bytes):
+                    held = held.decode()
+                return bool(held == owner)
+            except Exception:
+                logger.warning("Redis claim failed, checking locally", exc_info=True)
+
+        now = time.monotonic()
+        held_by = self._owners.get(channel)
+        if held_by is not None and held_by[1] > now:
+            return held_by[0] == owner
+        self._owners[channel] = (owner, now + _CLAIM_TTL)
+        self._owners.move_to_end(channel)
+        while len(self._owners) > _MAX_CLAIMS:
+            self._owners.popitem(last=False)
+        return True
+
+    async def broadcast(self, channel: Hashable, data: dict[str, Any]) -> None:
+        """Send JSON event to all WebSocket clients watching a channel.
+
+        The event is encoded once (compact) and the same text frame goes to
+        every client and through the relay, instead of one encode per socket.
+        """
+        if (
+            self._redis is None
+            and not self._connections.get(channel)
+            and not self._subscribers.get(channel)
+        ):
+            return
+        text = dump_json(data)
+        if self._redis is not None:
+            try:
+                await self._redis.publish(f"{_CHANNEL_PREFIX}{channel}", text)
+                return
+            except Exception:
+                logger.warning("Redis publish failed, delivering locally", exc_info=True)
+        await self._send_local(channel, text)
+
+    async def _send_local(self, channel: Hashable, text: str) -> None:
+        conns = self._connections.get(channel)
+        subs = self._subscribers.get(channel)
+        if not conns and not subs:
             return
 
         dead: list[WebSocket] = []
-        for ws in conns:
+        for ws in conns or ():
             try:
-                await ws.send_json(data)
+                await ws.send_text(text)
             except Exception:
                 dead.append(ws)
-
         for ws in dead:
-            self.disconnect(test_id, ws)
+            self.disconnect(channel, ws)
+
+        if subs:
+            # Wrap the already-encoded event once for every multiplexed socket
+            item = f'{{"channel":{dump_json(channel)},"data":{text}}}'
+            for ws in subs:
+                pending = self._outbox.get(ws)
+                if pending is not None:
+                    pending.append(item)
+                else:
+                    self._outbox[ws] = [item]
+                    self._flushers[ws] = asyncio.create_task(self._flush(ws))
+
+    async def _flush(self, ws: WebSocket) -> None:
+        """Send *ws* its queued items, one frame per window, until idle."""
+        try:
+            while True:
+                await asyncio.sleep(_BATCH_WINDOW)
+                items = self._outbox[ws]
+                lock = self._send_locks.get(ws)
+                if not items or lock is None:  # idle, or the socket was released
+                    break
+                self._outbox[ws] = []
+                async with lock:
+                    await ws.send_text(f"[{','.join(items)}]")
+        except Exception:
+            # Closed socket: drop it from every channel it watched
+            for channel in [c for c, subs in self._subscribers.items() if ws in subs]:
+                self.unsubscribe(channel, ws)
+        finally:
+            del self._outbox[ws], self._flushers[ws]
+
+    # -- Optional Redis relay (multi-process deployments) --
+
+    async def start_relay(self, redis_url: str) -> None:
+        """Route broadcasts through Redis pub/sub."""
+        try:
+            import redis.asyncio as aioredis  # type: ignore[import-not-found, import-untyped]
+        except ImportError:
+            logger.warning("redis not installed, WebSocket broadcasts stay in-process")
+            return
+
+        self._relay_client = aioredis.from_url(redis_url)
+        self._listener = asyncio.create_task(self._run_relay(self._relay_client))
+
+    async def stop_relay(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._listener
+            self._listener = None
+        if self._relay_client is not None:
+            await self._relay_client.aclose()
+            self._relay_client = None
+
+    async def _run_relay(self, client: Any) -> None:
+        """Keep the relay subscribed, resubscribing with backoff after drops.
+
+        Broadcasts are published only while the subscription is up; while it
+        is down they go to this process's sockets directly, since a published
+        event would reach no listener here.
+        """
+        delay = _RELAY_RETRY_DELAY
+        while True:
+            pubsub = client.pubsub()
+            try:
+                await pubsub.psubscribe(f"{_CHANNEL_PREFIX}*")
+                self._redis = client
+                logger.info("WebSocket broadcasts relayed via Redis")
+                delay = _RELAY_RETRY_DELAY
+                await self._relay_loop(pubsub)
+                logger.warning("Redis relay subscription ended, resubscribing")
+            except Exception:
+                logger.warning(
+                    "Redis relay connection failed, retrying in %.0fs", delay, exc_info=True,
+                )
+            finally:
+                self._redis = None
+                with contextlib.suppress(Exception):
+                    await pubsub.aclose()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _RELAY_MAX_RETRY_DELAY)
+
+    async def _relay_loop(self, pubsub: Any) -> None:
+        """Deliver relayed events to the sockets held by this process."""
+        async for message in pubsub.listen():
+            if message.get("type") != "pmessage":
+                continue
+            channel, text = message["channel"], message["data"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            if isinstance(text, bytes):
+                text = text.decode()
+            suffix = channel[len(_CHANNEL_PREFIX):]
+            key: Hashable = int(suffix) if suffix.isdecimal() else suffix
+            # Already-encoded JSON — forwarded without a decode/encode round trip
+            await self._send_local(key, text)
+
+
+class WSTopic:
+    """The ``"<kind>:<id>"`` channels of a :class:`WSManager`, keyed by id.
+
+    Has the same ``connect`` / ``disconnect`` / ``broadcast(id, event)``
+    surface the crawler and executor already call.
+    """
+
+    def __init__(self, manager: WSManager, kind: str) -> None:
+        self._manager = manager
+        self.kind = kind
+
+    def channel(self, ident: int) -> str:
+        return f"{self.kind}:{ident}"
+
+    async def connect(self, ident: int, ws: WebSocket) -> None:
+        await self._manager.connect(self.channel(ident), ws)
+
+    def disconnect(self, ident: int, ws: WebSocket) -> None:
+        self._manager.disconnect(self.channel(ident), ws)
+
+    async def claim(self, ident: int, owner: str) -> bool:
+        return await self._manager.claim(self.channel(ident), owner)
+
+    async def broadcast(self, ident: int, data: dict[str, Any]) -> None:
+        await self._manager.broadcast(self.channel(ident), data)
+
+    async def serve(self, ident: int, ws: WebSocket) -> None:
+        """Accept *ws* on the channel and keep it until the client leaves."""
+        await self.connect(ident, ws)
+        try:
+            await hold_open(ws)
+        finally:
+            self.disconnect(ident, ws)
+
+
+async def hold_open(ws: WebSocket) -> None:
+    """Return once *ws* disconnects, discarding whatever the client sends.
+
+    Reads raw ASGI messages, so text or binary keepalives from clients are
+    both fine. Dead peers are dropped by the server's protocol-level pings
+    (uvicorn ``--ws-ping-interval`` / ``--ws-ping-timeout``), which end the
+    receive with a disconnect.
+    """
+    while (await ws.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+def parse_channel(channel: Any) -> str | None:
+    """Normalize a client-supplied ``"<kind>:<id>"`` channel (None if invalid)."""
+    if not isinstance(channel, str):
+        return None
+    kind, sep, ident = channel.partition(":")
+    if not sep or kind not in CHANNEL_KINDS or not ident.isdecimal():
+        return None
+    return f"{kind}:{int(ident)}"
 
 
 ws_manager = WSManager()
+test_ws = ws_manager.topic("test")
+scan_ws = ws_manager.topic("scan")
+convert_ws = ws_manager.topic("convert")
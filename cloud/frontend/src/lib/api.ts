@@ -44,8 +44,9 @@ export interface TestItem {
 export interface TestListResponse {
   tests: TestItem[];
   total: number;
-  page: number;
+  page: number | null;
   page_size: number;
+  next_cursor: string | null;
 }
 
 export async function createTest(
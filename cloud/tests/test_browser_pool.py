@@ -0,0 +1,104 @@
+"""Tests for the warm browser shared by page visits."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import playwright.async_api
+import pytest
+from app import browser_pool
+
+
+class _Context:
+    def __init__(self) -> None:
+        self.closed = False
+
+    def set_default_timeout(self, _ms: int) -> None:
+        pass
+
+    async def new_page(self) -> SimpleNamespace:
+        return SimpleNamespace(context=self)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class _Browser:
+    def __init__(self) -> None:
+        self.connected = True
+        self.contexts: list[_Context] = []
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    async def new_context(self, **_kwargs: object) -> _Context:
+        self.contexts.append(_Context())
+        return self.contexts[-1]
+
+    async def close(self) -> None:
+        self.connected = False
+
+
+@pytest.fixture
+def launches(monkeypatch: pytest.MonkeyPatch) -> list[_Browser]:
+    """Fake Playwright; returns the browsers it launches."""
+    browsers: list[_Browser] = []
+
+    async def _launch(**_kwargs: object) -> _Browser:
+        browsers.append(_Browser())
+        return browsers[-1]
+
+    async def _stop() -> None:
+        pass
+
+    pw = SimpleNamespace(chromium=SimpleNamespace(launch=_launch), stop=_stop)
+
+    async def _start() -> SimpleNamespace:
+        return pw
+
+    monkeypatch.setattr(
+        playwright.async_api, "async_playwright", lambda: SimpleNamespace(start=_start),
+    )
+    monkeypatch.setattr(browser_pool.settings, "warm_browser_idle_seconds", 60)
+    return browsers
+
+
+@pytest.mark.asyncio
+async def test_pages_share_one_browser(launches: list[_Browser]) -> None:
+    """Visits reuse the browser, each in its own context closed afterwards."""
+    try:
+        async with browser_pool.page() as first:
+            pass
+        async with browser_pool.page() as second:
+            assert not second.context.closed
+        assert len(launches) == 1
+        assert first.context is not second.context
+        assert first.context.closed and second.context.closed
+
+        launches[0].connected = False  # crashed
+        async with browser_pool.page():
+            pass
+        assert len(launches) == 2
+    finally:
+        await browser_pool.close()
+    assert not launches[1].connected
+
+
+@pytest.mark.asyncio
+async def test_browser_closes_when_idle(
+    launches: list[_Browser], monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """The browser closes after the idle period, not while a visit runs."""
+    monkeypatch.setattr(browser_pool.settings, "warm_browser_idle_seconds", 0)
+    try:
+        async with browser_pool.page():
+            async with browser_pool.page():
+                pass
+            await asyncio.sleep(0.01)
+            assert launches[0].connected  # one visit still open
+        await asyncio.sleep(0.01)
+        assert not launches[0].connected
+        assert browser_pool._browser is None
+    finally:
+        await browser_pool.close()
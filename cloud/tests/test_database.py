@@ -0,0 +1,42 @@
+"""Tests for database URL handling."""
+
+from __future__ import annotations
+
+import pytest
+from app.config import settings
+from app.database import _engine_kwargs, async_database_url
+
+
+@pytest.mark.parametrize(("url", "expected"), [
+    ("postgresql://u:p@h:6543/db", "postgresql+asyncpg://u:p@h:6543/db"),
+    ("postgres://u:p@h/db", "postgresql+asyncpg://u:p@h/db"),
+    ("postgresql+asyncpg://u:p@h/db", "postgresql+asyncpg://u:p@h/db"),
+    ("postgresql+psycopg://u:p@h/db", "postgresql+psycopg://u:p@h/db"),
+    ("sqlite+aiosqlite:///./awt_cloud.db", "sqlite+aiosqlite:///./awt_cloud.db"),
+])
+def test_async_database_url(url: str, expected: str) -> None:
+    """Plain PostgreSQL URLs get the async driver; explicit drivers are kept."""
+    assert async_database_url(url) == expected
+
+
+def test_async_database_url_psycopg_fallback() -> None:
+    assert async_database_url("postgresql://h/db", "psycopg") == "postgresql+psycopg://h/db"
+
+
+def test_engine_kwargs_transaction_pooler(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Behind a transaction pooler, drivers stop reusing prepared statements."""
+    url = "postgresql+asyncpg://u:p@h:6543/db"
+    assert "connect_args" not in _engine_kwargs(url)
+
+    monkeypatch.setattr(settings, "db_transaction_pooler", True)
+    args = _engine_kwargs(url)["connect_args"]
+    assert args["statement_cache_size"] == 0
+    assert args["prepared_statement_cache_size"] == 0
+    name_func = args["prepared_statement_name_func"]
+    assert name_func() != name_func()
+
+    psycopg = _engine_kwargs("postgresql+psycopg://u:p@h:6543/db")["connect_args"]
+    assert psycopg == {"prepare_threshold": None}
+    assert _engine_kwargs("sqlite+aiosqlite://")["connect_args"] == {
+        "check_same_thread": False,
+    }
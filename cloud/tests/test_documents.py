@@ -0,0 +1,31 @@
+"""Tests for reference document helpers."""
+
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+import pytest
+from app.models import Document
+from app.routers.documents import get_user_doc_text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+@pytest.mark.asyncio
+async def test_get_user_doc_text_combines_and_truncates(db_session: AsyncSession) -> None:
+    """Texts are joined in upload order and the result capped at 16,000 chars."""
+    texts = ["가" * 100, None, "b" * 20_000]
+    db_session.add_all([
+        Document(
+            user_id="test-uid-001", filename=f"doc{i}.txt", content_type="text/plain",
+            size_bytes=1, content_base64="", extracted_text=text,
+            created_at=datetime(2026, 1, 1, i, tzinfo=UTC),
+        )
+        for i, text in enumerate(texts)
+    ])
+    await db_session.commit()
+
+    combined = await get_user_doc_text("test-uid-001", db_session)
+
+    expected = f"--- doc0.txt ---\n{texts[0]}\n\n--- doc2.txt ---\n{texts[2]}"
+    assert combined == expected[:16_000] + "\n... (truncated)"
+    assert await get_user_doc_text("other-uid", db_session) == ""
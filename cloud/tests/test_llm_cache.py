@@ -0,0 +1,77 @@
+"""Tests for the in-process AI response cache."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+
+import pytest
+from app import llm_cache
+from app.config import settings
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache() -> Iterator[None]:
+    llm_cache.clear()
+    yield
+    llm_cache.clear()
+
+
+def test_make_key_is_stable_and_separates_parts() -> None:
+    """Same parts → same key; part boundaries matter."""
+    assert llm_cache.make_key("claude", "m", "p") == llm_cache.make_key("claude", "m", "p")
+    assert llm_cache.make_key("ab", "c") != llm_cache.make_key("a", "bc")
+
+
+def test_put_then_get() -> None:
+    key = llm_cache.make_key("x")
+    assert llm_cache.get(key) is None
+    llm_cache.put(key, "response")
+    assert llm_cache.get(key) == "response"
+
+
+def test_entry_expires(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Entries older than the TTL are dropped on read."""
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "monotonic", lambda: now[0])
+    key = llm_cache.make_key("x")
+    llm_cache.put(key, "response")
+    now[0] += settings.llm_cache_ttl_seconds
+    assert llm_cache.get(key) is None
+
+
+def test_least_recently_used_is_evicted(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "llm_cache_max_entries", 2)
+    a, b, c = (llm_cache.make_key(k) for k in "abc")
+    llm_cache.put(a, "a")
+    llm_cache.put(b, "b")
+    llm_cache.get(a)  # a is now the most recently used
+    llm_cache.put(c, "c")
+    assert llm_cache.get(b) is None
+    assert llm_cache.get(a) == "a"
+    assert llm_cache.get(c) == "c"
+
+
+def test_zero_ttl_disables_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "llm_cache_ttl_seconds", 0)
+    key = llm_cache.make_key("x")
+    llm_cache.put(key, "response")
+    assert llm_cache.get(key) is None
+
+
+def test_similar_prompt_hits_within_scope() -> None:
+    """A near-identical prompt in the same scope reuses the stored value."""
+    base = " ".join(f"word{i}" for i in range(400))
+    llm_cache.put_similar("scope", base, "plan")
+    assert llm_cache.get_similar("scope", base + " extra") == "plan"
+    assert llm_cache.get_similar("other-scope", base) is None
+
+
+def test_dissimilar_prompt_misses() -> None:
+    llm_cache.put_similar("scope", " ".join(f"a{i}" for i in range(100)), "plan")
+    assert llm_cache.get_similar("scope", " ".join(f"b{i}" for i in range(100))) is None
+
+
+def test_similar_disabled_by_zero_threshold(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "llm_similar_threshold", 0)
+    llm_cache.put_similar("scope", "same prompt text here", "plan")
+    assert llm_cache.get_similar("scope", "same prompt text here") is None
@@ -0,0 +1,738 @@
+"""Tests for Smart Scan plan helpers."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import string
+from datetime import UTC, datetime
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from app import llm_cache
+from app.models import Scan, ScanStatus
+from app.routers import scan as scan_router
+from app.routers.scan import (
+    _BUSINESS_HINTS,
+    _EXECUTE_PROMPT,
+    _PLAN_LINK_SAMPLE_CAP,
+    _PLAN_SYSTEM,
+    _PLAN_USER_SECTIONS,
+    BUSINESS_TEMPLATES,
+    _ai_raw_call,
+    _business_hints,
+    _crawl_result_values,
+    _execute_prompt_len,
+    _extract_json,
+    _extract_json_text,
+    _generate_default_plan,
+    _generate_scenarios_cached,
+    _page_outline,
+    _parsed_scan_columns,
+    _prompt_slice,
+    _scan_to_response,
+)
+from app.scenario_utils import dump_json, dump_json_prefix
+from app.schemas import ScanResponse
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from aat.core.models import AIConfig, Scenario
+
+# ---------------------------------------------------------------------------
+# BUSINESS_TEMPLATES structure validation
+# ---------------------------------------------------------------------------
+
+
+def test_every_template_requires_a_feature() -> None:
+    """The feature → template index used by the default plan relies on this."""
+    for site_type, templates in BUSINESS_TEMPLATES.items():
+        for tmpl in templates:
+            assert tmpl.get("requires_feature"), f"{site_type}: {tmpl.get('name_en')}"
+
+
+# ---------------------------------------------------------------------------
+# _generate_default_plan — business templates
+# ---------------------------------------------------------------------------
+
+
+def _business_names(features: list[str], site_type: str) -> list[str]:
+    plan = _generate_default_plan(
+        None, [], [], features, {"site_type": {"type": site_type}}, "en", [],
+    )
+    for cat in plan["categories"]:
+        if cat["id"] == "business":
+            return [t["name"] for t in cat["tests"]]
+    return []
+
+
+def test_business_tests_one_per_feature() -> None:
+    """Each detected feature gets exactly one business test, site type first."""
+    names = _business_names(["login_form", "search", "cart", "spa"], "saas")
+    saas = {t["name_en"] for t in BUSINESS_TEMPLATES["saas"]}
+    assert len(names) == 3
+    assert set(names[:2]) <= saas  # login_form + search from the saas templates
+    assert names[2] not in saas  # cart comes from the ecommerce templates
+
+
+def test_business_tests_without_coverable_features() -> None:
+    """No template matches → no business category."""
+    assert _business_names(["spa", "sticky_header"], "blog") == []
+
+
+def test_business_hints_one_per_feature_site_type_first() -> None:
+    """Hint index: one line per feature, the site type's own template winning."""
+    for site_type, hints in _BUSINESS_HINTS.items():
+        features = [feat for feat, _ in hints]
+        assert len(features) == len(set(features))
+        own = BUSINESS_TEMPLATES.get(site_type, [])
+        own_features = list(dict.fromkeys(t["requires_feature"] for t in own))
+        assert features[:len(own_features)] == own_features
+    all_features = {t["requires_feature"] for ts in BUSINESS_TEMPLATES.values() for t in ts}
+    assert {feat for feat, _ in _BUSINESS_HINTS[""]} == all_features
+
+
+def test_business_hints_text() -> None:
+    """Matching features give hint lines in index order; none gives the fallback."""
+    features = frozenset(feat for feat, _ in _BUSINESS_HINTS["saas"][:2])
+    text = _business_hints("saas", features)
+    assert text.splitlines() == [line for _, line in _BUSINESS_HINTS["saas"][:2]]
+    assert _business_hints("saas", frozenset()) == (
+        "No specific business tests for this site type."
+    )
+
+
+# ---------------------------------------------------------------------------
+# Plan prompt split + _ai_raw_call
+# ---------------------------------------------------------------------------
+
+
+class _Recorder:
+    """Stands in for an SDK ``create`` method and records its kwargs."""
+
+    def __init__(self, response: Any) -> None:
+        self.response = response
+        self.kwargs: dict[str, Any] = {}
+
+    async def create(self, **kwargs: Any) -> Any:
+        self.kwargs = kwargs
+        return self.response
+
+
+def test_plan_system_prompt_is_static() -> None:
+    """The cached system prefix has no per-scan placeholders."""
+    assert "{language}" not in _PLAN_SYSTEM
+    assert "{target_url}" not in _PLAN_SYSTEM
+    assert "{{" not in _PLAN_SYSTEM
+    assert any("{target_url}" in section for section in _PLAN_USER_SECTIONS)
+
+
+def test_plan_user_sections_keep_every_placeholder_once() -> None:
+    """Splitting the user prompt must not drop or duplicate a field."""
+    fields = [
+        name
+        for section in _PLAN_USER_SECTIONS
+        for _, name, _, _ in string.Formatter().parse(section)
+        if name
+    ]
+    assert len(fields) == len(set(fields)) == 16
+
+
+def test_execute_prompt_size_from_parts() -> None:
+    """The size computed from the parts matches the formatted prompt."""
+    fields = {
+        name: f"<{name}>" * 3
+        for _, name, _, _ in string.Formatter().parse(_EXECUTE_PROMPT)
+        if name
+    }
+    assert _execute_prompt_len(fields) == len(_EXECUTE_PROMPT.format(**fields))
+
+
+def test_link_sample_cap_fills_prompt_slice() -> None:
+    """Capping the link sample must not shorten the 3000-char links section."""
+    smallest = [{"text": "", "href": ""}] * _PLAN_LINK_SAMPLE_CAP
+    assert len(dump_json(smallest, indent=True)) >= 3000
+
+
+def test_prompt_slice_keeps_truncated_text() -> None:
+    """Stopping early must not change the truncated prompt section."""
+    buttons = [{"text": f"Button {i}", "selector": f"#b{i}"} for i in range(500)]
+    consumed: list[dict] = []
+
+    def _walk() -> Any:
+        for button in buttons:
+            consumed.append(button)
+            yield button
+
+    kept = _prompt_slice(_walk(), 3000)
+    assert len(consumed) < len(buttons)
+    assert dump_json_prefix(kept, 3000, indent=True) == dump_json_prefix(
+        buttons, 3000, indent=True,
+    )
+    assert _prompt_slice(buttons[:3], 3000) == buttons[:3]
+
+
+@pytest.mark.asyncio
+async def test_ai_raw_call_anthropic_caches_system() -> None:
+    """Anthropic clients get the system prompt as a cache_control block."""
+    messages = _Recorder(SimpleNamespace(content=[SimpleNamespace(text="{}")]))
+    adapter = SimpleNamespace(
+        _client=SimpleNamespace(messages=messages),
+        _config=SimpleNamespace(model="m"),
+    )
+    assert await _ai_raw_call(adapter, "user part", system="rules") == "{}"
+    assert messages.kwargs["system"] == [
+        {"type": "text", "text": "rules", "cache_control": {"type": "ephemeral"}},
+    ]
+    assert messages.kwargs["messages"] == [{"role": "user", "content": "user part"}]
+
+
+@pytest.mark.asyncio
+async def test_ai_raw_call_anthropic_block_breakpoints() -> None:
+    """Prompt blocks get cache breakpoints except the last, within the API limit."""
+    messages = _Recorder(SimpleNamespace(content=[SimpleNamespace(text="{}")]))
+    adapter = SimpleNamespace(
+        _client=SimpleNamespace(messages=messages),
+        _config=SimpleNamespace(model="m"),
+    )
+    await _ai_raw_call(adapter, ["a", "b", "c", "d", "e"], system="rules")
+    content = messages.kwargs["messages"][0]["content"]
+    assert [block["text"] for block in content] == ["a", "b", "c", "d", "e"]
+    assert ["cache_control" in block for block in content] == [
+        False, True, True, True, False,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_ai_raw_call_openai_system_first() -> None:
+    """OpenAI clients get the system prompt as the first message."""
+    message = SimpleNamespace(content="{}")
+    completions = _Recorder(SimpleNamespace(choices=[SimpleNamespace(message=message)]))
+    adapter = SimpleNamespace(
+        _client=SimpleNamespace(chat=SimpleNamespace(completions=completions)),
+        _config=SimpleNamespace(model="m"),
+    )
+    assert await _ai_raw_call(adapter, "user part", system="rules") == "{}"
+    assert completions.kwargs["messages"] == [
+        {"role": "system", "content": "rules"},
+        {"role": "user", "content": "user part"},
+    ]
+
+    await _ai_raw_call(adapter, ["a", "b"], system="rules")
+    assert completions.kwargs["messages"][1] == {"role": "user", "content": "a\n\nb"}
+
+
+# ---------------------------------------------------------------------------
+# _generate_scenarios_cached
+# ---------------------------------------------------------------------------
+
+
+class _CountingAdapter:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def generate_scenarios(self, prompt: str) -> list[Scenario]:
+        self.calls += 1
+        return [Scenario.model_validate({
+            "id": "SC-001",
+            "name": "Home",
+            "steps": [{"step": 1, "action": "navigate", "value": "/", "description": "go"}],
+        })]
+
+
+@pytest.mark.asyncio
+async def test_generate_scenarios_cached_reuses_identical_prompt() -> None:
+    """Second identical prompt is served from cache as fresh objects."""
+    llm_cache.clear()
+    adapter = _CountingAdapter()
+    config = AIConfig(provider="claude", model="m")
+
+    first = await _generate_scenarios_cached(adapter, config, "prompt")
+    first[0].steps.clear()  # post-processing must not leak into the cache
+    second = await _generate_scenarios_cached(adapter, config, "prompt")
+    await _generate_scenarios_cached(adapter, config, "other prompt")
+
+    assert adapter.calls == 2
+    assert len(second[0].steps) == 1
+    llm_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_plan_near_duplicate_scoped_by_language(
+    client: AsyncClient, db_session: AsyncSession, monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """A re-plan in another language is not served the earlier plan."""
+    llm_cache.clear()
+    db_session.add(Scan(
+        id=10, user_id="test-uid-001", target_url="https://example.com",
+        status=ScanStatus.COMPLETED,
+        page_outline_json='[{"url": "https://example.com", "title": "Home"}]',
+    ))
+    await db_session.commit()
+
+    calls: list[str] = []
+
+    async def _raw_call(_adapter: object, prompt: list[str], **_kwargs: object) -> str:
+        calls.append("\n\n".join(prompt))
+        return dump_json({"categories": [
+            {"name": "Nav", "tests": [{"id": "T1", "name": "Home"}]},
+        ]})
+
+    monkeypatch.setitem(
+        scan_router.ADAPTER_REGISTRY, scan_router.settings.ai_provider, object,
+    )
+    monkeypatch.setattr(scan_router, "shared_adapter", lambda *_: object())
+    monkeypatch.setattr(scan_router, "_ai_raw_call", _raw_call)
+    try:
+        for language in ("en", "ko", "ko"):
+            resp = await client.post("/api/scan/10/plan", json={"language": language})
+            assert resp.status_code == 200
+    finally:
+        llm_cache.clear()
+
+    assert len(calls) == 2
+    assert "Korean" in calls[1]
+
+
+@pytest.mark.asyncio
+async def test_plan_caches_only_checked_normalized_json(
+    client: AsyncClient, db_session: AsyncSession, monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Unusable AI replies are not cached; usable ones are cached as plain JSON."""
+    llm_cache.clear()
+    db_session.add(Scan(
+        id=12, user_id="test-uid-001", target_url="https://example.com",
+        status=ScanStatus.COMPLETED,
+        page_outline_json='[{"url": "https://example.com", "title": "Home"}]',
+    ))
+    await db_session.commit()
+
+    good = {"categories": [{"name": "Nav", "tests": [{"id": "T1", "name": "Home"}]}]}
+    replies = [
+        '{"categories": [{"name": "Nav", "tests": "T1"}]}',
+        "Here you go:\n```json\n" + json.dumps(good, indent=4) + "\n```",
+    ]
+
+    calls: list[int] = []
+
+    async def _raw_call(*_args: object, **_kwargs: object) -> str:
+        calls.append(len(calls))
+        return replies[calls[-1]]
+
+    monkeypatch.setitem(
+        scan_router.ADAPTER_REGISTRY, scan_router.settings.ai_provider, object,
+    )
+    monkeypatch.setattr(scan_router, "shared_adapter", lambda *_: object())
+    monkeypatch.setattr(scan_router, "_ai_raw_call", _raw_call)
+    try:
+        resp = await client.post("/api/scan/12/plan", json={})
+        assert resp.status_code == 200
+        assert not llm_cache._entries  # default plan used, nothing cached
+
+        resp = await client.post("/api/scan/12/plan", json={})
+        assert resp.status_code == 200
+        assert [v for _, v in llm_cache._entries.values()] == [dump_json(good)]
+
+        resp = await client.post("/api/scan/12/plan", json={})  # served from cache
+        assert resp.status_code == 200
+    finally:
+        llm_cache.clear()
+    assert calls == [0, 1]
+
+
+# ---------------------------------------------------------------------------
+# _parsed_scan_columns
+# ---------------------------------------------------------------------------
+
+
+def test_parsed_scan_columns_memoized_per_finished_scan() -> None:
+    """A finished scan parses once; the cache is keyed on id + completed_at."""
+    scan = SimpleNamespace(
+        id=1, completed_at=datetime.now(UTC), summary_json='{"total_pages": 1}',
+        pages_json='[{"url": "https://example.com"}]',
+        broken_links_json="[]", detected_features='["search"]',
+    )
+    first = _parsed_scan_columns(scan)
+    assert first[1] == [{"url": "https://example.com"}]
+    assert _parsed_scan_columns(SimpleNamespace(**vars(scan))) is first
+
+    running = SimpleNamespace(**{**vars(scan), "id": 2, "completed_at": None})
+    assert _parsed_scan_columns(running) is not _parsed_scan_columns(running)
+
+    for i in range(3, 3 + scan_router._SCAN_COLUMNS_CACHE_SIZE):
+        _parsed_scan_columns(SimpleNamespace(**{**vars(scan), "id": i}))
+    assert (1, scan.completed_at) not in scan_router._scan_columns_cache
+
+
+def test_scan_to_response_validates_via_response_model() -> None:
+    """The raw summary dict is validated (once) into ScanResponse."""
+    scan = SimpleNamespace(
+        id=1, target_url="https://example.com", status=ScanStatus.COMPLETED,
+        summary_json='{"total_pages": 2, "site_type": {"type": "blog", "confidence": 0.8}}',
+        pages_json=None, broken_links_json=None, detected_features=None,
+        error_message=None,  # only the response columns
+        created_at=datetime.now(UTC), completed_at=None,
+    )
+    response = ScanResponse.model_validate(_scan_to_response(scan))
+    assert response.summary is not None
+    assert response.summary.total_pages == 2
+    assert response.summary.site_type is not None
+    assert response.summary.site_type.type == "blog"
+    assert ScanResponse.model_validate(
+        _scan_to_response(SimpleNamespace(**{**vars(scan), "summary_json": None})),
+    ).summary is None
+
+
+@pytest.mark.asyncio
+async def test_get_scan_returns_response_model_fields(
+    client: AsyncClient, db_session: AsyncSession,
+) -> None:
+    """GET /api/scan/{id} keeps the ScanResponse shape (no logs/observations)."""
+    db_session.add(Scan(
+        id=7, user_id="test-uid-001", target_url="https://example.com",
+        status=ScanStatus.COMPLETED,
+        summary_json='{"total_pages": 1, "extra": true}',
+        pages_json='[{"url": "https://example.com", "title": "홈"}]',
+        logs_json='[{"message": "done"}]',
+    ))
+    await db_session.commit()
+
+    resp = await client.get("/api/scan/7")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["status"] == "completed"
+    assert data["pages"][0]["title"] == "홈"
+    assert data["summary"]["total_pages"] == 1
+    assert "extra" not in data["summary"]
+    assert "logs" not in data and "observations" not in data
+    assert ScanResponse.model_validate(data).id == 7
+
+
+@pytest.mark.asyncio
+async def test_execute_rejects_unknown_selection(
+    client: AsyncClient, db_session: AsyncSession,
+) -> None:
+    """Selected ids are matched exactly; odd AI-made ids never match or crash."""
+    plan = {"categories": [{"tests": [
+        {"id": ["T1"], "name": "list id"},
+        {"id": 1, "name": "int id"},
+        {"name": "no id"},
+    ]}]}
+    db_session.add(Scan(
+        id=8, user_id="test-uid-001", target_url="https://example.com",
+        status=ScanStatus.PLANNED, plan_json=dump_json(plan),
+    ))
+    await db_session.commit()
+
+    resp = await client.post(
+        "/api/scan/8/execute", json={"selected_tests": ["T1", "1"]},
+    )
+    assert resp.status_code == 422
+    assert resp.json()["detail"] == "No valid tests selected"
+
+
+@pytest.mark.asyncio
+async def test_execute_rejects_before_reading_crawl_blobs(
+    client: AsyncClient, db_session: AsyncSession,
+) -> None:
+    """A scan in the wrong status is rejected without selecting pages_json."""
+    from sqlalchemy import event
+
+    from tests.conftest import test_engine
+
+    db_session.add(Scan(
+        id=9, user_id="test-uid-001", target_url="https://example.com",
+        status=ScanStatus.COMPLETED, pages_json='[{"url": "https://example.com"}]',
+    ))
+    await db_session.commit()
+
+    statements: list[str] = []
+
+    def _record(_conn, _cursor, statement, *_args) -> None:  # type: ignore[no-untyped-def]
+        statements.append(statement)
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        resp = await client.post("/api/scan/9/execute", json={"selected_tests": ["T1"]})
+    finally:
+        event.remove(test_engine.sync_engine, "before_cursor_execute", _record)
+
+    assert resp.status_code == 409
+    assert statements
+    assert not [s for s in statements if "pages_json" in s]
+
+
+@pytest.mark.asyncio
+async def test_execute_releases_db_before_ai_call(
+    client: AsyncClient, db_session: AsyncSession, monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """No transaction (and so no pooled connection) is held during generation."""
+    from app.routers import scan as scan_router
+
+    plan = {"categories": [{"tests": [{"id": "T1", "name": "Login"}]}]}
+    db_session.add(Scan(
+        id=9, user_id="test-uid-001", target_url="https://example.com",
+        status=ScanStatus.PLANNED, plan_json=dump_json(plan), pages_json="[]",
+    ))
+    await db_session.commit()
+
+    in_transaction: list[bool] = []
+
+    async def _generate(*_args: object) -> list:
+        in_transaction.append(db_session.in_transaction())
+        return []
+
+    monkeypatch.setitem(
+        scan_router.ADAPTER_REGISTRY, scan_router.settings.ai_provider, object,
+    )
+    monkeypatch.setattr(scan_router, "shared_adapter", lambda *_: object())
+    monkeypatch.setattr(scan_router, "_generate_scenarios_cached", _generate)
+
+    resp = await client.post("/api/scan/9/execute", json={"selected_tests": ["T1"]})
+    assert resp.status_code == 422
+    assert resp.json()["detail"] == "AI generated no scenarios"
+    assert in_transaction == [False]
+
+
+@pytest.mark.asyncio
+async def test_execute_cancels_doc_fetch_on_error(
+    client: AsyncClient, db_session: AsyncSession, monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """A failure while building the prompt does not leave the doc query running."""
+    from app.routers import scan as scan_router
+
+    plan = {"categories": [{"tests": [{"id": "T1", "name": "Login"}]}]}
+    db_session.add(Scan(
+        id=9, user_id="test-uid-001", target_url="https://example.com",
+        status=ScanStatus.PLANNED, plan_json=dump_json(plan), pages_json="[]",
+    ))
+    await db_session.commit()
+
+    fetch_cancelled = asyncio.Event()
+
+    async def _doc_text(*_args: object) -> str:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            fetch_cancelled.set()
+            raise
+        return ""
+
+    def _match(*_args: object) -> list:
+        raise ValueError("bad scan data")
+
+    monkeypatch.setitem(
+        scan_router.ADAPTER_REGISTRY, scan_router.settings.ai_provider, object,
+    )
+    monkeypatch.setattr(scan_router, "shared_adapter", lambda *_: object())
+    monkeypatch.setattr(scan_router, "get_user_doc_text", _doc_text)
+    monkeypatch.setattr(scan_router, "match_elements_to_patterns", _match)
+
+    with pytest.raises(ValueError, match="bad scan data"):
+        await client.post("/api/scan/9/execute", json={"selected_tests": ["T1"]})
+    assert fetch_cancelled.is_set()
+
+
+def test_page_outline_keeps_first_seen_elements() -> None:
+    """Repeated header/forms are dropped, links capped, heavy fields removed."""
+    header = {"selector": "nav.top", "items": [{"text": "Home", "href": "/"}]}
+    search = {"selector": "form#q", "fields": [{"name": "q", "type": "search"}]}
+    pages = [
+        {
+            "url": "/", "nav_menus": [header], "forms": [search], "buttons": [],
+            "links": [{"text": str(i), "href": f"/{i}", "selector": "a"} for i in range(15)],
+            "screenshot_base64": "x" * 1000, "inputs": [{"name": "q"}],
+        },
+        {
+            "url": "/about", "nav_menus": [dict(header)], "forms": [search],
+            "observations": [{"element": {"text": "FAQ"}}],
+        },
+    ]
+    outline = _page_outline(pages)
+    assert outline[0]["nav_menus"] == [header]
+    assert len(outline[0]["links"]) == 10
+    assert outline[0]["links"][0] == {"text": "0", "href": "/0"}
+    assert "screenshot_base64" not in outline[0] and "inputs" not in outline[0]
+    assert outline[1] == {"url": "/about", "observations": [{"element": {"text": "FAQ"}}]}
+
+
+# ---------------------------------------------------------------------------
+# _extract_json
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.parametrize("text", [
+    '{"categories": []}',
+    '  \n{"categories": []}',
+    'Here you go:\n```json\n{"categories": []}\n```',
+    '```\n{"categories": []}\n```',
+    'Plan follows {"categories": []} — done',
+    'Plan follows {"categories": []} — see {notes} below',
+    'Use {placeholders} in values: {"categories": []}',
+])
+def test_extract_json_variants(text: str) -> None:
+    """Bare, fenced and embedded JSON objects are all recovered."""
+    assert _extract_json(text) == {"categories": []}
+
+
+def test_extract_json_text_returns_parsed_source() -> None:
+    """The returned text is the exact JSON that was parsed."""
+    text = 'Plan:\n```json\n{"categories": [{"id": "basic"}]}\n```\nDone.'
+    plan, source = _extract_json_text(text)
+    assert source == '{"categories": [{"id": "basic"}]}'
+    assert json.loads(source) == plan
+
+
+def test_extract_json_parses_each_candidate_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    """A broken ```json block (also hit by the generic fence) is parsed once."""
+    calls: list[str] = []
+    decoder = scan_router._JSON_DECODER
+
+    class _CountingDecoder:
+        def decode(self, text: str) -> Any:
+            calls.append(text)
+            return decoder.decode(text)
+
+        raw_decode = decoder.raw_decode
+
+    monkeypatch.setattr(scan_router, "_JSON_DECODER", _CountingDecoder())
+    with pytest.raises(ValueError):
+        _extract_json("```json\n{broken\n```")
+    assert calls == ["{broken"]
+
+
+def test_extract_json_rejects_non_standard_constants() -> None:
+    """NaN/Infinity are not JSON; such a reply has no valid plan."""
+    with pytest.raises(ValueError):
+        _extract_json('{"categories": [{"score": NaN}]}')
+
+
+def test_extract_json_no_json_raises() -> None:
+    with pytest.raises(ValueError):
+        _extract_json("no json here")
+
+
+def test_crawl_result_values() -> None:
+    """Finished crawls map to column values; failures skip the result columns."""
+    result = {
+        "summary": {"total_pages": 1}, "pages": [], "broken_links": [],
+        "detected_features": ["search"],
+    }
+    values = _crawl_result_values(result, [{"message": "done"}])
+    assert values["status"] == ScanStatus.COMPLETED
+    assert json.loads(values["detected_features"]) == ["search"]
+    assert "observations_json" not in values
+    assert json.loads(values["logs_json"]) == [{"message": "done"}]
+
+    failed = _crawl_result_values({"error": "timeout"}, [])
+    assert failed["status"] == ScanStatus.FAILED
+    assert "pages_json" not in failed and "logs_json" not in failed
+
+
+@pytest.mark.asyncio
+async def test_crawl_result_values_split_surrogate(db_session: AsyncSession) -> None:
+    """Text cut inside an emoji by the crawler's JS substring is still stored."""
+    title = "Sale \ud83c"  # "\U0001f389" cut after its high surrogate
+    result = {
+        "summary": {"total_pages": 1}, "pages": [{"url": "/", "title": title}],
+        "broken_links": [], "detected_features": [],
+        "observations": [{"page_title": title, "text": "안내"}],
+    }
+    values = _crawl_result_values(result, [{"message": title}])
+    db_session.add(Scan(
+        id=11, user_id="test-uid-001", target_url="https://example.com",
+        **values,
+    ))
+    await db_session.commit()
+
+    scan = await db_session.get(Scan, 11)
+    assert scan is not None
+    assert json.loads(scan.pages_json)[0]["title"] == title
+    assert json.loads(scan.observations_json)[0]["text"] == "안내"
+
+
+# ---------------------------------------------------------------------------
+# Background crawl lifetime
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.asyncio
+async def test_shutdown_crawls_waits_then_cancels(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Quick crawls finish; ones still running after the timeout are cancelled."""
+    tasks: set[asyncio.Task[None]] = set()
+    monkeypatch.setattr(scan_router, "_crawl_tasks", tasks)
+    finished: list[str] = []
+
+    async def _crawl(name: str, delay: float) -> None:
+        await asyncio.sleep(delay)
+        finished.append(name)
+
+    quick = asyncio.create_task(_crawl("quick", 0))
+    stuck = asyncio.create_task(_crawl("stuck", 60))
+    tasks.update((quick, stuck))
+
+    await scan_router.shutdown_crawls(timeout=0.05)
+
+    assert finished == ["quick"]
+    assert stuck.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_crawl_result_kept_when_broadcast_fails(
+    client: AsyncClient, db_session: AsyncSession, monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """A failed scan_complete notification leaves the scan COMPLETED."""
+    from tests.conftest import test_session_factory
+
+    async def _crawl_site(*_args: object, **_kwargs: object) -> dict:
+        return {
+            "summary": {"total_pages": 1}, "pages": [], "broken_links": [],
+            "detected_features": [],
+        }
+
+    class _BrokenWS:
+        async def broadcast(self, *_args: object) -> None:
+            raise ConnectionError("relay down")
+
+    tasks: set[asyncio.Task[None]] = set()
+    monkeypatch.setattr(scan_router, "_crawl_tasks", tasks)
+    monkeypatch.setattr(scan_router, "crawl_site", _crawl_site)
+    monkeypatch.setattr(scan_router, "scan_ws", _BrokenWS())
+    monkeypatch.setattr(scan_router, "async_session", test_session_factory)
+
+    resp = await client.post("/api/scan", json={"target_url": "https://example.com"})
+    assert resp.status_code == 201
+    await asyncio.gather(*tasks)
+
+    scan = await db_session.get(Scan, resp.json()["id"], populate_existing=True)
+    assert scan is not None
+    assert scan.status == ScanStatus.COMPLETED
+    assert scan.error_message is None
+
+
+@pytest.mark.asyncio
+async def test_crawl_cancelled_by_shutdown_marks_scan_failed(
+    client: AsyncClient, db_session: AsyncSession, monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """A crawl cut off by shutdown_crawls is left FAILED, not SCANNING."""
+    from tests.conftest import test_session_factory
+
+    async def _crawl_site(*_args: object, **_kwargs: object) -> dict:
+        await asyncio.sleep(60)
+        return {}
+
+    monkeypatch.setattr(scan_router, "_crawl_tasks", set())
+    monkeypatch.setattr(scan_router, "crawl_site", _crawl_site)
+    monkeypatch.setattr(scan_router, "async_session", test_session_factory)
+
+    resp = await client.post("/api/scan", json={"target_url": "https://example.com"})
+    assert resp.status_code == 201
+    await asyncio.sleep(0)
+    await scan_router.shutdown_crawls(timeout=0.05)
+
+    scan = await db_session.get(Scan, resp.json()["id"], populate_existing=True)
+    assert scan is not None
+    assert scan.status == ScanStatus.FAILED
+    assert scan.error_message == "Scan interrupted by server shutdown"
+    assert scan.completed_at is not None
@@ -0,0 +1,341 @@
+"""Tests for shared scenario utilities."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+import yaml
+from app import scenario_utils
+from app.scenario_utils import (
+    PromptTemplate,
+    YamlDumper,
+    YamlLoader,
+    close_shared_adapters,
+    dump_json,
+    dump_json_prefix,
+    fix_form_submit_steps,
+    nav_key,
+    parse_json,
+    scenario_list_adapter,
+    scenarios_to_yaml,
+    settings_ai_config,
+    shared_adapter,
+    unique_elements,
+)
+
+# ---------------------------------------------------------------------------
+# dump_json
+# ---------------------------------------------------------------------------
+
+_SAMPLE = {
+    "nav_menus": [{"text": "로그인", "href": "/login"}],
+    "forms": [],
+    "count": 3,
+    "ok": True,
+    "none": None,
+}
+
+
+def test_dump_json_keeps_non_ascii() -> None:
+    """Korean text must not be escaped."""
+    assert "로그인" in dump_json(_SAMPLE)
+
+
+def test_dump_json_compact_round_trip() -> None:
+    """Compact output has no whitespace separators and round-trips."""
+    text = dump_json(_SAMPLE)
+    assert ", " not in text and ": " not in text
+    assert json.loads(text) == _SAMPLE
+
+
+def test_dump_json_indent() -> None:
+    """indent=True matches json.dumps(indent=2)."""
+    assert dump_json(_SAMPLE, indent=True) == json.dumps(
+        _SAMPLE, ensure_ascii=False, indent=2,
+    )
+
+
+def test_dump_json_stdlib_fallback(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Without orjson the stdlib produces the same text."""
+    fast = dump_json(_SAMPLE)
+    fast_indent = dump_json(_SAMPLE, indent=True)
+    monkeypatch.setattr(scenario_utils, "orjson", None)
+    assert dump_json(_SAMPLE) == fast
+    assert dump_json(_SAMPLE, indent=True) == fast_indent
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dump_json_non_finite_floats_are_null(
+    monkeypatch: pytest.MonkeyPatch, use_orjson: bool,
+) -> None:
+    """NaN/Infinity become null on both paths, never bare NaN."""
+    if not use_orjson:
+        monkeypatch.setattr(scenario_utils, "orjson", None)
+    obj = {"score": float("nan"), "hits": [1.5, float("inf"), -float("inf")]}
+    expected = '{"score":null,"hits":[1.5,null,null]}'
+    assert dump_json(obj) == expected
+    assert json.loads(dump_json(obj, indent=True)) == json.loads(expected)
+    assert dump_json_prefix(obj, 12) == expected[:12]
+
+
+def test_dump_json_big_int() -> None:
+    """Values orjson cannot encode fall back to the stdlib."""
+    assert dump_json([2**70]) == f"[{2**70}]"
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+@pytest.mark.parametrize("indent", [True, False])
+@pytest.mark.parametrize("limit", [1, 17, 60, 10_000])
+def test_dump_json_prefix_matches_sliced_dump(
+    monkeypatch: pytest.MonkeyPatch, use_orjson: bool, indent: bool, limit: int,
+) -> None:
+    """The prefix equals the full dump cut at *limit*, with or without orjson."""
+    expected = dump_json(_SAMPLE, indent=indent)[:limit]
+    if not use_orjson:
+        monkeypatch.setattr(scenario_utils, "orjson", None)
+    assert dump_json_prefix(_SAMPLE, limit, indent=indent) == expected
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dump_json_prefix_stops_early(
+    monkeypatch: pytest.MonkeyPatch, use_orjson: bool,
+) -> None:
+    """Neither path encodes the whole object."""
+    if not use_orjson:
+        monkeypatch.setattr(scenario_utils, "orjson", None)
+    seen: list[int] = []
+
+    def _items():  # type: ignore[no-untyped-def]
+        for i in range(10_000):
+            seen.append(i)
+            yield i
+
+    class _Lazy(list):  # both encoders walk lists via iteration
+        def __iter__(self):  # type: ignore[no-untyped-def]
+            return _items()
+
+    assert dump_json_prefix(_Lazy([0]), 20) == dump_json(list(range(100)))[:20]
+    assert len(seen) < 100
+
+
+# ---------------------------------------------------------------------------
+# parse_json
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.parametrize("text", [None, "", "  \n", b"", "{not json", "[1,"])
+def test_parse_json_invalid_returns_none(text: str | bytes | None) -> None:
+    """Empty or malformed input yields None."""
+    assert parse_json(text) is None
+
+
+def test_parse_json_round_trip() -> None:
+    """Valid JSON parses to the same object."""
+    assert parse_json(dump_json(_SAMPLE)) == _SAMPLE
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_parse_json_bytes(monkeypatch: pytest.MonkeyPatch, use_orjson: bool) -> None:
+    """UTF-8 bytes parse like the decoded text, with or without orjson."""
+    if not use_orjson:
+        monkeypatch.setattr(scenario_utils, "orjson", None)
+    raw = dump_json(_SAMPLE).encode()
+    assert parse_json(raw) == parse_json(bytearray(raw)) == _SAMPLE
+
+
+def test_parse_json_stdlib_only_values() -> None:
+    """Values orjson rejects (NaN, big ints) still parse via the stdlib."""
+    assert parse_json(f"[{2**70}]") == [2**70]
+    result = parse_json("[NaN]")
+    assert isinstance(result, list) and result[0] != result[0]
+
+
+# ---------------------------------------------------------------------------
+# YamlDumper / YamlLoader
+# ---------------------------------------------------------------------------
+
+
+def test_yaml_dumper_matches_safe_dump() -> None:
+    """The libyaml dumper emits the same text as yaml.safe_dump."""
+    data = [{"name": "로그인 테스트", "steps": [{"action": "click", "value": None}]}]
+    options = {"default_flow_style": False, "allow_unicode": True}
+    assert yaml.dump(data, Dumper=YamlDumper, **options) == yaml.safe_dump(data, **options)
+
+
+def test_scenarios_to_yaml_matches_list_dump() -> None:
+    """Per-scenario dumps join to the whole-list document; steps are counted."""
+    from aat.core.models import Scenario
+
+    scenarios = [
+        Scenario.model_validate({
+            "id": f"SC-00{i}",
+            "name": f"시나리오 {i}",
+            "steps": [
+                {"step": n, "action": "navigate", "value": "/", "description": "이동"}
+                for n in range(1, i + 2)
+            ],
+        })
+        for i in range(3)
+    ]
+    text, total = scenarios_to_yaml(scenarios)
+    assert total == 6
+    assert text == yaml.safe_dump(
+        [s.model_dump(mode="json", exclude_none=True) for s in scenarios],
+        default_flow_style=False,
+        allow_unicode=True,
+    )
+    assert scenarios_to_yaml([]) == ("", 0)
+
+
+# ---------------------------------------------------------------------------
+# PromptTemplate
+# ---------------------------------------------------------------------------
+
+
+def test_prompt_template_matches_str_format() -> None:
+    """format/length agree with str.format, including {{ }} escapes and repeats."""
+    text = 'Site {url} — JSON: {{"a": [{{}}]}}\n{url} again, {doc}{doc}.'
+    fields = {"url": "https://예시.com", "doc": "x" * 5}
+    template = PromptTemplate(text)
+    assert template.format(**fields) == text.format(**fields)
+    assert template.length(fields) == len(text.format(**fields))
+    assert PromptTemplate("{a}").format(a="1") == "1"
+    with pytest.raises(KeyError):
+        template.format(url="only")
+
+
+@pytest.mark.parametrize("text", ["{a!r}", "{a:>4}", "{a.b}", "{0}", "{}"])
+def test_prompt_template_rejects_complex_fields(text: str) -> None:
+    """Only plain {name} fields are supported."""
+    with pytest.raises(ValueError):
+        PromptTemplate(text)
+
+
+def test_scenario_list_adapter_validates_whole_list() -> None:
+    """One shared adapter validates a scenario list like per-item model_validate."""
+    from pydantic import ValidationError
+
+    from aat.core.models import Scenario
+
+    items = [
+        {"id": f"SC-00{i}", "name": "n", "steps": [
+            {"step": 1, "action": "navigate", "value": "/", "description": "d"},
+        ]}
+        for i in range(2)
+    ]
+    adapter = scenario_list_adapter()
+    assert adapter is scenario_list_adapter()
+    assert adapter.validate_python(items) == [Scenario.model_validate(i) for i in items]
+    with pytest.raises(ValidationError):
+        adapter.validate_python([{"id": "SC-001", "steps": "nope"}])
+
+
+def _submit_field(label: str, context: str) -> dict:
+    return {"type": "submit_button", "label": label, "selector": f"#{label}", "context": context}
+
+
+@pytest.mark.parametrize("nav_source", ["nav_field", "nav_item"])
+def test_fix_form_submit_steps_replaces_nav_click(nav_source: str) -> None:
+    """A nav click right after form input becomes the form's submit button."""
+    fields = [{"type": "email", "name": "email"}, _submit_field("다음", "form")]
+    observations = [{"element": {"text": "회원가입"}, "observed_change": {
+        "navigated_page_fields": fields,
+    }}]
+    if nav_source == "nav_field":
+        fields.append(_submit_field("가입", "nav"))
+    else:
+        observations.append({"element": {"text": " 가입 ", "type": "nav_item"}})
+    scenarios = [{"steps": [
+        {"action": "find_and_click", "target": {"text": "회원가입"}},
+        {"action": "find_and_type", "target": {"text": "email"}, "value": "a@b.c"},
+        {"action": "find_and_click", "target": {"text": "가입"}},
+        {"action": "find_and_click", "target": {"text": "가입"}},
+    ]}]
+
+    steps = fix_form_submit_steps(scenarios, observations)[0]["steps"]
+
+    assert steps[2]["target"] == {"text": "다음", "selector": "#다음"}
+    assert steps[3]["target"] == {"text": "가입"}  # not right after input
+    # Without a form-context submit button nothing changes
+    untouched = [{"steps": [
+        {"action": "find_and_type", "target": {"text": "q"}},
+        {"action": "find_and_click", "target": {"text": "가입"}},
+    ]}]
+    observations[0]["observed_change"]["navigated_page_fields"] = [_submit_field("가입", "nav")]
+    assert fix_form_submit_steps(untouched, observations)[0]["steps"][1]["target"] == {
+        "text": "가입",
+    }
+
+
+def test_yaml_loader_is_safe() -> None:
+    """Python object tags are rejected, as with yaml.safe_load."""
+    with pytest.raises(yaml.YAMLError):
+        yaml.load("!!python/object/apply:os.system ['true']", Loader=YamlLoader)
+
+
+def test_unique_elements_drops_site_wide_repeats() -> None:
+    """A header nav repeated on every page is kept once, in first-seen order."""
+    header = {"selector": "nav.top", "items": [{"text": "Home", "href": "/"}]}
+    footer = {"selector": "nav.foot", "items": [{"text": "Terms", "href": "/terms"}]}
+    blog = {**header, "items": [{"text": "Blog", "href": "/b"}]}
+    assert unique_elements([header, footer, dict(header), blog], nav_key) == [header, footer, blog]
+
+
+# ---------------------------------------------------------------------------
+# shared_adapter
+# ---------------------------------------------------------------------------
+
+
+def test_shared_adapter_reuses_instance_per_config(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Equal configs share one adapter; a different model gets its own."""
+    from aat.core.models import AIConfig
+
+    monkeypatch.setattr(scenario_utils, "_adapters", {})
+
+    class _Adapter:
+        def __init__(self, config: AIConfig) -> None:
+            self._config = config
+
+    config = AIConfig(provider="claude", api_key="k", model="a")
+    first = shared_adapter(_Adapter, config)
+    assert shared_adapter(_Adapter, AIConfig(provider="claude", api_key="k", model="a")) is first
+    assert shared_adapter(_Adapter, config.model_copy(update={"model": "b"})) is not first
+
+
+def test_settings_ai_config_follows_settings(monkeypatch: pytest.MonkeyPatch) -> None:
+    """One AIConfig per settings value; a changed model yields a new one."""
+    monkeypatch.setattr(scenario_utils.settings, "ai_provider", "openai")
+    monkeypatch.setattr(scenario_utils.settings, "ai_model", "m1")
+    first = settings_ai_config()
+    assert (first.provider, first.model) == ("openai", "m1")
+    assert settings_ai_config() is first
+
+    monkeypatch.setattr(scenario_utils.settings, "ai_model", "m2")
+    assert settings_ai_config().model == "m2"
+
+
+@pytest.mark.asyncio
+async def test_close_shared_adapters(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Shutdown closes each cached SDK client (sync or async) and empties the cache."""
+    closed: list[str] = []
+
+    class _AsyncClient:
+        async def close(self) -> None:
+            closed.append("async")
+
+    class _SyncClient:
+        def close(self) -> None:
+            closed.append("sync")
+
+    adapters = {
+        ("a", "1"): type("A", (), {"_client": _AsyncClient()})(),
+        ("b", "2"): type("B", (), {"_client": _SyncClient()})(),
+        ("c", "3"): object(),  # no client
+    }
+    monkeypatch.setattr(scenario_utils, "_adapters", adapters)
+
+    await close_shared_adapters()
+
+    assert sorted(closed) == ["async", "sync"]
+    assert adapters == {}
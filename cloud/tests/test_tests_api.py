@@ -3,13 +3,23 @@
 from __future__ import annotations
 
 import io
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
 
 import pytest
 from app.models import Test, TestStatus
 from httpx import AsyncClient
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+
+@pytest.fixture(autouse=True)
+def _tmp_upload_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Keep uploaded documents out of the real upload directory."""
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path / "uploads"))
+
 # ---------------------------------------------------------------------------
 # Create test — mode=review (default) → GENERATING
 # ---------------------------------------------------------------------------
@@ -59,6 +69,30 @@ async def test_create_test_no_body(client: AsyncClient) -> None:
     assert resp.status_code == 422
 
 
+@pytest.mark.asyncio
+async def test_create_test_skips_refresh_select(client: AsyncClient) -> None:
+    """The created row is returned without re-selecting it after the INSERT."""
+    from sqlalchemy import event
+
+    from tests.conftest import test_engine
+
+    statements: list[str] = []
+
+    def _record(_conn, _cursor, statement, *_args) -> None:  # type: ignore[no-untyped-def]
+        statements.append(statement)
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        resp = await client.post("/api/tests", json={"target_url": "https://example.com"})
+    finally:
+        event.remove(test_engine.sync_engine, "before_cursor_execute", _record)
+
+    assert resp.status_code == 201
+    assert resp.json()["id"] > 0
+    assert resp.json()["created_at"]
+    assert not [s for s in statements if s.startswith("SELECT") and "WHERE tests.id" in s]
+
+
 # ---------------------------------------------------------------------------
 # List / Get tests
 # ---------------------------------------------------------------------------
@@ -103,6 +137,95 @@ async def test_list_tests_pagination(client: AsyncClient) -> None:
     resp2 = await client.get("/api/tests", params={"page": 2, "page_size": 2})
     data2 = resp2.json()
     assert len(data2["tests"]) == 1
+    assert data2["total"] == 3
+
+    resp3 = await client.get("/api/tests", params={"page": 5, "page_size": 2})
+    data3 = resp3.json()
+    assert data3["tests"] == []
+    assert data3["total"] == 3
+
+
+@pytest.mark.asyncio
+async def test_list_tests_cursor_pagination(
+    client: AsyncClient, db_session: AsyncSession,
+) -> None:
+    """next_cursor walks the list newest first, ties broken by id."""
+    same = datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=UTC)
+    db_session.add_all([
+        Test(id=i, user_id="test-uid-001", target_url=f"https://{i}.com",
+             created_at=same if i > 1 else same - timedelta(days=1))
+        for i in range(1, 5)
+    ])
+    await db_session.commit()
+
+    seen: list[int] = []
+    params: dict[str, object] = {"page_size": 3}
+    while True:
+        data = (await client.get("/api/tests", params=params)).json()
+        assert data["total"] == 4
+        assert data["page"] == (None if "cursor" in params else 1)
+        seen += [t["id"] for t in data["tests"]]
+        if data["next_cursor"] is None:
+            break
+        params["cursor"] = data["next_cursor"]
+    assert seen == [4, 3, 2, 1]
+
+    # A full last page has no cursor to an empty one
+    data = (await client.get("/api/tests", params={"page_size": 2, "page": 2})).json()
+    assert [t["id"] for t in data["tests"]] == [2, 1]
+    assert data["next_cursor"] is None
+    data = (await client.get("/api/tests", params={"page_size": 4})).json()
+    assert len(data["tests"]) == 4
+    assert data["next_cursor"] is None
+
+    resp = await client.get("/api/tests", params={"cursor": "bogus"})
+    assert resp.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_list_tests_cursor_carries_total(
+    client: AsyncClient, db_session: AsyncSession,
+) -> None:
+    """Cursor pages reuse the first page's total instead of counting again."""
+    from sqlalchemy import event
+
+    from tests.conftest import test_engine
+
+    db_session.add_all([
+        Test(id=i, user_id="test-uid-001", target_url=f"https://{i}.com")
+        for i in range(1, 4)
+    ])
+    await db_session.commit()
+
+    cursor = (await client.get("/api/tests", params={"page_size": 1})).json()["next_cursor"]
+    statements: list[str] = []
+
+    def _record(_conn, _cursor, statement, *_args) -> None:  # type: ignore[no-untyped-def]
+        statements.append(statement)
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        data = (await client.get("/api/tests", params={"cursor": cursor})).json()
+    finally:
+        event.remove(test_engine.sync_engine, "before_cursor_execute", _record)
+    assert data["total"] == 3
+    assert not [s for s in statements if "count(" in s.lower()]
+
+    # Cursors without a total are still accepted (and counted)
+    legacy = cursor.rsplit("_", 2)[0]
+    data = (await client.get("/api/tests", params={"cursor": legacy})).json()
+    assert data["total"] == 3
+    assert len(data["tests"]) == 2
+    resp = await client.get("/api/tests", params={"cursor": f"{cursor}_1"})
+    assert resp.status_code == 422
+
+    # A total the client made up (signature mismatch or missing) is recounted
+    position, _total, sig = cursor.rsplit("_", 2)
+    for forged in (f"{position}_-5_{sig}", f"{position}_999999", f"{position}_3_{sig}x"):
+        data = (await client.get("/api/tests", params={"cursor": forged})).json()
+        assert data["total"] == 3
+    resp = await client.get("/api/tests", params={"cursor": f"{position}_3_é"})
+    assert resp.status_code == 422
 
 
 @pytest.mark.asyncio
@@ -126,6 +249,87 @@ async def test_get_test_not_found(client: AsyncClient) -> None:
     assert resp.status_code == 404
 
 
+@pytest.mark.asyncio
+async def test_get_test_conditional(client: AsyncClient, db_session: AsyncSession) -> None:
+    """A matching If-None-Match gets 304 until the test changes."""
+    from sqlalchemy import event
+
+    from tests.conftest import test_engine, test_session_factory
+
+    test_id = (await client.post(
+        "/api/tests", json={"target_url": "https://example.com"},
+    )).json()["id"]
+    resp = await client.get(f"/api/tests/{test_id}")
+    etag = resp.headers["etag"]
+    assert etag.startswith('W/"')
+    assert resp.headers["cache-control"] == "private, no-cache"
+
+    statements: list[str] = []
+
+    def _record(_conn, _cursor, statement, *_args) -> None:  # type: ignore[no-untyped-def]
+        statements.append(statement)
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        resp = await client.get(f"/api/tests/{test_id}", headers={"If-None-Match": etag})
+    finally:
+        event.remove(test_engine.sync_engine, "before_cursor_execute", _record)
+    assert resp.status_code == 304
+    assert resp.headers["etag"] == etag
+    assert not resp.content
+    assert not [s for s in statements if "result_json" in s]
+
+    test = await db_session.get(Test, test_id)
+    assert test is not None
+    test.steps_completed = 1
+    await db_session.commit()
+    resp = await client.get(f"/api/tests/{test_id}", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.json()["steps_completed"] == 1
+    assert resp.headers["etag"] != etag
+
+    # Worker and executor writes are bulk UPDATEs, often within one second
+    for values in ({"status": TestStatus.RUNNING}, {"error_message": "stalled"}):
+        etag = resp.headers["etag"]
+        async with test_session_factory.begin() as db:
+            await db.execute(update(Test).where(Test.id == test_id).values(**values))
+        db_session.expire_all()  # the client's requests share this session
+        resp = await client.get(f"/api/tests/{test_id}", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.headers["etag"] != etag
+
+    # Another user's test is 404 whatever tag is sent
+    db_session.add(Test(id=501, user_id="other-uid", target_url="https://example.com"))
+    await db_session.commit()
+    other = await db_session.get(Test, 501)
+    assert other is not None
+    forged = f'W/"501-{other.status.value}-0-0-{other.updated_at.timestamp():.6f}"'
+    resp = await client.get("/api/tests/501", headers={"If-None-Match": forged})
+    assert resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_other_users_test_not_found(
+    client: AsyncClient, db_session: AsyncSession,
+) -> None:
+    """Tests of another user are 404 on every by-id endpoint."""
+    db_session.add(Test(
+        id=500, user_id="other-uid", target_url="https://example.com",
+        status=TestStatus.REVIEW, scenario_yaml="[]",
+    ))
+    await db_session.commit()
+
+    assert (await client.get("/api/tests/500")).status_code == 404
+    assert (await client.put(
+        "/api/tests/500/scenarios", json={"scenario_yaml": "[]"},
+    )).status_code == 404
+    assert (await client.post("/api/tests/500/approve")).status_code == 404
+    assert (await client.post("/api/tests/500/cancel")).status_code == 404
+    assert (await client.post(
+        "/api/tests/500/upload", files={"file": ("a.md", b"x", "text/markdown")},
+    )).status_code == 404
+
+
 # ---------------------------------------------------------------------------
 # Helper: transition test to REVIEW in test DB
 # ---------------------------------------------------------------------------
@@ -207,6 +411,32 @@ async def test_update_scenarios_invalid_yaml(
     assert resp.status_code == 422
 
 
+@pytest.mark.asyncio
+async def test_create_test_with_scenario_yaml(client: AsyncClient) -> None:
+    """Pre-built YAML is validated (steps counted) before the test is queued."""
+    resp = await client.post(
+        "/api/tests",
+        json={"target_url": "https://example.com", "scenario_yaml": _VALID_YAML},
+    )
+    assert resp.status_code == 201
+    assert resp.json()["status"] == "queued"
+    assert resp.json()["steps_total"] == 1
+
+    for bad, detail in (
+        ("", None),  # falsy → no pre-built scenario at all
+        ("[]", "Empty scenario YAML"),
+        ("- id: SC-001\n  steps: nope\n", "Scenario validation error"),
+    ):
+        resp = await client.post(
+            "/api/tests", json={"target_url": "https://example.com", "scenario_yaml": bad},
+        )
+        if detail is None:
+            assert resp.status_code == 201
+        else:
+            assert resp.status_code == 422
+            assert resp.json()["detail"].startswith(detail)
+
+
 # ---------------------------------------------------------------------------
 # POST /api/tests/{id}/approve
 # ---------------------------------------------------------------------------
@@ -228,6 +458,37 @@ async def test_approve_test(
     assert resp.json()["status"] == "queued"
 
 
+@pytest.mark.asyncio
+async def test_approve_test_skips_refresh_select(
+    client: AsyncClient, db_session: AsyncSession
+) -> None:
+    """The UPDATE sets updated_at client-side, so the test is not re-selected."""
+    from sqlalchemy import event
+
+    from tests.conftest import test_engine
+
+    test_id = (await client.post(
+        "/api/tests", json={"target_url": "https://example.com"}
+    )).json()["id"]
+    await _set_review(db_session, test_id, _VALID_YAML)
+    statements: list[str] = []
+
+    def _record(_conn, _cursor, statement, *_args) -> None:  # type: ignore[no-untyped-def]
+        statements.append(statement)
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        resp = await client.post(f"/api/tests/{test_id}/approve")
+    finally:
+        event.remove(test_engine.sync_engine, "before_cursor_execute", _record)
+
+    assert resp.status_code == 200
+    assert resp.json()["updated_at"]
+    write = next(i for i, s in enumerate(statements) if s.startswith("UPDATE tests"))
+    assert "updated_at=" in statements[write]
+    assert not [s for s in statements[write:] if s.startswith("SELECT")]
+
+
 @pytest.mark.asyncio
 async def test_approve_test_wrong_status(client: AsyncClient) -> None:
     """POST /approve returns 409 when test is not in REVIEW status."""
@@ -297,6 +558,52 @@ async def test_upload_txt_file(client: AsyncClient) -> None:
     assert resp.json()["extracted_chars"] == len(content.decode())
 
 
+@pytest.mark.asyncio
+async def test_upload_too_large(client: AsyncClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    """POST /upload rejects files over upload_max_bytes without writing them."""
+    from app.config import settings
+
+    create_resp = await client.post(
+        "/api/tests", json={"target_url": "https://example.com"}
+    )
+    test_id = create_resp.json()["id"]
+    monkeypatch.setattr(settings, "upload_max_bytes", 10)
+
+    resp = await client.post(
+        f"/api/tests/{test_id}/upload",
+        files={"file": ("big.md", io.BytesIO(b"x" * 11), "text/markdown")},
+    )
+    assert resp.status_code == 413
+    assert not list((Path(settings.upload_dir) / str(test_id)).glob("big.md*"))
+
+
+def test_save_upload_streams_within_limit(tmp_path: Path) -> None:
+    """_save_upload copies in chunks and discards oversize input."""
+    from app.routers.tests import _UPLOAD_CHUNK, _save_upload
+
+    data = b"a" * (_UPLOAD_CHUNK * 2 + 1)
+    dest = tmp_path / "doc.md"
+    assert _save_upload(io.BytesIO(data), dest, len(data)) == len(data)
+    assert dest.read_bytes() == data
+
+    assert _save_upload(io.BytesIO(data + b"b"), dest, len(data)) is None
+    assert dest.read_bytes() == data  # previous upload left in place
+    assert [p.name for p in tmp_path.iterdir()] == ["doc.md"]
+
+
+def test_save_upload_cleans_up_failed_write(tmp_path: Path) -> None:
+    """_save_upload removes its temp file when reading the source fails."""
+    from app.routers.tests import _save_upload
+
+    class _Broken(io.BytesIO):
+        def read(self, size: int | None = -1) -> bytes:
+            raise OSError("client went away")
+
+    with pytest.raises(OSError, match="client went away"):
+        _save_upload(_Broken(), tmp_path / "doc.md", 100)
+    assert list(tmp_path.iterdir()) == []
+
+
 @pytest.mark.asyncio
 async def test_upload_unsupported_type(client: AsyncClient) -> None:
     """POST /upload rejects unsupported file types."""
@@ -351,3 +658,244 @@ async def test_upload_multiple_files_appends(client: AsyncClient) -> None:
     data = resp.json()
     assert "First doc" in (data["doc_text"] or "")
     assert "Second doc" in (data["doc_text"] or "")
+
+
+# ---------------------------------------------------------------------------
+# Convert helpers
+# ---------------------------------------------------------------------------
+
+
+def test_check_feature_exists_searches_page_data() -> None:
+    """Keywords match case-insensitively in observations or any page-data section."""
+    from app.routers.tests import _check_feature_exists
+
+    intent = {"observation_kw": ["Sign Up"]}
+    page_data = {"buttons": [{"text": "SIGN UP now"}], "links": []}
+    assert _check_feature_exists(intent, [], page_data)
+    assert _check_feature_exists(intent, [{"element": {"text": "sign up"}}], None)
+    assert not _check_feature_exists(intent, [], {"links": [{"text": "Home"}]})
+
+
+def test_check_feature_exists_matches_within_one_item() -> None:
+    """A keyword spanning two adjacent page-data items is not a match."""
+    from app.routers.tests import _check_feature_exists
+
+    intent = {"observation_kw": ['sign"},{"text":"up']}
+    page_data = {"buttons": [{"text": "Sign"}, {"text": "Up"}]}
+    assert not _check_feature_exists(intent, [], page_data)
+
+
+def test_scan_page_data_and_prompt_sections() -> None:
+    """Scan crawls merge into one page-data dict and render the prompt parts."""
+    import json
+
+    from app.routers.tests import _prompt_sections, _scan_page_data
+
+    obs = {"element": {"text": "FAQ"}, "observed_change": {"type": "content_expanded"}}
+    pages = [
+        {"links": [{"href": f"/{i}"} for i in range(30)], "buttons": [{"text": "Go"}],
+         "observations": [obs]},
+        {"links": [{"href": "/x"}], "images": [{"alt": "logo"}],
+         "buttons": [{"text": "Go"}, {"text": "Buy"}]},
+    ]
+    pages_out, observations, page_data = _scan_page_data(json.dumps(pages), None)
+    assert pages_out == pages
+    assert observations == [obs]  # per-page fallback
+    assert len(page_data["links"]) == 21  # 20 per page
+    assert page_data["buttons"] == [{"text": "Go"}, {"text": "Buy"}]  # repeats kept once
+    assert page_data["forms"] == []
+
+    page_str, obs_str, summary = _prompt_sections(page_data, observations, 100)
+    assert len(page_str) == 100
+    assert obs_str != "No observations."
+    assert "Accordions: 1" in summary and "Images: 1" in summary
+    assert _prompt_sections({}, [], 100) == (
+        "{}", "No observations.", "No element data available.",
+    )
+
+
+class _RaceAdapter:
+    """Answers each prompt after a delay; ``"strict"`` prompts get their own reply."""
+
+    def __init__(self, replies: dict[str, tuple[float, object]]) -> None:
+        self.replies = replies
+        self.cancelled: list[str] = []
+
+    async def generate_scenarios(self, prompt: str) -> list:
+        import asyncio
+
+        kind = "strict" if "STRICT" in prompt else "primary"
+        delay, reply = self.replies[kind]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(kind)
+            raise
+        if isinstance(reply, Exception):
+            raise reply
+        return reply  # type: ignore[return-value]
+
+
+def _relevant(scenarios: list) -> dict:
+    return {"valid": bool(scenarios) and scenarios[0] == "good"}
+
+
+@pytest.mark.asyncio
+async def test_generate_speculative_first_valid_wins() -> None:
+    """A valid result returns at once and the slower request is cancelled."""
+    from app.routers.tests import _generate_speculative
+
+    adapter = _RaceAdapter({"primary": (5, ["bad"]), "strict": (0, ["good"])})
+    result = await _generate_speculative(adapter, "p", "p STRICT", _relevant)
+    assert result == (["good"], {"valid": True})
+    assert adapter.cancelled == ["primary"]
+
+    # Primary valid but slower than an invalid strict reply — still chosen
+    adapter = _RaceAdapter({"primary": (0.01, ["good"]), "strict": (0, ["bad"])})
+    assert (await _generate_speculative(adapter, "p", "p STRICT", _relevant))[0] == ["good"]
+
+
+@pytest.mark.asyncio
+async def test_generate_speculative_fallbacks() -> None:
+    """Without a valid result the strict reply wins, then the primary's; errors surface."""
+    from app.routers.tests import _generate_speculative
+
+    adapter = _RaceAdapter({"primary": (0, ["bad"]), "strict": (0, ["worse"])})
+    assert (await _generate_speculative(adapter, "p", "p STRICT", _relevant))[0] == ["worse"]
+
+    adapter = _RaceAdapter({"primary": (0, ["bad"]), "strict": (0, [])})
+    assert (await _generate_speculative(adapter, "p", "p STRICT", _relevant))[0] == ["bad"]
+
+    adapter = _RaceAdapter({"primary": (0, ValueError("down")), "strict": (0, ["bad"])})
+    assert (await _generate_speculative(adapter, "p", "p STRICT", _relevant))[0] == ["bad"]
+
+    adapter = _RaceAdapter({
+        "primary": (0, ValueError("down")), "strict": (0, RuntimeError("also")),
+    })
+    with pytest.raises(ValueError, match="down"):
+        await _generate_speculative(adapter, "p", "p STRICT", _relevant)
+
+
+@pytest.mark.asyncio
+async def test_convert_reuses_cached_scenarios(
+    client: AsyncClient, db_session: AsyncSession, monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """An identical convert request is answered from the response cache."""
+    from app import llm_cache
+    from app.models import Scan, ScanStatus
+    from app.routers import tests as tests_router
+
+    from aat.core.models import Scenario
+
+    db_session.add(Scan(
+        id=7, user_id="test-uid-001", target_url="https://example.com",
+        status=ScanStatus.COMPLETED,
+        pages_json='[{"url": "https://example.com", "buttons": [{"text": "Go"}]}]',
+    ))
+    await db_session.commit()
+
+    calls: list[str] = []
+
+    class _Adapter:
+        async def generate_scenarios(self, prompt: str) -> list:
+            calls.append(prompt)
+            return [Scenario.model_validate({"id": "SC-001", "name": "Go", "steps": [
+                {"step": 1, "action": "navigate", "value": "/", "description": "open"},
+            ]})]
+
+    monkeypatch.setitem(
+        tests_router.ADAPTER_REGISTRY, tests_router.settings.ai_provider, object,
+    )
+    monkeypatch.setattr(tests_router, "shared_adapter", lambda *_: _Adapter())
+    llm_cache.clear()
+    try:
+        body = {"target_url": "https://example.com", "user_prompt": "click Go", "scan_id": 7}
+        first = await client.post("/api/tests/convert", json=body)
+        second = await client.post("/api/tests/convert", json=body)
+        other = await client.post(
+            "/api/tests/convert", json={**body, "user_prompt": "click Go twice"},
+        )
+    finally:
+        llm_cache.clear()
+
+    assert first.status_code == second.status_code == other.status_code == 200
+    assert second.json()["scenario_yaml"] == first.json()["scenario_yaml"]
+    assert len(calls) == 2  # the different request is generated anew
+
+
+@pytest.mark.asyncio
+async def test_convert_similar_cache_keyed_by_documents(
+    client: AsyncClient, db_session: AsyncSession, monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Changed reference documents miss the near-duplicate tier."""
+    from app import llm_cache
+    from app.models import Scan, ScanStatus
+    from app.routers import documents
+    from app.routers import tests as tests_router
+
+    from aat.core.models import Scenario
+
+    scan = Scan(
+        id=8, user_id="test-uid-001", target_url="https://example.com",
+        status=ScanStatus.COMPLETED,
+        pages_json='[{"url": "https://example.com", "buttons": [{"text": "Go"}]}]',
+    )
+    db_session.add(scan)
+    await db_session.commit()
+
+    calls: list[str] = []
+
+    class _Adapter:
+        async def generate_scenarios(self, prompt: str) -> list:
+            calls.append(prompt)
+            return [Scenario.model_validate({"id": "SC-001", "name": "Go", "steps": [
+                {"step": 1, "action": "navigate", "value": "/", "description": "open"},
+            ]})]
+
+    doc_text = "Log in with the test account."
+
+    async def _doc_text(*_: object) -> str:
+        return doc_text
+
+    monkeypatch.setitem(
+        tests_router.ADAPTER_REGISTRY, tests_router.settings.ai_provider, object,
+    )
+    monkeypatch.setattr(tests_router, "shared_adapter", lambda *_: _Adapter())
+    monkeypatch.setattr(documents, "get_user_doc_text", _doc_text)
+    # Any two convert prompts would count as near-duplicates
+    monkeypatch.setattr(tests_router.settings, "llm_similar_threshold", 0.01)
+    llm_cache.clear()
+    try:
+        body = {"target_url": "https://example.com", "user_prompt": "click Go", "scan_id": 8}
+        assert (await client.post("/api/tests/convert", json=body)).status_code == 200
+        doc_text = "Log in with the test account, then enter the 2FA code 000000."
+        assert (await client.post("/api/tests/convert", json=body)).status_code == 200
+        # Same documents, re-crawled page — a near-duplicate hit
+        scan.pages_json = (
+            '[{"url": "https://example.com", "buttons": [{"text": "Go"}, {"text": "Buy"}]}]'
+        )
+        await db_session.commit()
+        assert (await client.post("/api/tests/convert", json=body)).status_code == 200
+    finally:
+        llm_cache.clear()
+
+    assert len(calls) == 2
+    assert "2FA" in calls[1]
+
+
+@pytest.mark.asyncio
+async def test_convert_rejects_another_users_session(
+    client: AsyncClient, monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """A convert session watched by another user is not reused for progress."""
+    from app.routers import tests as tests_router
+    from app.ws import WSManager
+
+    convert_ws = WSManager().topic("convert")
+    monkeypatch.setattr(tests_router, "convert_ws", convert_ws)
+    assert await convert_ws.claim(42, "someone-else")
+
+    resp = await client.post("/api/tests/convert", json={
+        "target_url": "https://example.com", "user_prompt": "click Go", "session_id": 42,
+    })
+    assert resp.status_code == 409
@@ -3,7 +3,10 @@
 from __future__ import annotations
 
 import pytest
+from app.models import Test, TestStatus
 from httpx import AsyncClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 @pytest.mark.asyncio
@@ -54,3 +57,27 @@ async def test_v1_wait_timeout(client: AsyncClient, monkeypatch) -> None:
     )
     assert resp.status_code == 408
     assert "timeout" in resp.json()["detail"].lower()
+
+
+@pytest.mark.asyncio
+async def test_v1_wait_returns_finished_row(
+    client: AsyncClient, db_session: AsyncSession, monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """wait=true polls the status and returns the full row once it is final."""
+    from app.routers import v1
+
+    async def _finish(_delay: float) -> None:
+        await db_session.execute(
+            update(Test).values(status=TestStatus.DONE, result_json='{"passed": true}')
+        )
+        await db_session.commit()
+
+    monkeypatch.setattr(v1.asyncio, "sleep", _finish)
+
+    resp = await client.post(
+        "/api/v1/tests?wait=true",
+        json={"target_url": "https://example.com", "mode": "auto"},
+    )
+    assert resp.status_code == 201
+    assert resp.json()["status"] == "done"
+    assert resp.json()["result_json"] == '{"passed": true}'
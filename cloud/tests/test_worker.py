@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+import asyncio
+import contextlib
 from datetime import UTC, datetime, timedelta
 from unittest.mock import AsyncMock
 
@@ -24,13 +26,13 @@ async def test_ws_manager_connect_and_broadcast() -> None:
 
     mock_ws = AsyncMock()
     mock_ws.accept = AsyncMock()
-    mock_ws.send_json = AsyncMock()
+    mock_ws.send_text = AsyncMock()
 
     await manager.connect(1, mock_ws)
     await manager.broadcast(1, {"type": "test_start", "test_id": 1})
 
     mock_ws.accept.assert_called_once()
-    mock_ws.send_json.assert_called_once_with({"type": "test_start", "test_id": 1})
+    mock_ws.send_text.assert_called_once_with('{"type":"test_start","test_id":1}')
 
 
 @pytest.mark.asyncio
@@ -45,9 +47,9 @@ async def test_ws_manager_disconnect() -> None:
     manager.disconnect(1, mock_ws)
 
     # Broadcast should not send to disconnected client
-    mock_ws.send_json = AsyncMock()
+    mock_ws.send_text = AsyncMock()
     await manager.broadcast(1, {"type": "test_start"})
-    mock_ws.send_json.assert_not_called()
+    mock_ws.send_text.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -65,7 +67,7 @@ async def test_ws_manager_dead_connection_cleanup() -> None:
 
     mock_ws = AsyncMock()
     mock_ws.accept = AsyncMock()
-    mock_ws.send_json = AsyncMock(side_effect=Exception("connection closed"))
+    mock_ws.send_text = AsyncMock(side_effect=Exception("connection closed"))
 
     await manager.connect(1, mock_ws)
     await manager.broadcast(1, {"type": "test_start"})
@@ -81,19 +83,349 @@ async def test_ws_manager_multiple_clients() -> None:
 
     ws1 = AsyncMock()
     ws1.accept = AsyncMock()
-    ws1.send_json = AsyncMock()
+    ws1.send_text = AsyncMock()
 
     ws2 = AsyncMock()
     ws2.accept = AsyncMock()
-    ws2.send_json = AsyncMock()
+    ws2.send_text = AsyncMock()
 
     await manager.connect(1, ws1)
     await manager.connect(1, ws2)
 
     await manager.broadcast(1, {"type": "step_done"})
 
-    ws1.send_json.assert_called_once_with({"type": "step_done"})
-    ws2.send_json.assert_called_once_with({"type": "step_done"})
+    ws1.send_text.assert_called_once_with('{"type":"step_done"}')
+    ws2.send_text.assert_called_once_with('{"type":"step_done"}')
+
+
+@pytest.mark.asyncio
+async def test_ws_manager_relay_publishes_instead_of_sending() -> None:
+    """With a relay active, broadcast publishes to Redis rather than sending locally."""
+    manager = WSManager()
+    ws = AsyncMock()
+    await manager.connect(7, ws)
+    manager._redis = AsyncMock()
+
+    await manager.broadcast(7, {"type": "step_done"})
+
+    manager._redis.publish.assert_awaited_once_with("awt:ws:7", '{"type":"step_done"}')
+    ws.send_text.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_ws_manager_relay_publish_failure_falls_back() -> None:
+    """A failed publish still reaches clients on this process."""
+    manager = WSManager()
+    ws = AsyncMock()
+    await manager.connect(7, ws)
+    manager._redis = AsyncMock()
+    manager._redis.publish.side_effect = ConnectionError("down")
+
+    await manager.broadcast(7, {"type": "step_done"})
+
+    ws.send_text.assert_called_once_with('{"type":"step_done"}')
+
+
+@pytest.mark.asyncio
+async def test_ws_manager_relay_loop_delivers_locally() -> None:
+    """Relayed pmessages are delivered to local clients of that test."""
+    manager = WSManager()
+    ws = AsyncMock()
+    await manager.connect(7, ws)
+
+    class _PubSub:
+        async def listen(self):  # type: ignore[no-untyped-def]
+            yield {"type": "psubscribe", "channel": b"awt:ws:*", "data": 1}
+            yield {"type": "pmessage", "channel": b"awt:ws:bad", "data": b"{}"}
+            yield {"type": "pmessage", "channel": b"awt:ws:7", "data": b'{"type": "done"}'}
+
+    await manager._relay_loop(_PubSub())
+
+    ws.send_text.assert_called_once_with('{"type": "done"}')
+
+
+@pytest.mark.asyncio
+async def test_ws_topics_do_not_share_ids() -> None:
+    """scan 5 and test 5 are different channels."""
+    manager = WSManager()
+    scan_ws, test_ws = manager.topic("scan"), manager.topic("test")
+    scan_client, test_client = AsyncMock(), AsyncMock()
+    await scan_ws.connect(5, scan_client)
+    await test_ws.connect(5, test_client)
+
+    await scan_ws.broadcast(5, {"type": "scan_complete"})
+
+    scan_client.send_text.assert_called_once_with('{"type":"scan_complete"}')
+    test_client.send_text.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_ws_manager_multiplexed_subscribers_get_batched_frames(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """One window's events arrive as one array frame; dead sockets are dropped."""
+    monkeypatch.setattr("app.ws._BATCH_WINDOW", 0)
+    manager = WSManager()
+    live, dead = AsyncMock(), AsyncMock()
+    dead.send_text.side_effect = Exception("closed")
+    for channel in ("scan:5", "test:1"):
+        manager.subscribe(channel, live)
+        manager.subscribe(channel, dead)
+
+    await manager.topic("scan").broadcast(5, {"type": "page_scanned"})
+    await manager.topic("test").broadcast(1, {"type": "step_done"})
+    await asyncio.gather(*manager._flushers.values())
+
+    live.send_text.assert_called_once_with(
+        '[{"channel":"scan:5","data":{"type":"page_scanned"}},'
+        '{"channel":"test:1","data":{"type":"step_done"}}]'
+    )
+    assert manager._subscribers["scan:5"] == {live}
+    assert manager._subscribers["test:1"] == {live}
+    assert not manager._outbox and not manager._flushers
+    manager.unsubscribe("scan:5", live)
+    assert "scan:5" not in manager._subscribers
+
+
+@pytest.mark.asyncio
+async def test_ws_manager_replies_wait_for_batch_frames(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """A reply sent while a batch frame is in flight goes out after it."""
+    monkeypatch.setattr("app.ws._BATCH_WINDOW", 0)
+    manager = WSManager()
+    frames: list[str] = []
+    in_flight = 0
+    unblock = asyncio.Event()
+
+    async def _send_text(text: str) -> None:
+        nonlocal in_flight
+        assert not in_flight, "overlapping sends on one socket"
+        in_flight += 1
+        try:
+            if text.startswith("["):
+                await unblock.wait()  # a slow client holds up the batch
+            frames.append(text)
+        finally:
+            in_flight -= 1
+
+    ws = AsyncMock()
+    ws.send_text.side_effect = _send_text
+    manager.subscribe("scan:5", ws)
+    await manager.topic("scan").broadcast(5, {"type": "page_scanned"})
+    await asyncio.sleep(0.01)  # the flusher is now sending the batch
+
+    ack = asyncio.create_task(manager.send(ws, '{"type":"subscribed","channel":"test:1"}'))
+    await asyncio.sleep(0.01)
+    assert not frames
+    unblock.set()
+    await asyncio.gather(ack, *manager._flushers.values())
+
+    assert frames == [
+        '[{"channel":"scan:5","data":{"type":"page_scanned"}}]',
+        '{"type":"subscribed","channel":"test:1"}',
+    ]
+    manager.unsubscribe("scan:5", ws)
+    manager.release(ws)
+    assert not manager._send_locks
+
+
+@pytest.mark.asyncio
+async def test_ws_manager_relay_loop_routes_named_channels() -> None:
+    """Relayed "scan:<id>" messages reach that channel only."""
+    manager = WSManager()
+    scan_client, test_client = AsyncMock(), AsyncMock()
+    await manager.topic("scan").connect(7, scan_client)
+    await manager.topic("test").connect(7, test_client)
+
+    class _PubSub:
+        async def listen(self):  # type: ignore[no-untyped-def]
+            yield {"type": "pmessage", "channel": b"awt:ws:scan:7", "data": b"{}"}
+
+    await manager._relay_loop(_PubSub())
+
+    scan_client.send_text.assert_called_once_with("{}")
+    test_client.send_text.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_ws_manager_relay_resubscribes_after_drop(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """While the relay is down events are delivered locally, then it resubscribes."""
+    monkeypatch.setattr("app.ws._RELAY_RETRY_DELAY", 0.05)
+    manager = WSManager()
+    ws = AsyncMock()
+    await manager.connect(7, ws)
+    dropped, second = asyncio.Event(), asyncio.Queue[dict]()
+
+    class _DroppingPubSub:
+        async def psubscribe(self, _pattern: str) -> None:
+            pass
+
+        async def listen(self):  # type: ignore[no-untyped-def]
+            await dropped.wait()
+            raise ConnectionError("connection reset")
+            yield  # pragma: no cover
+
+        async def aclose(self) -> None:
+            pass
+
+    class _PubSub(_DroppingPubSub):
+        async def listen(self):  # type: ignore[no-untyped-def]
+            while True:
+                yield await second.get()
+
+    client = AsyncMock()
+    client.pubsub = iter([_DroppingPubSub(), _PubSub()]).__next__
+    relay = asyncio.create_task(manager._run_relay(client))
+    try:
+        await asyncio.sleep(0.01)
+        assert manager._redis is client
+
+        dropped.set()
+        await asyncio.sleep(0.01)
+        assert manager._redis is None
+        await manager.broadcast(7, {"type": "step_done"})
+        ws.send_text.assert_called_once_with('{"type":"step_done"}')
+        client.publish.assert_not_called()
+
+        await asyncio.sleep(0.1)
+        assert manager._redis is client
+        await second.put({"type": "pmessage", "channel": b"awt:ws:7", "data": b"{}"})
+        await asyncio.sleep(0.01)
+        ws.send_text.assert_called_with("{}")
+    finally:
+        relay.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await relay
+
+
+def test_multiplexed_websocket_endpoint(monkeypatch: pytest.MonkeyPatch) -> None:
+    """/api/ws acks subscriptions, answers pings and cleans up on close."""
+    from app.routers import live
+    from app.ws import ws_manager
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    async def _socket_user(_ws: object) -> User:
+        return User(id="u1", email="u1@example.com")
+
+    async def _may_watch(user: User, channel: str) -> bool:
+        return channel != "test:9"
+
+    monkeypatch.setattr(live, "_socket_user", _socket_user)
+    monkeypatch.setattr(live, "_may_watch", _may_watch)
+    app = FastAPI()
+    app.include_router(live.router)
+    with TestClient(app).websocket_connect("/api/ws") as ws:
+        ws.send_json({"op": "subscribe", "channel": "scan:05"})
+        assert ws.receive_json() == {"type": "subscribed", "channel": "scan:5"}
+        assert "scan:5" in ws_manager._subscribers
+        ws.send_json({"op": "subscribe", "channel": "job:1"})
+        assert ws.receive_json()["type"] == "error"
+        ws.send_json({"op": "subscribe", "channel": "test:9"})
+        assert ws.receive_json() == {"type": "error", "error": "Channel not found: test:9"}
+        assert "test:9" not in ws_manager._subscribers
+        ws.send_json({"op": "ping"})
+        assert ws.receive_json() == {"type": "pong"}
+    assert "scan:5" not in ws_manager._subscribers
+    assert not ws_manager._send_locks
+
+
+@pytest.mark.asyncio
+async def test_may_watch_rejects_out_of_range_ids(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Ids beyond the INTEGER column are refused without querying the DB."""
+    from app.routers import live
+
+    def _no_session() -> None:
+        raise AssertionError("queried the database")
+
+    monkeypatch.setattr(live, "async_session", _no_session)
+    user = User(id="u1", email="u1@example.com")
+    assert not await live._may_watch(user, "test:99999999999999999999")
+    assert not await live._may_watch(user, f"scan:{2**31}")
+
+
+def test_multiplexed_websocket_rejects_anonymous(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Sockets without valid credentials are closed before they are accepted."""
+    from app.routers import live
+    from fastapi import FastAPI, WebSocketDisconnect
+    from fastapi.testclient import TestClient
+
+    async def _socket_user(_ws: object) -> None:
+        return None
+
+    monkeypatch.setattr(live, "_socket_user", _socket_user)
+    app = FastAPI()
+    app.include_router(live.router)
+    with (
+        pytest.raises(WebSocketDisconnect) as exc_info,
+        TestClient(app).websocket_connect("/api/ws") as ws,
+    ):
+        ws.receive_json()
+    assert exc_info.value.code == 1008
+
+
+@pytest.mark.asyncio
+async def test_multiplexed_websocket_auth_and_ownership(
+    db_session: AsyncSession, monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Query-string JWTs authenticate; only the caller's own channels are watchable."""
+    from types import SimpleNamespace
+
+    import jwt
+    from app.config import settings
+    from app.models import Scan
+    from app.routers import live
+
+    from tests.conftest import test_session_factory
+
+    jwt_secret = "test-ws-secret-at-least-32-bytes-long!"
+    monkeypatch.setattr(live, "async_session", test_session_factory)
+    monkeypatch.setattr(settings, "supabase_url", "")
+    monkeypatch.setattr(settings, "supabase_jwt_secret", jwt_secret)
+    token = jwt.encode(
+        {"sub": "owner", "email": "o@example.com", "aud": "authenticated"},
+        jwt_secret, algorithm="HS256",
+    )
+
+    def _socket(query: dict[str, str]) -> SimpleNamespace:
+        return SimpleNamespace(query_params=query, headers={})
+
+    owner = await live._socket_user(_socket({"token": token}))
+    assert owner is not None and owner.id == "owner"
+    assert await live._socket_user(_socket({"token": "forged"})) is None
+    assert await live._socket_user(_socket({})) is None
+
+    db_session.add(Scan(id=3, user_id="owner", target_url="https://example.com"))
+    await db_session.commit()
+    other = User(id="other", email="x@example.com")
+    assert await live._may_watch(owner, "scan:3")
+    assert not await live._may_watch(other, "scan:3")
+    assert not await live._may_watch(owner, "test:3")
+
+    manager = WSManager()
+    monkeypatch.setattr(live, "ws_manager", manager)
+    assert await live._may_watch(owner, "convert:77")
+    assert not await live._may_watch(other, "convert:77")
+    assert await manager.claim("convert:77", "owner")
+
+
+def test_per_test_websocket_ignores_frames_and_cleans_up() -> None:
+    """Client text/binary frames are ignored; closing unregisters the socket."""
+    from app.routers import tests
+    from app.ws import ws_manager
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+    app.include_router(tests.router)
+    with TestClient(app).websocket_connect("/api/tests/3/ws") as ws:
+        ws.send_text("ping")
+        ws.send_bytes(b"\x00")
+        assert "test:3" in ws_manager._connections
+    assert "test:3" not in ws_manager._connections
 
 
 # ---------------------------------------------------------------------------
@@ -364,3 +696,33 @@ async def test_middleware_stuck_cleanup(db_session: AsyncSession) -> None:
     # After cleanup — no active tests
     active_after = await get_active_count("user-stuck", monkeypatch_session)
     assert active_after == 0
+
+
+@pytest.mark.asyncio
+async def test_run_execute_records_result(
+    db_session: AsyncSession, monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """_run_execute stores status + result with one UPDATE (no prior SELECT)."""
+    import app.worker as worker_mod
+
+    from tests.conftest import test_session_factory
+
+    db_session.add(
+        Test(id=5, user_id="user-a", target_url="http://a.com", status=TestStatus.RUNNING)
+    )
+    await db_session.commit()
+
+    async def _fake_execute(test_id: int, ws: object) -> dict:
+        return {"passed": False, "error": "step 2 failed", "duration_ms": 12}
+
+    monkeypatch.setattr(worker_mod, "async_session", test_session_factory)
+    monkeypatch.setattr(worker_mod, "execute_test", _fake_execute)
+
+    await Worker()._run_execute(5)
+
+    db_session.expire_all()
+    test = await db_session.get(Test, 5)
+    assert test is not None
+    assert test.status == TestStatus.FAILED
+    assert test.error_message == "step 2 failed"
+    assert '"duration_ms": 12' in (test.result_json or "")
@@ -340,7 +340,9 @@ class OpenAIAdapter(AIAdapter):
             try:
                 import yaml
 
-                result = yaml.safe_load(cleaned)
+                from aat.core.scenario_loader import YamlLoader
+
+                result = yaml.load(cleaned, Loader=YamlLoader)  # noqa: S506
                 if isinstance(result, (dict, list)):
                     logger.warning(
                         "OpenAI returned YAML instead of JSON, parsed via YAML fallback"
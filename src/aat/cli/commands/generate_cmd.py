@@ -11,6 +11,7 @@ import yaml
 
 from aat.core.config import load_config
 from aat.core.exceptions import AATError
+from aat.core.scenario_loader import YamlDumper
 
 if TYPE_CHECKING:
     from typing import Any
@@ -115,7 +116,14 @@ async def _generate(
 
         data = scenario.model_dump(mode="json")
         with open(out_path, "w", encoding="utf-8") as f:  # noqa: PTH123
-            yaml.safe_dump(data, f, default_flow_style=False, allow_unicode=True, sort_keys=False)
+            yaml.dump(
+                data,
+                f,
+                Dumper=YamlDumper,
+                default_flow_style=False,
+                allow_unicode=True,
+                sort_keys=False,
+            )
 
         typer.echo(f"  Saved: {out_path}")
 
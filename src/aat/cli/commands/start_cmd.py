@@ -21,7 +21,7 @@ from aat.core.events import CLIEventHandler
 from aat.core.exceptions import AATError
 from aat.core.loop import DevQALoop
 from aat.core.models import Config
-from aat.core.scenario_loader import load_scenarios
+from aat.core.scenario_loader import YamlDumper, load_scenarios
 from aat.engine import ENGINE_REGISTRY
 from aat.engine.comparator import Comparator
 from aat.engine.executor import StepExecutor
@@ -232,9 +232,10 @@ async def _start_guided(config_path: str | None) -> None:
                         out_path = scenario_dir / filename
                         data = sc.model_dump(mode="json")
                         with open(out_path, "w", encoding="utf-8") as fh:
-                            yaml.safe_dump(
+                            yaml.dump(
                                 data,
                                 fh,
+                                Dumper=YamlDumper,
                                 default_flow_style=False,
                                 allow_unicode=True,
                                 sort_keys=False,
@@ -17,6 +17,7 @@ import yaml
 
 from aat.core.exceptions import ConfigError
 from aat.core.models import Config
+from aat.core.scenario_loader import YamlLoader
 
 DEFAULT_CONFIG_FILENAME = "aat.config.yaml"
 
@@ -94,7 +95,7 @@ def _load_yaml(path: Path) -> dict[str, Any]:
     """Load and parse a YAML file."""
     try:
         with open(path, encoding="utf-8") as f:  # noqa: PTH123
-            data = yaml.safe_load(f)
+            data = yaml.load(f, Loader=YamlLoader)  # noqa: S506
     except yaml.YAMLError as e:
         msg = f"Failed to parse YAML: {path}: {e}"
         raise ConfigError(msg) from e
@@ -18,6 +18,11 @@ from aat.core.models import Scenario
 _VAR_PATTERN = re.compile(r"\{\{(\s*[\w.]+\s*)\}\}")
 _UNRESOLVED_PATTERN = re.compile(r"\{\{[\w.]+\}\}")
 
+# libyaml-backed safe loader/dumper when PyYAML was built with it —
+# used for all YAML the aat package reads and writes
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+YamlDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
 
 def load_scenario(path: Path, variables: dict[str, str] | None = None) -> Scenario:
     """Load a single Scenario from a YAML file.
@@ -100,7 +105,7 @@ def _load_yaml(path: Path) -> dict[str, Any]:
     """Load and parse a YAML file."""
     try:
         with open(path, encoding="utf-8") as f:  # noqa: PTH123
-            data = yaml.safe_load(f)
+            data = yaml.load(f, Loader=YamlLoader)  # noqa: S506
     except yaml.YAMLError as e:
         msg = f"Failed to parse scenario YAML ({path.name}): {e}"
         raise ScenarioError(msg) from e
@@ -94,6 +94,14 @@ class TestYAMLLoading:
         with pytest.raises(ConfigError, match="must be a YAML mapping"):
             _load_yaml(yaml_file)
 
+    def test_load_rejects_python_tags(self, tmp_path: Path) -> None:
+        yaml_file = tmp_path / DEFAULT_CONFIG_FILENAME
+        yaml_file.write_text(
+            "project_name: !!python/object/apply:os.getcwd []\n", encoding="utf-8"
+        )
+        with pytest.raises(ConfigError, match="Failed to parse YAML"):
+            _load_yaml(yaml_file)
+
 
 # ── Environment Variable Merge ──
 
@@ -76,6 +76,20 @@ class TestLoadScenario:
         with pytest.raises(ScenarioError, match="must be a YAML mapping"):
             load_scenario(f)
 
+    def test_load_unicode(self, tmp_path: Path) -> None:
+        data = {**MINIMAL_SCENARIO, "name": "로그인 테스트"}
+        data["steps"] = [{**MINIMAL_SCENARIO["steps"][0], "description": "홈으로 이동"}]
+        f = _write_yaml(tmp_path / "SC-001.yaml", data)
+        scenario = load_scenario(f)
+        assert scenario.name == "로그인 테스트"
+        assert scenario.steps[0].description == "홈으로 이동"
+
+    def test_load_rejects_python_tags(self, tmp_path: Path) -> None:
+        f = tmp_path / "evil.yaml"
+        f.write_text("!!python/object/apply:os.system ['true']\n", encoding="utf-8")
+        with pytest.raises(ScenarioError, match="Failed to parse"):
+            load_scenario(f)
+
 
 # ── Variable Substitution ──
 